@@ -0,0 +1,8 @@
+CREATE TABLE IF NOT EXISTS bot_bday.apscheduler_jobs (
+    id VARCHAR(191) PRIMARY KEY,
+    next_run_time DOUBLE PRECISION,
+    job_state BYTEA NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS ix_bot_bday_apscheduler_jobs_next_run_time
+    ON bot_bday.apscheduler_jobs (next_run_time);
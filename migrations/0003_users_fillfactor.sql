@@ -0,0 +1,3 @@
+-- /random переписывает ward_id/giver_id у всех строк сразу: свободное место
+-- на странице позволяет делать HOT-обновления без перестройки индексов
+ALTER TABLE bot_bday.users SET (fillfactor = 50);
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS bot_bday.fsm_storage (
+    key TEXT PRIMARY KEY,
+    state TEXT,
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_bot_bday_fsm_storage_updated_at
+    ON bot_bday.fsm_storage (updated_at);
@@ -0,0 +1,9 @@
+-- Месяц и день рождения как одно число MMDD: поиск ДР по календарному дню
+-- и по окну через конец года идёт по индексу, а не полным сканированием
+ALTER TABLE bot_bday.users
+    ADD COLUMN IF NOT EXISTS birthday_md SMALLINT GENERATED ALWAYS AS (
+        (EXTRACT(MONTH FROM birthday) * 100 + EXTRACT(DAY FROM birthday))::smallint
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS ix_bot_bday_users_birthday_md
+    ON bot_bday.users (birthday_md);
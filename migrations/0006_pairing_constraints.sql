@@ -0,0 +1,17 @@
+-- Запрещённые пары даритель → подопечный, которые распределение не выдаёт
+CREATE TABLE IF NOT EXISTS bot_bday.pair_exclusions (
+    giver_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    ward_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (giver_id, ward_id)
+);
+
+-- История распределений: пары прошлых лет не повторяются
+CREATE TABLE IF NOT EXISTS bot_bday.pair_history (
+    giver_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    ward_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    assigned_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_bot_bday_pair_history_assigned_at
+    ON bot_bday.pair_history (assigned_at);
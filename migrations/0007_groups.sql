@@ -0,0 +1,58 @@
+-- Независимые круги дарителей: у каждого свои участники и пары
+CREATE TABLE IF NOT EXISTS bot_bday.groups (
+    id SERIAL PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    -- Код приглашения: /join <code> или ссылка t.me/<bot>?start=<code>
+    code VARCHAR(32) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS bot_bday.group_members (
+    group_id INTEGER NOT NULL REFERENCES bot_bday.groups (id) ON DELETE CASCADE,
+    user_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    ward_id INTEGER,
+    giver_id INTEGER,
+    joined_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (group_id, user_id)
+) WITH (fillfactor = 50);
+
+-- Пары группы и обратный поиск «в каких группах состоит пользователь»
+CREATE INDEX IF NOT EXISTS ix_bot_bday_group_members_group_ward
+    ON bot_bday.group_members (group_id, ward_id);
+CREATE INDEX IF NOT EXISTS ix_bot_bday_group_members_user
+    ON bot_bday.group_members (user_id);
+
+-- Существующий круг становится группой по умолчанию
+INSERT INTO bot_bday.groups (id, title, code)
+VALUES (1, 'Основная группа', 'default')
+ON CONFLICT (id) DO NOTHING;
+SELECT setval(
+    pg_get_serial_sequence('bot_bday.groups', 'id'),
+    (SELECT max(id) FROM bot_bday.groups)
+);
+
+INSERT INTO bot_bday.group_members (group_id, user_id, ward_id, giver_id)
+SELECT 1, id, ward_id, giver_id FROM bot_bday.users
+ON CONFLICT DO NOTHING;
+
+-- Группа, к которой относятся команды пользователя
+ALTER TABLE bot_bday.users
+    ADD COLUMN IF NOT EXISTS current_group_id INTEGER
+        REFERENCES bot_bday.groups (id) ON DELETE SET NULL;
+UPDATE bot_bday.users SET current_group_id = 1 WHERE current_group_id IS NULL;
+
+ALTER TABLE bot_bday.users DROP COLUMN IF EXISTS ward_id;
+ALTER TABLE bot_bday.users DROP COLUMN IF EXISTS giver_id;
+-- Пары больше не обновляются в users: запас под HOT-обновления из 0003 не нужен.
+-- Новые страницы заполняются целиком, старые уплотнятся при перезаписи таблицы
+ALTER TABLE bot_bday.users RESET (fillfactor);
+
+ALTER TABLE bot_bday.pair_history
+    ADD COLUMN IF NOT EXISTS group_id INTEGER
+        REFERENCES bot_bday.groups (id) ON DELETE CASCADE;
+UPDATE bot_bday.pair_history SET group_id = 1 WHERE group_id IS NULL;
+CREATE INDEX IF NOT EXISTS ix_bot_bday_pair_history_group
+    ON bot_bday.pair_history (group_id, assigned_at);
+
+-- Задачи напоминаний теперь привязаны к группе: пересоздаются при запуске
+DELETE FROM bot_bday.apscheduler_jobs WHERE id LIKE 'reminder:%';
@@ -0,0 +1,7 @@
+-- Аренда ролей между репликами: владелец продлевает запись, пока жив
+CREATE TABLE IF NOT EXISTS bot_bday.leases (
+    name VARCHAR(64) PRIMARY KEY,
+    holder VARCHAR(255) NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    acquired_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
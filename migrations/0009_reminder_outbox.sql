@@ -0,0 +1,30 @@
+-- Исходящие напоминания: строка живёт до доставки, повторы переживают перезапуск
+CREATE TABLE IF NOT EXISTS bot_bday.reminder_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    group_id INTEGER NOT NULL REFERENCES bot_bday.groups (id) ON DELETE CASCADE,
+    giver_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    ward_id INTEGER NOT NULL REFERENCES bot_bday.users (id) ON DELETE CASCADE,
+    days_before SMALLINT NOT NULL,
+    -- Год дня рождения, о котором напоминание
+    year SMALLINT NOT NULL,
+    chat_id BIGINT NOT NULL,
+    text TEXT NOT NULL,
+    scheduled_at TIMESTAMPTZ NOT NULL,
+    -- pending → sent | failed
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    -- Для взятой в работу строки — срок, после которого её заберёт другой воркер
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    sent_at TIMESTAMPTZ,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    -- Ключ идемпотентности: одно напоминание на даритель/подопечный/отступ/год
+    UNIQUE (giver_id, ward_id, days_before, year)
+);
+
+CREATE INDEX IF NOT EXISTS ix_bot_bday_reminder_outbox_due
+    ON bot_bday.reminder_outbox (next_attempt_at)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS ix_bot_bday_reminder_outbox_sent_at
+    ON bot_bday.reminder_outbox (sent_at)
+    WHERE status = 'sent';
@@ -0,0 +1,39 @@
+-- Поиск по ФИО для /set_name. pg_trgm есть не везде, поэтому индекс строится
+-- встроенными средствами: GIN по префиксам нормализованных слов имени.
+-- Регистр кириллицы сводится через translate: lower() в локали C её не меняет
+CREATE OR REPLACE FUNCTION bot_bday.name_tokens(name TEXT) RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(token), '{}')
+    FROM regexp_split_to_table(
+        translate(
+            lower(name),
+            'АБВГДЕЁЖЗИЙКЛМНОПРСТУФХЦЧШЩЪЫЬЭЮЯё',
+            'абвгдеежзийклмнопрстуфхцчшщъыьэюяе'
+        ),
+        '[^0-9a-zа-я]+'
+    ) AS token
+    WHERE token <> ''
+$$;
+
+-- Все префиксы слов: «Иванов И. П.» и «иван» находятся проверкой вхождения
+CREATE OR REPLACE FUNCTION bot_bday.name_prefixes(name TEXT) RETURNS TEXT[]
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT coalesce(array_agg(DISTINCT left(token, n)), '{}')
+    FROM unnest(bot_bday.name_tokens(name)) AS token,
+        generate_series(1, length(token)) AS n
+$$;
+
+-- Слова имени — для ранжирования, префиксы — для поиска по началу слов
+ALTER TABLE bot_bday.users
+    ADD COLUMN IF NOT EXISTS name_tokens TEXT[] GENERATED ALWAYS AS (
+        bot_bday.name_tokens(full_name)
+    ) STORED,
+    ADD COLUMN IF NOT EXISTS name_prefixes TEXT[] GENERATED ALWAYS AS (
+        bot_bday.name_prefixes(full_name)
+    ) STORED;
+
+-- Без fastupdate поиск не просматривает список отложенных вставок
+CREATE INDEX IF NOT EXISTS ix_bot_bday_users_name_tokens
+    ON bot_bday.users USING gin (name_tokens) WITH (fastupdate = off);
+CREATE INDEX IF NOT EXISTS ix_bot_bday_users_name_prefixes
+    ON bot_bday.users USING gin (name_prefixes) WITH (fastupdate = off);
@@ -1,6 +1,7 @@
 import asyncio
 
-from .bot import main
+from .bot import main, setup_logging
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,127 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+from src.bench.fake_telegram import FakeTelegramServer
+from src.bench.fixtures import DisposableDatabase
+from src.bench.scenarios import Benchmark
+from src.utils.settings import get_settings
+
+BENCH_TOKEN = "123456:bench"
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"],
+            text=True,
+            stderr=subprocess.DEVNULL,
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> dict:
+    # Настоящий токен не нужен и не должен уходить даже в заглушку
+    os.environ["API_TOKEN"] = BENCH_TOKEN
+    database = DisposableDatabase(args.database_url or get_settings().ASYNC_PG_DSN)
+    telegram = FakeTelegramServer(latency=args.api_latency)
+
+    await database.create()
+    await telegram.start()
+    os.environ.update(
+        DATABASE_URL=database.dsn,
+        TELEGRAM_API_URL=telegram.url,
+        SEND_RATE_LIMIT=str(args.send_rate),
+        METRICS_ENABLED="false",
+    )
+    try:
+        # Модули бота читают настройки при импорте: только после подмены окружения
+        from src import bot as app
+        from src.database.migrate import apply_migrations
+
+        await apply_migrations()
+        await app.db.init()
+        app.scheduler.start()
+        app.send_queue.start()
+        try:
+            bench = Benchmark(
+                app,
+                telegram,
+                repeat=args.repeat,
+                signups=args.signups,
+                concurrency=args.concurrency,
+            )
+            results = []
+            for users in args.users:
+                results += await bench.run_size(users)
+        finally:
+            app.scheduler.shutdown(wait=False)
+            await app.send_queue.close()
+            await app.db.close()
+            await app.bot.session.close()
+    finally:
+        await telegram.close()
+        await database.drop()
+
+    return {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "reminder_engine": app.settings.REMINDER_ENGINE,
+            "repeat": args.repeat,
+            "signups": args.signups,
+            "concurrency": args.concurrency,
+            "send_rate": args.send_rate,
+            "api_latency": args.api_latency,
+        },
+        "results": [result.as_dict() for result in results],
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    parser = argparse.ArgumentParser(description="Benchmarks against a fake Bot API")
+    parser.add_argument(
+        "--users",
+        type=int,
+        nargs="+",
+        default=[100, 10_000, 100_000],
+        help="database sizes to benchmark",
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="runs per scenario")
+    parser.add_argument(
+        "--signups", type=int, default=1000, help="registrations per run"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="parallel registrations"
+    )
+    parser.add_argument(
+        "--send-rate",
+        type=float,
+        default=10_000,
+        help="send queue rate limit, messages per second",
+    )
+    parser.add_argument(
+        "--api-latency",
+        type=float,
+        default=0,
+        help="fake Bot API response delay, seconds",
+    )
+    parser.add_argument(
+        "--database-url",
+        help="server for the disposable database (default: DATABASE_URL)",
+    )
+    parser.add_argument("--output", default="bench-results.json")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Results written to {args.output}")
@@ -0,0 +1,81 @@
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter
+
+from aiohttp import web
+
+BOT_USER = {
+    "id": 1_000_000,
+    "is_bot": True,
+    "first_name": "Bench",
+    "username": "bench_bot",
+}
+
+
+class FakeTelegramServer:
+    """
+    Заглушка Bot API на aiohttp: отвечает на методы, которые вызывает бот,
+    считает вызовы и может добавлять искусственную задержку ответа
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.calls: Counter[str] = Counter()
+        self.last_text: dict[int, str] = {}
+        # perf_counter() последнего сообщения в чат
+        self.last_at: dict[int, float] = {}
+        self._message_ids = itertools.count(1)
+        self._runner: web.AppRunner | None = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        # Порт 0 — свободный порт, выбранный системой
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def message(self, params) -> dict:
+        chat_id = int(params.get("chat_id", 0))
+        self.last_text[chat_id] = params.get("text", "")
+        self.last_at[chat_id] = time.perf_counter()
+        return {
+            "message_id": int(params.get("message_id") or next(self._message_ids)),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": params.get("text", ""),
+        }
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = await request.post()
+        self.calls[method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if method == "getme":
+            result = BOT_USER
+        elif method in ("sendmessage", "editmessagetext"):
+            result = self.message(params)
+        else:
+            result = True
+        return web.Response(
+            text=json.dumps({"ok": True, "result": result}),
+            content_type="application/json",
+        )
@@ -0,0 +1,92 @@
+import random
+import uuid
+from datetime import date, timedelta
+from urllib.parse import urlsplit, urlunsplit
+
+import asyncpg
+
+ADMIN_TELEGRAM_ID = 1
+# Группа по умолчанию из миграции 0007: в неё попадают все синтетические пользователи
+BENCH_GROUP_ID = 1
+# telegram_id синтетических пользователей не пересекаются с регистрациями
+SEED_TELEGRAM_BASE = 10_000_000
+SIGNUP_TELEGRAM_BASE = 50_000_000
+
+
+def with_database(dsn: str, database: str) -> str:
+    """DSN с другой базой данных на том же сервере"""
+    parts = urlsplit(dsn)
+    return urlunsplit(parts._replace(path=f"/{database}"))
+
+
+class DisposableDatabase:
+    """Временная база данных для бенчмарков: создаётся и удаляется целиком"""
+
+    def __init__(self, admin_dsn: str, prefix: str = "bday_bench"):
+        self.admin_dsn = admin_dsn
+        self.name = f"{prefix}_{uuid.uuid4().hex[:8]}"
+        self.dsn = with_database(admin_dsn, self.name)
+
+    async def create(self):
+        conn = await asyncpg.connect(self.admin_dsn)
+        try:
+            # Строковые функции поиска по ФИО работают с символами, а не байтами
+            await conn.execute(
+                f"CREATE DATABASE \"{self.name}\" ENCODING 'UTF8' TEMPLATE template0"
+            )
+        finally:
+            await conn.close()
+
+    async def drop(self):
+        conn = await asyncpg.connect(self.admin_dsn)
+        try:
+            await conn.execute(f'DROP DATABASE IF EXISTS "{self.name}" WITH (FORCE)')
+        finally:
+            await conn.close()
+
+
+def synthetic_users(count: int, seed: int = 0):
+    """Записи bot_bday.users: первый пользователь — администратор"""
+    rng = random.Random(seed)
+    first_day = date(1970, 1, 1)
+    for i in range(count):
+        yield (
+            ADMIN_TELEGRAM_ID if i == 0 else SEED_TELEGRAM_BASE + i,
+            f"Пользователь {i:06d}",
+            first_day + timedelta(days=rng.randrange(365 * 35)),
+            f"Пожелание {rng.randrange(1000)}",
+            i == 0,
+            BENCH_GROUP_ID,
+        )
+
+
+async def reset(conn: asyncpg.Connection):
+    """Очистка данных бота перед очередным размером выборки"""
+    await conn.execute("""
+        TRUNCATE bot_bday.users RESTART IDENTITY CASCADE;
+        TRUNCATE bot_bday.fsm_storage;
+        DELETE FROM bot_bday.apscheduler_jobs;
+        """)
+
+
+async def seed_users(conn: asyncpg.Connection, count: int, seed: int = 0) -> int:
+    """Заполнение таблицы пользователей одним COPY и вступление в группу"""
+    await conn.copy_records_to_table(
+        "users",
+        schema_name="bot_bday",
+        columns=[
+            "telegram_id",
+            "full_name",
+            "birthday",
+            "wish",
+            "is_admin",
+            "current_group_id",
+        ],
+        records=synthetic_users(count, seed),
+    )
+    await conn.execute("""
+        INSERT INTO bot_bday.group_members (group_id, user_id)
+        SELECT current_group_id, id FROM bot_bday.users
+        """)
+    await conn.execute("ANALYZE bot_bday.users, bot_bday.group_members")
+    return count
@@ -0,0 +1,191 @@
+import asyncio
+import itertools
+import statistics
+import time
+from dataclasses import dataclass, field
+from types import ModuleType
+from typing import Any, Awaitable, Callable
+
+from src.bench.fake_telegram import FakeTelegramServer
+from src.bench.fixtures import (
+    ADMIN_TELEGRAM_ID,
+    SIGNUP_TELEGRAM_BASE,
+    reset,
+    seed_users,
+)
+from src.bench.updates import message_update, registration_flow
+
+# Номер страницы заведомо больше последней: курсор проходит весь список
+LAST_PAGE = "1000000"
+
+
+class BenchmarkError(Exception):
+    pass
+
+
+@dataclass
+class Result:
+    scenario: str
+    users: int
+    runs: list[float]
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "scenario": self.scenario,
+            "users": self.users,
+            "runs": [round(run, 6) for run in self.runs],
+            "min": round(min(self.runs), 6),
+            "median": round(statistics.median(self.runs), 6),
+            "max": round(max(self.runs), 6),
+            **self.extra,
+        }
+
+
+class Benchmark:
+    """Сценарии поверх модуля бота, заглушки Bot API и временной базы"""
+
+    def __init__(
+        self,
+        app: ModuleType,
+        telegram: FakeTelegramServer,
+        repeat: int = 3,
+        signups: int = 1000,
+        concurrency: int = 50,
+    ):
+        self.app = app
+        self.telegram = telegram
+        self.repeat = repeat
+        self.signups = signups
+        self.concurrency = concurrency
+        self._signup_ids = itertools.count(SIGNUP_TELEGRAM_BASE)
+
+    def clear_caches(self):
+        self.app.profiles.clear()
+        self.app.db.admin_cache.clear()
+        self.app.storage.cache.clear()
+
+    async def command(self, text: str, expect: str | None = None):
+        """Команда администратора через Dispatcher, как из Telegram"""
+        await self.app.dp.feed_update(
+            self.app.bot, message_update(ADMIN_TELEGRAM_ID, text)
+        )
+        answer = self.telegram.last_text.get(ADMIN_TELEGRAM_ID, "")
+        if expect is not None and expect not in answer:
+            raise BenchmarkError(f"{text}: неожиданный ответ {answer[:200]!r}")
+
+    async def measure(
+        self,
+        scenario: str,
+        users: int,
+        run: Callable[[], Awaitable[Any]],
+        repeat: int | None = None,
+    ) -> Result:
+        runs = []
+        extra = {}
+        for _ in range(repeat or self.repeat):
+            started = time.perf_counter()
+            extra = await run() or {}
+            runs.append(time.perf_counter() - started)
+        result = Result(scenario, users, runs, extra)
+        print(
+            f"{scenario:<28} {users:>8} users  "
+            f"median {statistics.median(runs):9.4f}s  min {min(runs):9.4f}s"
+        )
+        return result
+
+    async def seed(self, users: int):
+        async with self.app.db.acquire() as conn:
+            await reset(conn)
+            await seed_users(conn, users)
+        await self.app.clear_all_reminders()
+        self.clear_caches()
+
+    async def random(self) -> dict[str, Any]:
+        """/random: ответ приходит до записи задач напоминаний, прогон — после"""
+        started = time.perf_counter()
+        await self.command("/random", expect="Успешно")
+        reply = self.telegram.last_at[ADMIN_TELEGRAM_ID] - started
+        return {"reply_seconds": round(reply, 6)}
+
+    async def reminder_burst(self) -> dict[str, Any]:
+        """
+        Все подопечные получают напоминание одновременно, до опустошения очереди.
+        Одновременно с БД работают REMINDER_JOB_CONCURRENCY задач, как в боте
+        """
+        # Ключ идемпотентности не дал бы повторить отправку в следующем прогоне
+        await self.app.db.execute(
+            "bench_clear_outbox", "DELETE FROM bot_bday.reminder_outbox"
+        )
+        targets = await self.app.repo.reminder_targets()
+        # Не минимальный отступ: иначе send_reminder перепланирует следующий год
+        days_before = max(self.app.REMINDER_OFFSETS)
+        sent_before = self.telegram.calls["sendmessage"]
+
+        started = time.perf_counter()
+        await asyncio.gather(
+            *(
+                self.app.send_reminder(
+                    row["group_id"], row["giver_id"], row["id"], days_before
+                )
+                for row in targets
+            )
+        )
+        enqueued = time.perf_counter() - started
+        await self.app.outbox.drain()
+        await self.app.send_queue.drain()
+        return {
+            "enqueue_seconds": round(enqueued, 6),
+            "messages": self.telegram.calls["sendmessage"] - sent_before,
+        }
+
+    async def registration(self) -> dict[str, Any]:
+        """Параллельные регистрации новых пользователей через RegStates"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def register(telegram_id: int):
+            async with semaphore:
+                for update in registration_flow(telegram_id):
+                    await self.app.dp.feed_update(self.app.bot, update)
+
+        ids = [next(self._signup_ids) for _ in range(self.signups)]
+        started = time.perf_counter()
+        await asyncio.gather(*(register(telegram_id) for telegram_id in ids))
+        elapsed = time.perf_counter() - started
+
+        registered = await self.app.db.fetchval(
+            "bench_registered",
+            "SELECT count(*) FROM bot_bday.users WHERE telegram_id = ANY($1::bigint[])",
+            ids,
+        )
+        if registered != len(ids):
+            raise BenchmarkError(
+                f"Зарегистрировано {registered} из {len(ids)} пользователей"
+            )
+        return {
+            "signups": len(ids),
+            "signups_per_second": round(len(ids) / elapsed, 2),
+        }
+
+    async def run_size(self, users: int) -> list[Result]:
+        """Все сценарии на базе из users пользователей"""
+        results = [await self.measure("seed", users, lambda: self.seed(users), 1)]
+        scenarios = [
+            ("random", self.random),
+            ("schedule_all_reminders", self.app.schedule_all_reminders),
+            ("users_first_page", lambda: self.command("/users", expect="ID:")),
+            (
+                "users_last_page",
+                lambda: self.command(f"/users {LAST_PAGE}", expect="ID:"),
+            ),
+            ("pairs_first_page", lambda: self.command("/pairs", expect="Даритель")),
+            (
+                "pairs_last_page",
+                lambda: self.command(f"/pairs {LAST_PAGE}", expect="Даритель"),
+            ),
+            ("reminder_burst", self.reminder_burst),
+            ("registration", self.registration),
+        ]
+        for scenario, run in scenarios:
+            results.append(await self.measure(scenario, users, run))
+        return results
@@ -0,0 +1,59 @@
+import itertools
+import time
+
+from aiogram.types import Update
+
+_update_ids = itertools.count(1)
+
+
+def _user(telegram_id: int) -> dict:
+    return {"id": telegram_id, "is_bot": False, "first_name": f"User{telegram_id}"}
+
+
+def message_update(telegram_id: int, text: str) -> Update:
+    """Обновление с текстовым сообщением пользователя в личном чате"""
+    update_id = next(_update_ids)
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": telegram_id, "type": "private"},
+                "from": _user(telegram_id),
+                "text": text,
+            },
+        }
+    )
+
+
+def callback_update(telegram_id: int, data: str, message_id: int = 1) -> Update:
+    """Нажатие inline-кнопки под сообщением бота"""
+    update_id = next(_update_ids)
+    return Update.model_validate(
+        {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": _user(telegram_id),
+                "chat_instance": str(telegram_id),
+                "data": data,
+                "message": {
+                    "message_id": message_id,
+                    "date": int(time.time()),
+                    "chat": {"id": telegram_id, "type": "private"},
+                    "text": "…",
+                },
+            },
+        }
+    )
+
+
+def registration_flow(telegram_id: int, birthday: str = "01.01.1990") -> list[Update]:
+    """Полная регистрация через RegStates: /start, ФИО, дата, пожелания"""
+    return [
+        message_update(telegram_id, "/start"),
+        message_update(telegram_id, f"Пользователь {telegram_id}"),
+        message_update(telegram_id, birthday),
+        message_update(telegram_id, "Книга"),
+    ]
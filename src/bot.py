@@ -1,31 +1,75 @@
 import asyncio
+import html
 import logging
-import random
+import math
+import pickle
+import re
+import secrets
+import tempfile
+from contextlib import suppress
 from datetime import date, datetime, time, timedelta
+from functools import lru_cache
 
 import pytz
-from aiogram import Bot, Dispatcher, Router, types
-from aiogram.filters import Command
+from aiogram import Bot, Dispatcher, F, Router, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.filters import Command, CommandObject
+from aiogram.filters.callback_data import CallbackData
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
-from aiogram.fsm.storage.memory import MemoryStorage
-from aiogram.types import KeyboardButton, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from aiogram.types import (
+    FSInputFile,
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+)
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+from apscheduler.job import Job
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.base import STATE_RUNNING
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.date import DateTrigger
+from apscheduler.util import datetime_to_utc_timestamp
 
+from src.database.birthdays import month_days_for, next_occurrence
 from src.database.db import db
+from src.database.migrate import apply_migrations
+from src.database.pairs import pairs
+from src.database.profiles import profiles
+from src.database.repository import repo
+from src.database.storage import PostgresStorage
+from src.utils.leader import LeaderElection
+from src.utils.metrics import LAG_BUCKETS, registry, start_metrics_server
+from src.utils.middleware import MetricsMiddleware
+from src.utils.outbox import ReminderOutbox
+from src.utils.pairing import Constraints, Pairing, plan_pairs
+from src.utils.send_queue import SendQueue
 from src.utils.settings import get_settings
-
-logging.basicConfig(
-    filename="event_log.txt",
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    encoding="utf-8",
-)
+from src.utils.user_csv import read_users_csv
 
 settings = get_settings()
-bot = Bot(token=settings.API_TOKEN)
-storage = MemoryStorage()
+bot = Bot(
+    token=settings.API_TOKEN,
+    session=(
+        AiohttpSession(api=TelegramAPIServer.from_base(settings.TELEGRAM_API_URL))
+        if settings.TELEGRAM_API_URL
+        else None
+    ),
+)
+storage = PostgresStorage(
+    db,
+    state_ttl=settings.FSM_STATE_TTL,
+    # Состояние, записанное другой репликой, кэш процесса не увидел бы
+    cache_ttl=settings.FSM_CACHE_TTL if settings.BOT_REPLICAS == 1 else 0,
+    cache_size=settings.FSM_CACHE_SIZE,
+)
 dp = Dispatcher(storage=storage)
 router = Router()
 
@@ -41,31 +85,136 @@ class RegStates(StatesGroup):
 
 
 REMINDER_OFFSETS = settings.REMINDER_OFFSETS
-scheduler = AsyncIOScheduler()
+REMINDER_HOUR = settings.REMINDER_HOUR
+REMINDER_JOBSTORE = "reminders"
+REMINDER_SWEEP_JOB_ID = "reminder_sweep"
+# Подопечных на один запрос записи задач
+REMINDER_JOB_BATCH = 10_000
+JOB_DEFAULTS = {
+    "coalesce": True,
+    "misfire_grace_time": settings.REMINDER_MISFIRE_GRACE_TIME,
+}
+# Напоминания переживают перезапуск: хранятся в Postgres
+reminder_jobstore = SQLAlchemyJobStore(
+    url=settings.SQLALCHEMY_DSN,
+    tablename="apscheduler_jobs",
+    tableschema="bot_bday",
+)
+scheduler = AsyncIOScheduler(
+    jobstores={REMINDER_JOBSTORE: reminder_jobstore},
+    job_defaults=JOB_DEFAULTS,
+)
+REMINDER_SEND_LAG = registry.histogram(
+    "bot_reminder_send_lag_seconds",
+    "Задержка отправки напоминания относительно времени по расписанию",
+    buckets=LAG_BUCKETS,
+)
+send_queue = SendQueue(
+    bot.send_message,
+    rate=settings.SEND_RATE_LIMIT,
+    chat_interval=settings.SEND_CHAT_INTERVAL,
+    workers=settings.SEND_WORKERS,
+    max_retries=settings.SEND_MAX_RETRIES,
+    lag_metric=REMINDER_SEND_LAG,
+)
+outbox = ReminderOutbox(
+    repo,
+    send_queue,
+    workers=settings.OUTBOX_WORKERS,
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    claim_timeout=settings.OUTBOX_CLAIM_TIMEOUT,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL,
+)
+reminder_slots = asyncio.Semaphore(settings.REMINDER_JOB_CONCURRENCY)
 MSK = pytz.timezone("Europe/Moscow")
 
+
+async def scheduler_job_counts() -> dict[tuple[str], int]:
+    """Число задач планировщика по хранилищам"""
+    return {
+        ("default",): len(scheduler.get_jobs(jobstore="default")),
+        # Хранилище напоминаний общее для реплик: считается по таблице
+        (REMINDER_JOBSTORE,): await repo.count_scheduler_jobs(),
+    }
+
+
+registry.gauge(
+    "bot_scheduler_jobs",
+    "Задачи планировщика",
+    labels=("jobstore",),
+    collect=scheduler_job_counts,
+)
+registry.gauge(
+    "bot_send_queue_depth",
+    "Чаты, ожидающие отправки",
+    collect=lambda: send_queue.depth,
+)
+registry.gauge(
+    "bot_reminder_outbox_rows",
+    "Строки очереди напоминаний по статусу",
+    labels=("status",),
+    collect=repo.reminder_outbox_counts,
+)
+
 USER_COMMANDS = [
     "/start — регистрация или повторное приветствие",
     "/me — мои данные",
     "/ward — мой подопечный",
     "/edit — изменить профиль",
+    "/groups — мои группы",
+    "/group [id] — перейти в группу",
+    "/join [код] — вступить в группу по коду приглашения",
     "/menu — список команд",
     "/help — помощь и инструкция",
 ]
 
+# Команды с парами и напоминаниями относятся к текущей группе администратора
 ADMIN_COMMANDS = [
-    "/users — список всех пользователей",
+    "/new_group [название] — создать группу",
+    "/users [страница] — участники группы",
     "/set [giver_id] [ward_id] — вручную назначить пару",
-    "/set_name [ФИО_дарителя] [ФИО_подопечного] — назначить по ФИО",
-    "/random — рандомное распределение пар",
-    "/reminders — расписание напоминаний",
-    "/pairs — таблица пар",
+    "/set_name [ФИО_дарителя] [ФИО_подопечного] — назначить по ФИО или его части",
+    "/random [preview|force] [seed] — распределение пар "
+    "(preview — без записи, force — записать и с нарушениями)",
+    "/exclude [giver_id] [ward_id] — запретить пару при распределении",
+    "/allow [giver_id] [ward_id] — снять запрет пары",
+    "/reminders [страница] — расписание напоминаний",
+    "/pairs [страница] — таблица пар",
+    "/upcoming [дней] — ближайшие дни рождения",
+    "/import — загрузить участников из CSV (подпись или ответ на файл)",
+    "/export — выгрузить участников и пары в CSV",
     "/make_admin [telegram_id] — назначить админом",
     "/admin_revoke [telegram_id] — лишить пользователя прав админа",
     "/delete [telegram_id] — удалить пользователя",
     "/reset [user_id] — сбросить связь пользователя",
 ]
 
+GROUP_CODE_BYTES = 6
+
+
+REMINDERS_PAGE_SIZE = 15
+UPCOMING_DEFAULT_DAYS = 30
+UPCOMING_LIMIT = 30
+USERS_PAGE_SIZE = 10
+GROUPS_PAGE_SIZE = 20
+# Сколько ошибочных строк импорта показывать в ответе
+IMPORT_ERRORS_SHOWN = 10
+PAIRS_PAGE_SIZE = 12
+# Кандидатов на каждую сторону в /set_name и вариантов пар на клавиатуре выбора
+NAME_CANDIDATES = 5
+NAME_CHOICES = 8
+# Длина полей в постраничных списках: страница гарантированно < 4096 символов
+PAGE_NAME_LIMIT = 60
+PAGE_WISH_LIMIT = 120
+
+
+class PageCallback(CallbackData, prefix="page"):
+    view: str
+    page: int
+    # Группа, к которой относится список: листание не зависит от смены группы
+    group: int = 0
+
 
 def format_bday(bday: date | None) -> str:
     """Форматирование даты рождения"""
@@ -74,24 +223,94 @@ def format_bday(bday: date | None) -> str:
     return bday.strftime("%d.%m.%Y")
 
 
+class SetPairCallback(CallbackData, prefix="setpair"):
+    group: int
+    giver: int
+    ward: int
+
+
+def shorten(text: str | None, limit: int) -> str:
+    """Укорачивание текста до limit символов"""
+    text = text or "—"
+    if len(text) > limit:
+        text = text[: limit - 1] + "…"
+    return text
+
+
+def format_name(name: str | None) -> str:
+    """Экранированное и укороченное имя для HTML-страниц"""
+    return html.escape(shorten(name, PAGE_NAME_LIMIT))
+
+
+def parse_page_arg(message: types.Message) -> int:
+    """Номер страницы из аргумента команды (с 1), возвращается индекс с 0"""
+    parts = message.text.split()
+    if len(parts) > 1 and parts[1].isdigit():
+        return max(int(parts[1]) - 1, 0)
+    return 0
+
+
+def page_keyboard(
+    view: str, page: int, pages: int, group: int = 0
+) -> InlineKeyboardMarkup | None:
+    """Кнопки навигации по страницам"""
+    if pages <= 1:
+        return None
+
+    buttons = []
+    if page > 0:
+        buttons.append(
+            InlineKeyboardButton(
+                text="◀",
+                callback_data=PageCallback(
+                    view=view, page=page - 1, group=group
+                ).pack(),
+            )
+        )
+    buttons.append(
+        InlineKeyboardButton(
+            text=f"{page + 1}/{pages}",
+            callback_data=PageCallback(view=view, page=page, group=group).pack(),
+        )
+    )
+    if page < pages - 1:
+        buttons.append(
+            InlineKeyboardButton(
+                text="▶",
+                callback_data=PageCallback(
+                    view=view, page=page + 1, group=group
+                ).pack(),
+            )
+        )
+    return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
 # ===== ОСНОВНЫЕ ХЕНДЛЕРЫ =====
 
 
 # --- РЕГИСТРАЦИЯ ---
 @router.message(Command("start"))
-async def cmd_start(message: types.Message, state: FSMContext):
-    """Обработчик команды /start"""
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT * FROM bot_bday.users WHERE telegram_id = $1", message.from_user.id
-        )
+async def cmd_start(message: types.Message, state: FSMContext, command: CommandObject):
+    """Обработчик команды /start; аргумент — код приглашения в группу"""
+    user = await profiles.by_telegram_id(message.from_user.id)
+
+    group = None
+    if command.args:
+        group = await repo.get_group_by_code(command.args.strip())
+        if not group:
+            await message.answer("Код приглашения не найден.")
 
     if user:
+        if group:
+            await join_and_report(message, user, group)
+            return
         await message.answer(
             "Вы уже зарегистрированы!\nДля изменения профиля используйте /edit"
         )
         logging.info(f"/start повторно: telegram_id={message.from_user.id}")
     else:
+        if group:
+            await state.update_data(group_id=group["id"])
         welcome_text = (
             "👋 <b>Добро пожаловать!</b>\n\n"
             'Этот бот поможет вам участвовать в системе "Тайный даритель" на дни рождения.\n'
@@ -133,17 +352,14 @@ async def reg_birthday(message: types.Message, state: FSMContext):
 async def reg_wish(message: types.Message, state: FSMContext):
     """Завершение регистрации"""
     data = await state.get_data()
-    async with db.pool.acquire() as conn:
-        await conn.execute(
-            """
-            INSERT INTO bot_bday.users (telegram_id, full_name, birthday, wish, registered_at)
-            VALUES ($1, $2, $3, $4, NOW())
-            """,
-            message.from_user.id,
-            data["full_name"],
-            data["birthday"],
-            message.text,
-        )
+    user = await repo.create_user(
+        message.from_user.id,
+        data["full_name"],
+        data["birthday"],
+        message.text,
+        data.get("group_id", settings.DEFAULT_GROUP_ID),
+    )
+    profiles.put(user)
     logging.info(
         f"Регистрация: telegram_id={message.from_user.id}, ФИО={data['full_name']}"
     )
@@ -157,11 +373,7 @@ async def reg_wish(message: types.Message, state: FSMContext):
 @router.message(Command("me"))
 async def show_my_data(message: types.Message):
     """Показ данных пользователя"""
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT full_name, birthday, wish FROM bot_bday.users WHERE telegram_id = $1",
-            message.from_user.id,
-        )
+    user = await profiles.by_telegram_id(message.from_user.id)
 
     if not user:
         await message.answer("Вы не зарегистрированы.")
@@ -177,19 +389,11 @@ async def show_my_data(message: types.Message):
 @router.message(Command("ward"))
 async def show_ward(message: types.Message):
     """Показ подопечного"""
-    async with db.pool.acquire() as conn:
-        row = await conn.fetchrow(
-            "SELECT ward_id FROM bot_bday.users WHERE telegram_id = $1", message.from_user.id
-        )
+    user, ward = await profiles.ward_of(message.from_user.id)
 
-        if not row or not row.get("ward_id"):
-            await message.answer("Вам пока не назначен подопечный.")
-            return
-
-        ward_id = row["ward_id"]
-        ward = await conn.fetchrow(
-            "SELECT full_name, birthday, wish FROM bot_bday.users WHERE id = $1", ward_id
-        )
+    if not user or not user["ward_id"]:
+        await message.answer("Вам пока не назначен подопечный.")
+        return
 
     if not ward:
         await message.answer("Информация о подопечном не найдена.")
@@ -248,12 +452,7 @@ async def edit_menu_handler(message: types.Message, state: FSMContext):
 @router.message(RegStates.edit_full_name)
 async def edit_full_name(message: types.Message, state: FSMContext):
     """Изменение ФИО"""
-    async with db.pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE bot_bday.users SET full_name = $1 WHERE telegram_id = $2",
-            message.text,
-            message.from_user.id,
-        )
+    await profiles.update(message.from_user.id, full_name=message.text)
     await state.clear()
     await message.answer("ФИО успешно обновлено!")
 
@@ -267,12 +466,10 @@ async def edit_birthday(message: types.Message, state: FSMContext):
         await message.answer("Неверный формат даты. Введите в формате ДД.MM.ГГГГ:")
         return
 
-    async with db.pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE bot_bday.users SET birthday = $1 WHERE telegram_id = $2",
-            b,
-            message.from_user.id,
-        )
+    user = await profiles.update(message.from_user.id, birthday=b)
+    if user:
+        groups = await repo.user_groups(user["id"])
+        await reschedule_reminders(*((group["id"], user["id"]) for group in groups))
     await state.clear()
     await message.answer("Дата рождения успешно обновлена!")
 
@@ -280,160 +477,414 @@ async def edit_birthday(message: types.Message, state: FSMContext):
 @router.message(RegStates.edit_wish)
 async def edit_wish(message: types.Message, state: FSMContext):
     """Изменение пожеланий"""
-    async with db.pool.acquire() as conn:
-        await conn.execute(
-            "UPDATE bot_bday.users SET wish = $1 WHERE telegram_id = $2",
-            message.text,
-            message.from_user.id,
-        )
+    await profiles.update(message.from_user.id, wish=message.text)
     await state.clear()
     await message.answer("Пожелания успешно обновлены!")
 
 
-# --- АДМИНСКИЕ КОМАНДЫ ---
-@router.message(Command("users"))
-async def show_users(message: types.Message):
-    """Список всех пользователей"""
+# --- ГРУППЫ ---
+async def join_and_report(message: types.Message, user, group):
+    """Вступление в группу с переходом в неё"""
+    joined = await repo.join_group(group["id"], user["id"])
+    profiles.invalidate(user["id"])
+    title = html.escape(group["title"])
+    if joined:
+        logging.info(
+            f"Вступление в группу: telegram_id={message.from_user.id}, "
+            f"группа={group['id']}"
+        )
+        await message.answer(f"Вы вступили в группу «{title}».", parse_mode="HTML")
+    else:
+        await message.answer(
+            f"Вы уже состоите в группе «{title}», она выбрана текущей.",
+            parse_mode="HTML",
+        )
+
+
+@router.message(Command("join"))
+async def join_group(message: types.Message, command: CommandObject):
+    """Вступление в группу по коду приглашения"""
+    user = await profiles.by_telegram_id(message.from_user.id)
+    if not user:
+        await message.answer("Сначала зарегистрируйтесь через /start.")
+        return
+
+    if not command.args:
+        await message.answer("Использование: /join [код]")
+        return
+
+    group = await repo.get_group_by_code(command.args.strip())
+    if not group:
+        await message.answer("Код приглашения не найден.")
+        return
+
+    await join_and_report(message, user, group)
+
+
+@router.message(Command("group"))
+async def switch_group(message: types.Message, command: CommandObject):
+    """Выбор текущей группы"""
+    user = await profiles.by_telegram_id(message.from_user.id)
+    if not user:
+        await message.answer("Вы не зарегистрированы.")
+        return
+
+    try:
+        group_id = int(command.args)
+    except (TypeError, ValueError):
+        await message.answer("Использование: /group [id]")
+        return
+
+    # Администратор управляет любой группой, участник — только своими
+    if await db.is_admin(message.from_user.id):
+        group = await repo.get_group(group_id)
+    else:
+        groups = await repo.user_groups(user["id"])
+        group = next((g for g in groups if g["id"] == group_id), None)
+    if not group:
+        await message.answer(f"Группа с ID {group_id} не найдена среди ваших групп.")
+        return
+
+    await repo.set_current_group(user["id"], group_id)
+    profiles.invalidate(user["id"])
+    await message.answer(
+        f"Текущая группа: «{html.escape(group['title'])}».", parse_mode="HTML"
+    )
+
+
+async def render_groups_page(
+    group_id: int, page: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Страница списка всех групп; group_id — текущая группа администратора"""
+    groups, page, pages = await repo.groups_page(page, GROUPS_PAGE_SIZE)
+    if not groups:
+        return "Групп нет.", None
+
+    lines = ["<b>Группы:</b>\n"]
+    for g in groups:
+        current = " ← текущая" if g["id"] == group_id else ""
+        lines.append(
+            f"ID: {g['id']} — {format_name(g['title'])}{current}\n"
+            f"Участников: {g['members']}, код: <code>{html.escape(g['code'])}</code>"
+        )
+
+    return "\n".join(lines), page_keyboard("groups", page, pages, group_id)
+
+
+@router.message(Command("groups"))
+async def show_groups(message: types.Message):
+    """Группы пользователя; администратору — все группы"""
+    user = await profiles.by_telegram_id(message.from_user.id)
+    if not user:
+        await message.answer("Вы не зарегистрированы.")
+        return
+
+    if await db.is_admin(message.from_user.id):
+        text, kb = await render_groups_page(
+            user["current_group_id"] or 0, parse_page_arg(message)
+        )
+        await message.answer(text, parse_mode="HTML", reply_markup=kb)
+        return
+
+    groups = await repo.user_groups(user["id"])
+    if not groups:
+        await message.answer("Вы не состоите ни в одной группе. Вступить: /join [код]")
+        return
+
+    lines = ["<b>Ваши группы:</b>\n"]
+    for g in groups:
+        current = " ← текущая" if g["id"] == user["current_group_id"] else ""
+        lines.append(f"ID: {g['id']} — {format_name(g['title'])}{current}")
+    lines.append("\nПерейти в другую группу: /group [id]")
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("new_group"))
+async def create_group(message: types.Message, command: CommandObject):
+    """Создание группы с кодом приглашения"""
     if not await db.is_admin(message.from_user.id):
         await message.answer("Доступ запрещён.")
         return
 
-    async with db.pool.acquire() as conn:
-        users = await conn.fetch(
-            "SELECT id, full_name, birthday, wish, telegram_id, is_admin, ward_id, giver_id FROM bot_bday.users ORDER BY id"
-        )
+    title = (command.args or "").strip()
+    if not title:
+        await message.answer("Использование: /new_group [название]")
+        return
+
+    group = await repo.create_group(title, secrets.token_urlsafe(GROUP_CODE_BYTES))
+    user = await profiles.by_telegram_id(message.from_user.id)
+    await repo.set_current_group(user["id"], group["id"])
+    profiles.invalidate(user["id"])
+    logging.info(f"Создана группа {group['id']}: {title}")
+
+    me = await bot.me()
+    await message.answer(
+        f"Группа «{html.escape(title)}» создана (ID: {group['id']}) и выбрана текущей.\n"
+        f"Код приглашения: <code>{html.escape(group['code'])}</code>\n"
+        f"Ссылка: https://t.me/{me.username}?start={group['code']}",
+        parse_mode="HTML",
+    )
+
+
+# --- АДМИНСКИЕ КОМАНДЫ ---
+async def admin_group(message: types.Message) -> int | None:
+    """Текущая группа администратора; None — нет доступа или группа не выбрана"""
+    if not await db.is_admin(message.from_user.id):
+        await message.answer("Доступ запрещён.")
+        return None
+
+    user = await profiles.by_telegram_id(message.from_user.id)
+    if not user or not user["current_group_id"]:
+        await message.answer("Сначала выберите группу: /groups, затем /group [id].")
+        return None
+    return user["current_group_id"]
+
 
+async def render_users_page(
+    group_id: int, page: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Страница списка участников группы"""
+    users, page, pages = await repo.users_page(group_id, page, USERS_PAGE_SIZE)
     if not users:
-        await message.answer("Пользователей нет.")
-        return
+        return "В группе нет участников.", None
 
-    text = "Пользователи:\n\n"
+    lines = ["<b>Пользователи:</b>\n"]
     for u in users:
-        text += (
-            f"ID: {u['id']}\nФИО: {u['full_name']}\n"
-            f"ДР: {format_bday(u['birthday'])}\nПожелания: {u['wish']}\n"
+        lines.append(
+            f"ID: {u['id']}\nФИО: {format_name(u['full_name'])}\n"
+            f"ДР: {format_bday(u['birthday'])}\n"
+            f"Пожелания: {html.escape(shorten(u['wish'], PAGE_WISH_LIMIT))}\n"
             f"TG: {u['telegram_id']}\nАдмин: {int(u['is_admin'])}\n"
-            f"Подопечный: {u['ward_id']}\nДаритель: {u['giver_id']}\n---\n"
+            f"Подопечный: {u['ward_id']}\nДаритель: {u['giver_id']}\n---"
         )
 
-    await message.answer(text)
+    return "\n".join(lines), page_keyboard("users", page, pages, group_id)
+
+
+async def render_pairs_page(
+    group_id: int, page: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Страница таблицы пар даритель-подопечный группы"""
+    pairs, page, pages = await repo.pairs_page(group_id, page, PAIRS_PAGE_SIZE)
+    if not pairs:
+        return "Нет активных пар даритель-подопечный.", None
+
+    lines = ["<b>Таблица пар даритель → подопечный:</b>\n"]
+    for i, pair in enumerate(pairs, page * PAIRS_PAGE_SIZE + 1):
+        ward_bday = pair["ward_birthday"]
+        bday_formatted = ward_bday.strftime("%d.%m.%Y") if ward_bday else "не указана"
+
+        lines.append(
+            f"{i}. <b>Даритель:</b> {format_name(pair['giver_name'])} "
+            f"(ID: {pair['giver_telegram_id']})\n"
+            f"   <b>Подопечный:</b> {format_name(pair['ward_name'])} "
+            f"(ID: {pair['ward_telegram_id']})\n"
+            f"   <b>День рождения подопечного:</b> {bday_formatted}\n"
+        )
+
+    return "\n".join(lines), page_keyboard("pairs", page, pages, group_id)
+
+
+@router.message(Command("users"))
+async def show_users(message: types.Message):
+    """Список участников группы"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    text, kb = await render_users_page(group_id, parse_page_arg(message))
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
 
 
 @router.message(Command("pairs"))
 async def show_pairs(message: types.Message):
     """Таблица пар даритель-подопечный"""
-    if not await db.is_admin(message.from_user.id):
-        await message.answer("Доступ запрещён.")
+    group_id = await admin_group(message)
+    if group_id is None:
         return
 
     try:
-        async with db.pool.acquire() as conn:
-            pairs = await conn.fetch(
-                """
-                SELECT
-                    g.id AS giver_id,
-                    g.telegram_id AS giver_telegram_id,
-                    g.full_name AS giver_name,
-                    w.id AS ward_id,
-                    w.telegram_id AS ward_telegram_id,
-                    w.full_name AS ward_name,
-                    w.birthday AS ward_birthday
-                FROM
-                    bot_bday.users g
-                JOIN
-                    bot_bday.users w ON g.ward_id = w.id
-                ORDER BY
-                    w.birthday
-            """
-            )
+        text, kb = await render_pairs_page(group_id, parse_page_arg(message))
+        await message.answer(text, parse_mode="HTML", reply_markup=kb)
+    except Exception as e:
+        logging.exception(f"Ошибка при получении таблицы пар: {e}")
+        await message.answer(f"Произошла ошибка: {str(e)}")
 
-            if not pairs:
-                await message.answer("Нет активных пар даритель-подопечный.")
-                return
 
-            text = "<b>Таблица пар даритель → подопечный:</b>\n\n"
+PAIRING_VIOLATIONS_LIMIT = 20
 
-            for i, pair in enumerate(pairs, 1):
-                ward_bday = pair["ward_birthday"]
-                bday_formatted = (
-                    ward_bday.strftime("%d.%m.%Y") if ward_bday else "не указана"
-                )
 
-                text += (
-                    f"{i}. <b>Даритель:</b> {pair['giver_name']} (ID: {pair['giver_telegram_id']})\n"
-                    f"   <b>Подопечный:</b> {pair['ward_name']} (ID: {pair['ward_telegram_id']})\n"
-                    f"   <b>День рождения подопечного:</b> {bday_formatted}\n\n"
-                )
+async def plan_distribution(group_id: int, seed: int | None = None) -> Pairing:
+    """Распределение пар группы с учётом запретов, истории и дат рождения"""
+    users = await repo.pairing_candidates(group_id)
+    constraints = Constraints(
+        exclusions=await repo.pair_exclusions(),
+        history=await repo.pair_history(group_id, settings.PAIRING_HISTORY_YEARS),
+        birthdays={user["id"]: user["birthday"] for user in users},
+        min_birthday_distance=settings.PAIRING_MIN_BIRTHDAY_DISTANCE,
+    )
+    # Построение — чистый CPU: не задерживаем обработку других обновлений
+    return await asyncio.to_thread(
+        plan_pairs,
+        [user["id"] for user in users],
+        constraints,
+        settings.PAIRING_ENGINE,
+        seed,
+    )
 
-            if len(text) > 4000:
-                parts = [text[i : i + 4000] for i in range(0, len(text), 4000)]
-                for part in parts:
-                    await message.answer(part, parse_mode="HTML")
-            else:
-                await message.answer(text, parse_mode="HTML")
 
-    except Exception as e:
-        logging.exception(f"Ошибка при получении таблицы пар: {e}")
-        await message.answer(f"Произошла ошибка: {str(e)}")
+def pairing_report(pairing: Pairing) -> str:
+    """Сводка распределения и нарушенных ограничений"""
+    text = (
+        f"Движок: {pairing.engine}, seed: {pairing.seed}\n"
+        f"Пар: {len(pairing.pairs)}, нарушений: {len(pairing.violations)}"
+    )
+    if pairing.violations:
+        text += "\n\n" + "\n".join(
+            str(v) for v in pairing.violations[:PAIRING_VIOLATIONS_LIMIT]
+        )
+        if len(pairing.violations) > PAIRING_VIOLATIONS_LIMIT:
+            text += f"\n…и ещё {len(pairing.violations) - PAIRING_VIOLATIONS_LIMIT}"
+    return text
 
 
 @router.message(Command("random"))
 async def random_distribution(message: types.Message):
-    """Рандомное распределение пар"""
-    if not await db.is_admin(message.from_user.id):
-        await message.answer("Доступ запрещён.")
+    """Рандомное распределение пар в группе"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    args = message.text.split()[1:]
+    preview = "preview" in args
+    force = "force" in args
+    seeds = [int(arg) for arg in args if arg.isdigit()]
+    if (
+        len(args) != preview + force + len(seeds)
+        or len(seeds) > 1
+        or (preview and force)
+    ):
+        await message.answer("Использование: /random [preview|force] [seed]")
         return
 
     try:
-        async with db.pool.acquire() as conn:
-            users = await conn.fetch("SELECT id FROM bot_bday.users ORDER BY id")
+        pairing = await plan_distribution(group_id, seeds[0] if seeds else None)
 
-            if len(users) < 2:
-                await message.answer(
-                    "Недостаточно пользователей для распределения пар (нужно минимум 2)."
-                )
-                return
+        if len(pairing.pairs) < 2:
+            await message.answer(
+                "Недостаточно пользователей для распределения пар (нужно минимум 2)."
+            )
+            return
 
-            user_ids = [user["id"] for user in users]
-            shuffled_ids = user_ids.copy()
-            random.shuffle(shuffled_ids)
+        if preview:
+            await message.answer(
+                "Предпросмотр, ничего не записано.\n" + pairing_report(pairing)
+            )
+            return
 
-            pairs = []
-            for i in range(len(shuffled_ids)):
-                giver_id = shuffled_ids[i]
-                ward_id = shuffled_ids[(i + 1) % len(shuffled_ids)]
-                pairs.append((giver_id, ward_id))
+        if pairing.violations and not force:
+            await message.answer(
+                "Не удалось соблюсти все ограничения, распределение не записано.\n"
+                f"Записать его всё равно: /random force {pairing.seed}\n"
+                + pairing_report(pairing)
+            )
+            return
 
-            for giver_id, ward_id in pairs:
-                await conn.execute(
-                    "UPDATE bot_bday.users SET ward_id = $1 WHERE id = $2", ward_id, giver_id
-                )
-                await conn.execute(
-                    "UPDATE bot_bday.users SET giver_id = $1 WHERE id = $2", giver_id, ward_id
-                )
+        await repo.write_pairs(group_id, *pairing.columns())
 
-            logging.info(f"Рандомное распределение по кругу: {shuffled_ids}")
+        profiles.clear()
+        logging.info(
+            f"Распределение пар в группе {group_id}: движок {pairing.engine}, "
+            f"seed {pairing.seed}, {len(pairing.pairs)} пар"
+        )
 
-            await clear_all_reminders()
-            await schedule_all_reminders()
+        await message.answer(
+            f"Успешно распределены {len(pairing.pairs)} пар пользователей. "
+            "Напоминания пересчитываются.\n" + pairing_report(pairing)
+        )
 
-            await message.answer(
-                f"Успешно распределены {len(pairs)} пар пользователей. Напоминания обновлены."
-            )
+        # Запись задач большой группы занимает секунды: ответ её не ждёт
+        await schedule_all_reminders(group_id)
 
     except Exception as e:
         logging.exception(f"Ошибка при рандомном распределении: {e}")
-        await message.answer(f"Произошла ошибка: {str(e)}") @ router.message(
-            Command("set")
-        )
+        await message.answer(f"Произошла ошибка: {str(e)}")
 
 
-async def set_pair(message: types.Message):
-    """Назначение пары вручную по ID"""
+async def parse_pair_args(message: types.Message, usage: str) -> tuple[int, int] | None:
+    """ID дарителя и подопечного из аргументов команды"""
+    parts = message.text.split()
+    if len(parts) != 3:
+        await message.answer(usage)
+        return None
+    try:
+        return int(parts[1]), int(parts[2])
+    except ValueError:
+        await message.answer("Ошибка: ID должны быть числами.")
+        return None
+
+
+@router.message(Command("exclude"))
+async def exclude_pair(message: types.Message):
+    """Запрет пары для распределения"""
     if not await db.is_admin(message.from_user.id):
         await message.answer("Доступ запрещён.")
         return
 
+    ids = await parse_pair_args(message, "Использование: /exclude [giver_id] [ward_id]")
+    if not ids:
+        return
+    giver_id, ward_id = ids
+
+    existing = await repo.existing_ids(giver_id, ward_id)
+    if giver_id not in existing or ward_id not in existing:
+        await message.answer("Пользователь не найден.")
+        return
+
+    if await repo.add_exclusion(giver_id, ward_id):
+        await message.answer(f"Пара #{giver_id} → #{ward_id} запрещена.")
+    else:
+        await message.answer(f"Пара #{giver_id} → #{ward_id} уже запрещена.")
+
+
+@router.message(Command("allow"))
+async def allow_pair(message: types.Message):
+    """Снятие запрета пары"""
+    if not await db.is_admin(message.from_user.id):
+        await message.answer("Доступ запрещён.")
+        return
+
+    ids = await parse_pair_args(message, "Использование: /allow [giver_id] [ward_id]")
+    if not ids:
+        return
+    giver_id, ward_id = ids
+
+    if await repo.remove_exclusion(giver_id, ward_id):
+        await message.answer(f"Запрет пары #{giver_id} → #{ward_id} снят.")
+    else:
+        await message.answer(f"Пара #{giver_id} → #{ward_id} не была запрещена.")
+
+
+async def apply_pair_changes(rows: list):
+    """Сброс кэша профилей и перепланирование напоминаний по изменённым участиям"""
+    profiles.invalidate(*(row["user_id"] for row in rows))
+    await reschedule_reminders(*((row["group_id"], row["user_id"]) for row in rows))
+
+
+async def assign_pair(group_id: int, giver_id: int, ward_id: int) -> bool:
+    """Назначение пары; False — кто-то из двоих не состоит в группе"""
+    rows = await pairs.relink(group_id, giver_id, ward_id)
+    await apply_pair_changes(rows)
+    return bool(rows)
+
+
+@router.message(Command("set"))
+async def set_pair(message: types.Message):
+    """Назначение пары вручную по ID"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
     parts = message.text.split()
     if len(parts) != 3:
         await message.answer("Использование: /set [giver_id] [ward_id]")
@@ -446,37 +897,70 @@ async def set_pair(message: types.Message):
         await message.answer("Ошибка: ID должны быть числами.")
         return
 
-    async with db.pool.acquire() as conn:
-        giver = await conn.fetchrow("SELECT id FROM bot_bday.users WHERE id = $1", giver_id)
-        ward = await conn.fetchrow("SELECT id FROM bot_bday.users WHERE id = $1", ward_id)
-
-        if not giver:
-            await message.answer(f"Даритель с ID {giver_id} не найден.")
-            return
-        if not ward:
-            await message.answer(f"Подопечный с ID {ward_id} не найден.")
-            return
-
-        await conn.execute(
-            "UPDATE bot_bday.users SET ward_id = $1 WHERE id = $2", ward_id, giver_id
-        )
-        await conn.execute(
-            "UPDATE bot_bday.users SET giver_id = $1 WHERE id = $2", giver_id, ward_id
-        )
+    if giver_id == ward_id:
+        await message.answer("Даритель и подопечный должны быть разными.")
+        return
 
-    await clear_all_reminders()
-    await schedule_all_reminders()
+    if not await assign_pair(group_id, giver_id, ward_id):
+        # Кого именно нет, выясняется только при ошибке
+        existing = await repo.member_ids(group_id, giver_id, ward_id)
+        if giver_id not in existing:
+            await message.answer(f"Даритель с ID {giver_id} не найден в группе.")
+        else:
+            await message.answer(f"Подопечный с ID {ward_id} не найден в группе.")
+        return
 
     await message.answer(
         f"Пара назначена: Даритель #{giver_id} → Подопечный #{ward_id}. Напоминания обновлены."
     )
 
 
+def pick_candidate(candidates: list):
+    """
+    Однозначный кандидат: единственный с точным ФИО, единственный со всеми
+    словами целиком («Пётр», но не «Петрович») или единственный найденный
+    """
+    for key in ("exact", "complete"):
+        matched = [c for c in candidates if c[key]]
+        if len(matched) == 1:
+            return matched[0]
+    return candidates[0] if len(candidates) == 1 else None
+
+
+def pair_choices_keyboard(group_id: int, found: list) -> InlineKeyboardMarkup | None:
+    """Варианты пар из кандидатов всех разбиений, лучшие по сумме мест в выдаче"""
+    choices = {}
+    for givers, wards in found:
+        for i, giver in enumerate(givers):
+            for j, ward in enumerate(wards):
+                key = (giver["id"], ward["id"])
+                if giver["id"] != ward["id"] and key not in choices:
+                    choices[key] = (i + j, giver["full_name"], ward["full_name"])
+    if not choices:
+        return None
+
+    best = sorted(choices.items(), key=lambda item: item[1][0])[:NAME_CHOICES]
+    return InlineKeyboardMarkup(
+        inline_keyboard=[
+            [
+                InlineKeyboardButton(
+                    text=f"{shorten(giver, PAGE_NAME_LIMIT // 2)} → "
+                    f"{shorten(ward, PAGE_NAME_LIMIT // 2)}",
+                    callback_data=SetPairCallback(
+                        group=group_id, giver=giver_id, ward=ward_id
+                    ).pack(),
+                )
+            ]
+            for (giver_id, ward_id), (_, giver, ward) in best
+        ]
+    )
+
+
 @router.message(Command("set_name"))
 async def set_pair_by_name(message: types.Message):
     """Назначение пары вручную по ФИО"""
-    if not await db.is_admin(message.from_user.id):
-        await message.answer("Доступ запрещён.")
+    group_id = await admin_group(message)
+    if group_id is None:
         return
 
     cmd_parts = message.text.split(maxsplit=1)
@@ -487,71 +971,86 @@ async def set_pair_by_name(message: types.Message):
         return
 
     full_text = cmd_parts[1].strip()
+    quoted = '"' in full_text
 
-    if '"' in full_text:
-        import re
-
+    if quoted:
         names = re.findall(r'"([^"]*)"', full_text)
         if len(names) < 2:
             await message.answer(
                 'Укажите ФИО дарителя и подопечного в кавычках: /set_name "ФИО дарителя" "ФИО подопечного"'
             )
             return
-        giver_name, ward_name = names[0], names[1]
+        splits = [(names[0], names[1])]
     else:
-        async with db.pool.acquire() as conn:
-            users = await conn.fetch("SELECT id, full_name FROM bot_bday.users")
-
-        possible_givers = []
-        possible_wards = []
-
-        for user in users:
-            if user["full_name"].lower() in full_text.lower():
-                if not possible_givers:
-                    possible_givers.append(user)
-                elif not possible_wards:
-                    possible_wards.append(user)
-
-        if not possible_givers or not possible_wards:
+        # Без кавычек граница между ФИО неизвестна: проверяются все разбиения
+        words = full_text.split()
+        splits = [
+            (" ".join(words[:i]), " ".join(words[i:])) for i in range(1, len(words))
+        ]
+
+    found = []
+    for giver_name, ward_name in splits:
+        givers, wards = await asyncio.gather(
+            repo.search_members(group_id, giver_name, NAME_CANDIDATES),
+            repo.search_members(group_id, ward_name, NAME_CANDIDATES),
+        )
+        if quoted and not givers:
+            await message.answer(f'Даритель с ФИО "{giver_name}" не найден.')
+            return
+        if quoted and not wards:
+            await message.answer(f'Подопечный с ФИО "{ward_name}" не найден.')
+            return
+        if givers and wards:
+            found.append((givers, wards))
+
+    if len(found) == 1:
+        giver = pick_candidate(found[0][0])
+        ward = pick_candidate(found[0][1])
+        if (
+            giver
+            and ward
+            and giver["id"] != ward["id"]
+            and await assign_pair(group_id, giver["id"], ward["id"])
+        ):
+            giver_name, ward_name = giver["full_name"], ward["full_name"]
             await message.answer(
-                'Не удалось определить дарителя и подопечного. Используйте кавычки: /set_name "ФИО дарителя" "ФИО подопечного"'
+                f'Пара назначена: Даритель "{giver_name}" → Подопечный "{ward_name}". Напоминания обновлены.'
             )
             return
 
-        giver_name = possible_givers[0]["full_name"]
-        ward_name = possible_wards[0]["full_name"]
-
-    async with db.pool.acquire() as conn:
-        giver = await conn.fetchrow(
-            "SELECT id FROM bot_bday.users WHERE full_name = $1", giver_name
-        )
-        ward = await conn.fetchrow(
-            "SELECT id FROM bot_bday.users WHERE full_name = $1", ward_name
+    kb = pair_choices_keyboard(group_id, found)
+    if kb is None:
+        await message.answer(
+            'Не удалось определить дарителя и подопечного. Используйте кавычки: /set_name "ФИО дарителя" "ФИО подопечного"'
         )
+        return
 
-        if not giver:
-            await message.answer(f'Даритель с ФИО "{giver_name}" не найден.')
-            return
-        if not ward:
-            await message.answer(f'Подопечный с ФИО "{ward_name}" не найден.')
-            return
+    await message.answer("Найдено несколько вариантов, выберите пару:", reply_markup=kb)
 
-        giver_id = giver["id"]
-        ward_id = ward["id"]
 
-        await conn.execute(
-            "UPDATE bot_bday.users SET ward_id = $1 WHERE id = $2", ward_id, giver_id
-        )
-        await conn.execute(
-            "UPDATE bot_bday.users SET giver_id = $1 WHERE id = $2", giver_id, ward_id
-        )
+@router.callback_query(SetPairCallback.filter())
+async def set_pair_choice(
+    callback: types.CallbackQuery, callback_data: SetPairCallback
+):
+    """Выбор пары на клавиатуре /set_name"""
+    if not await db.is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён.", show_alert=True)
+        return
 
-    await clear_all_reminders()
-    await schedule_all_reminders()
+    group_id = callback_data.group
+    giver_id, ward_id = callback_data.giver, callback_data.ward
+    if not await assign_pair(group_id, giver_id, ward_id):
+        await callback.answer(
+            "Пользователь больше не состоит в группе.", show_alert=True
+        )
+        return
 
-    await message.answer(
-        f'Пара назначена: Даритель "{giver_name}" → Подопечный "{ward_name}". Напоминания обновлены.'
+    names = await repo.user_names((giver_id, ward_id))
+    await callback.message.edit_text(
+        f'Пара назначена: Даритель "{names[giver_id]}" → '
+        f'Подопечный "{names[ward_id]}". Напоминания обновлены.'
     )
+    await callback.answer()
 
 
 @router.message(Command("make_admin"))
@@ -572,18 +1071,14 @@ async def make_admin_command(message: types.Message):
         await message.answer("Ошибка: ID должен быть числом.")
         return
 
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT id FROM bot_bday.users WHERE telegram_id = $1", telegram_id
-        )
+    user = await repo.set_admin(telegram_id, True)
 
-        if not user:
-            await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
-            return
+    if not user:
+        await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
+        return
 
-        await conn.execute(
-            "UPDATE bot_bday.users SET is_admin = true WHERE telegram_id = $1", telegram_id
-        )
+    db.invalidate_admin(telegram_id)
+    profiles.invalidate(user["id"])
 
     await message.answer(
         f"Пользователь с Telegram ID {telegram_id} назначен администратором."
@@ -612,32 +1107,18 @@ async def delete_user(message: types.Message):
         await message.answer("Вы не можете удалить самого себя.")
         return
 
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT id, ward_id, giver_id FROM bot_bday.users WHERE telegram_id = $1",
-            telegram_id,
-        )
-
-        if not user:
-            await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
-            return
-
-        ward_id = user["ward_id"]
-        giver_id = user["giver_id"]
+    removed = await pairs.remove_user(telegram_id)
 
-        if ward_id:
-            await conn.execute(
-                "UPDATE bot_bday.users SET giver_id = NULL WHERE id = $1", ward_id
-            )
-        if giver_id:
-            await conn.execute(
-                "UPDATE bot_bday.users SET ward_id = NULL WHERE id = $1", giver_id
-            )
+    if not removed:
+        await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
+        return
 
-        await conn.execute("DELETE FROM bot_bday.users WHERE telegram_id = $1", telegram_id)
+    user_id, rows = removed
+    db.invalidate_admin(telegram_id)
+    profiles.invalidate(user_id, telegram_id=telegram_id)
 
-    await clear_all_reminders()
-    await schedule_all_reminders()
+    # Среди строк — его подопечные во всех группах: напоминания о них снимаются
+    await apply_pair_changes(rows)
 
     await message.answer(
         f"Пользователь с Telegram ID {telegram_id} удален. Связи обновлены. Напоминания перепланированы."
@@ -666,24 +1147,21 @@ async def revoke_admin_rights(message: types.Message):
         await message.answer("Вы не можете лишить прав администратора самого себя.")
         return
 
-    async with db.pool.acquire() as conn:
-        user = await conn.fetchrow(
-            "SELECT id, is_admin FROM bot_bday.users WHERE telegram_id = $1", telegram_id
-        )
-
-        if not user:
-            await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
-            return
+    user = await repo.get_user_by_telegram_id(telegram_id)
 
-        if not user["is_admin"]:
-            await message.answer(
-                f"Пользователь с Telegram ID {telegram_id} не является администратором."
-            )
-            return
+    if not user:
+        await message.answer(f"Пользователь с Telegram ID {telegram_id} не найден.")
+        return
 
-        await conn.execute(
-            "UPDATE bot_bday.users SET is_admin = false WHERE telegram_id = $1", telegram_id
+    if not user["is_admin"]:
+        await message.answer(
+            f"Пользователь с Telegram ID {telegram_id} не является администратором."
         )
+        return
+
+    await repo.set_admin(telegram_id, False)
+    db.invalidate_admin(telegram_id)
+    profiles.invalidate(user["id"])
 
     await message.answer(
         f"Пользователь с Telegram ID {telegram_id} лишен прав администратора."
@@ -692,19 +1170,19 @@ async def revoke_admin_rights(message: types.Message):
 
 @router.message(Command("reset"))
 async def reset_connections(message: types.Message):
-    """Сброс связей пользователя"""
-    if not await db.is_admin(message.from_user.id):
-        await message.answer("Доступ запрещён.")
+    """Сброс связей пользователя в группе"""
+    group_id = await admin_group(message)
+    if group_id is None:
         return
 
     parts = message.text.split()
 
     # /reset all
     if len(parts) == 2 and parts[1].lower() == "all":
-        async with db.pool.acquire() as conn:
-            await conn.execute("UPDATE bot_bday.users SET ward_id = NULL, giver_id = NULL")
-        await message.answer("Связи всех пользователей сброшены.")
-        await clear_all_reminders()
+        await repo.reset_all_links(group_id)
+        profiles.clear()
+        await message.answer("Связи всех участников группы сброшены.")
+        await clear_all_reminders(group_id)
         return
 
     # /reset <user_id1> <user_id2>
@@ -718,44 +1196,18 @@ async def reset_connections(message: types.Message):
             )
             return
 
-        async with db.pool.acquire() as conn:
-            # Проверяем, что оба пользователя существуют
-            user1 = await conn.fetchrow("SELECT id FROM bot_bday.users WHERE id = $1", user_id1)
-            user2 = await conn.fetchrow("SELECT id FROM bot_bday.users WHERE id = $1", user_id2)
-
-            if not user1:
-                await message.answer(f"Пользователь с ID {user_id1} не найден.")
-                return
-            if not user2:
-                await message.answer(f"Пользователь с ID {user_id2} не найден.")
-                return
-
-            # Удаляем связь в обе стороны
-            await conn.execute(
-                "UPDATE bot_bday.users SET ward_id = NULL WHERE id = $1 AND ward_id = $2",
-                user_id1,
-                user_id2,
-            )
-            await conn.execute(
-                "UPDATE bot_bday.users SET giver_id = NULL WHERE id = $1 AND giver_id = $2",
-                user_id2,
-                user_id1,
-            )
-            # И наоборот
-            await conn.execute(
-                "UPDATE bot_bday.users SET ward_id = NULL WHERE id = $1 AND ward_id = $2",
-                user_id2,
-                user_id1,
-            )
-            await conn.execute(
-                "UPDATE bot_bday.users SET giver_id = NULL WHERE id = $1 AND giver_id = $2",
-                user_id1,
-                user_id2,
+        # Удаляем связь в обе стороны
+        rows = await pairs.unlink(group_id, user_id1, user_id2)
+        if not rows:
+            await message.answer(
+                f"Пользователи #{user_id1} и #{user_id2} не связаны в группе."
             )
+            return
 
-        await clear_all_reminders()
-        await schedule_all_reminders()
-        await message.answer(f"Связь между пользователями #{user_id1} и #{user_id2} разорвана.")
+        await apply_pair_changes(rows)
+        await message.answer(
+            f"Связь между пользователями #{user_id1} и #{user_id2} разорвана."
+        )
         return
 
     # /reset <user_id>
@@ -768,35 +1220,14 @@ async def reset_connections(message: types.Message):
             )
             return
 
-        async with db.pool.acquire() as conn:
-            user = await conn.fetchrow(
-                "SELECT id, ward_id, giver_id FROM bot_bday.users WHERE id = $1", user_id
-            )
-
-            if not user:
-                await message.answer(f"Пользователь с ID {user_id} не найден.")
-                return
-
-            ward_id = user["ward_id"]
-            giver_id = user["giver_id"]
+        # Сбрасываем связи пользователя и соответствующие связи у его пары
+        rows = await pairs.reset_user(group_id, user_id)
 
-            # Сбрасываем связи для указанного пользователя
-            await conn.execute(
-                "UPDATE bot_bday.users SET ward_id = NULL, giver_id = NULL WHERE id = $1", user_id
-            )
-
-            # Сбрасываем соответствующие связи у его пары
-            if ward_id:
-                await conn.execute(
-                    "UPDATE bot_bday.users SET giver_id = NULL WHERE id = $1", ward_id
-                )
-            if giver_id:
-                await conn.execute(
-                    "UPDATE bot_bday.users SET ward_id = NULL WHERE id = $1", giver_id
-                )
+        if not rows:
+            await message.answer(f"Пользователь с ID {user_id} не найден в группе.")
+            return
 
-        await clear_all_reminders()
-        await schedule_all_reminders()
+        await apply_pair_changes(rows)
         await message.answer(
             f"Связи пользователя #{user_id} и связанных с ним пользователей сброшены. Напоминания обновлены."
         )
@@ -810,50 +1241,190 @@ async def reset_connections(message: types.Message):
     )
 
 
-@router.message(Command("reminders"))
-async def show_reminders(message: types.Message):
-    """Показ запланированных напоминаний"""
-    if not await db.is_admin(message.from_user.id):
-        await message.answer("Доступ запрещён.")
-        return
+async def render_reminders_page(
+    group_id: int, page: int
+) -> tuple[str, InlineKeyboardMarkup | None]:
+    """Страница расписания напоминаний группы: задачи и имена читаются пачкой"""
+    total = await repo.count_reminder_jobs(group_id)
+    if not total:
+        return "Нет запланированных напоминаний.", None
 
-    jobs = scheduler.get_jobs()
-    if not jobs:
-        await message.answer("Нет запланированных напоминаний.")
-        return
+    pages = math.ceil(total / REMINDERS_PAGE_SIZE)
+    page = min(page, pages - 1)
+    states = await repo.reminder_jobs_page(
+        group_id, REMINDERS_PAGE_SIZE, page * REMINDERS_PAGE_SIZE
+    )
+    # Состояние задачи — pickle APScheduler: args и next_run_time
+    jobs = [pickle.loads(state) for state in states]
+    names = await repo.user_names(
+        {user_id for job in jobs for user_id in job["args"][1:3]}
+    )
 
     now = datetime.now(MSK)
     text = "<b>Запланированные напоминания:</b>\n\n"
 
-    for i, job in enumerate(jobs, 1):
-        run_date = job.trigger.run_date
+    for i, job in enumerate(jobs, page * REMINDERS_PAGE_SIZE + 1):
+        run_date = job["next_run_time"]
         time_diff = run_date - now
         days = time_diff.days
         hours = time_diff.seconds // 3600
 
-        giver_id, ward_id, days_before = job.args
-
-        async with db.pool.acquire() as conn:
-            giver_info = await conn.fetchrow(
-                "SELECT full_name FROM bot_bday.users WHERE id = $1", giver_id
-            )
-            ward_info = await conn.fetchrow(
-                "SELECT full_name FROM bot_bday.users WHERE id = $1", ward_id
-            )
-
-        giver_name = giver_info["full_name"] if giver_info else f"ID: {giver_id}"
-        ward_name = ward_info["full_name"] if ward_info else f"ID: {ward_id}"
+        _, giver_id, ward_id, days_before = job["args"]
+        giver_name = format_name(names.get(giver_id, f"ID: {giver_id}"))
+        ward_name = format_name(names.get(ward_id, f"ID: {ward_id}"))
 
         text += (
-            f"{i}. {run_date.strftime('%d.%m.%Y %H:%M')} (через {days}д {hours}ч)\n"
+            f"{i}. {run_date.astimezone(MSK).strftime('%d.%m.%Y %H:%M')} "
+            f"(через {days}д {hours}ч)\n"
             f"   Даритель: {giver_name}\n"
             f"   Подопечный: {ward_name}\n"
             f"   За {days_before} дней до ДР\n\n"
         )
 
+    return text, page_keyboard("reminders", page, pages, group_id)
+
+
+@router.message(Command("reminders"))
+async def show_reminders(message: types.Message):
+    """Показ запланированных напоминаний"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    text, kb = await render_reminders_page(group_id, parse_page_arg(message))
+    await message.answer(text, parse_mode="HTML", reply_markup=kb)
+
+
+PAGE_RENDERERS = {
+    "reminders": render_reminders_page,
+    "users": render_users_page,
+    "pairs": render_pairs_page,
+    "groups": render_groups_page,
+}
+
+
+@router.callback_query(PageCallback.filter(F.view.in_(PAGE_RENDERERS)))
+async def paginate(callback: types.CallbackQuery, callback_data: PageCallback):
+    """Листание постраничных списков администратора"""
+    if not await db.is_admin(callback.from_user.id):
+        await callback.answer("Доступ запрещён.", show_alert=True)
+        return
+
+    text, kb = await PAGE_RENDERERS[callback_data.view](
+        callback_data.group, callback_data.page
+    )
+    # Повторное нажатие на текущую страницу не меняет сообщение
+    with suppress(TelegramBadRequest):
+        await callback.message.edit_text(text, parse_mode="HTML", reply_markup=kb)
+    await callback.answer()
+
+
+@router.message(Command("upcoming"))
+async def show_upcoming(message: types.Message):
+    """Ближайшие дни рождения в группе"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    parts = message.text.split()
+    days = UPCOMING_DEFAULT_DAYS
+    if len(parts) > 1:
+        try:
+            days = min(max(int(parts[1]), 1), 366)
+        except ValueError:
+            await message.answer("Использование: /upcoming [дней]")
+            return
+
+    today = datetime.now(MSK).date()
+    upcoming = await repo.upcoming_birthdays(
+        group_id, today, today + timedelta(days=days - 1)
+    )
+
+    if not upcoming:
+        await message.answer(f"В ближайшие {days} дн. дней рождения нет.")
+        return
+
+    text = f"<b>Дни рождения в ближайшие {days} дн.:</b>\n\n"
+    for when, user in upcoming[:UPCOMING_LIMIT]:
+        text += (
+            f"{when.strftime('%d.%m')} — {format_name(user['full_name'])} "
+            f"(ID: {user['id']}, через {(when - today).days} дн.)\n"
+        )
+    if len(upcoming) > UPCOMING_LIMIT:
+        text += f"\n…и ещё {len(upcoming) - UPCOMING_LIMIT}"
+
     await message.answer(text, parse_mode="HTML")
 
 
+@router.message(Command("import"))
+async def import_users(message: types.Message):
+    """Загрузка участников группы из CSV: telegram_id, full_name, birthday, wish"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    document = message.document or (
+        message.reply_to_message and message.reply_to_message.document
+    )
+    if not document:
+        await message.answer(
+            "Пришлите CSV-файл с подписью /import или ответьте /import на файл.\n"
+            "Колонки: telegram_id, full_name, birthday (ДД.ММ.ГГГГ), wish."
+        )
+        return
+
+    errors: list[str] = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/users.csv"
+            await message.bot.download(document, destination=path)
+            inserted, updated, moved = await repo.import_users(
+                group_id, read_users_csv(path, errors)
+            )
+    except Exception as e:
+        logging.exception(f"Ошибка импорта пользователей: {e}")
+        await message.answer(f"Произошла ошибка: {str(e)}")
+        return
+
+    logging.info(
+        f"Импорт в группу {group_id}: добавлено {inserted}, "
+        f"обновлено {len(updated)}, ошибок {len(errors)}"
+    )
+    profiles.invalidate(*updated)
+    if moved:
+        # Напоминания о тех, чья дата рождения изменилась, во всех их группах
+        await reschedule_reminders(*await repo.memberships(moved))
+
+    text = f"Импорт завершён: добавлено {inserted}, обновлено {len(updated)}."
+    if errors:
+        text += f"\nПропущено строк: {len(errors)}\n" + "\n".join(
+            errors[:IMPORT_ERRORS_SHOWN]
+        )
+        if len(errors) > IMPORT_ERRORS_SHOWN:
+            text += f"\n…и ещё {len(errors) - IMPORT_ERRORS_SHOWN}"
+    await message.answer(text)
+
+
+@router.message(Command("export"))
+async def export_users(message: types.Message):
+    """Выгрузка участников группы и их пар в CSV"""
+    group_id = await admin_group(message)
+    if group_id is None:
+        return
+
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            path = f"{tmp}/users.csv"
+            count = await repo.export_users(group_id, path)
+            await message.answer_document(
+                FSInputFile(path, filename=f"users_group_{group_id}.csv"),
+                caption=f"Участников: {count}",
+            )
+    except Exception as e:
+        logging.exception(f"Ошибка экспорта пользователей: {e}")
+        await message.answer(f"Произошла ошибка: {str(e)}")
+
+
 @router.message(Command("menu"))
 async def menu_command(message: types.Message):
     """Список команд"""
@@ -891,6 +1462,7 @@ async def help_command(message: types.Message):
             "4. Используйте /ward, чтобы узнать, кому вы дарите подарок.\n"
             "5. Изменить данные — /edit.\n"
             "6. Список команд — /menu.\n"
+            "7. Группы — /groups, вступить по коду — /join, сменить текущую — /group.\n"
             "\n"
         )
 
@@ -911,102 +1483,476 @@ async def help_command(message: types.Message):
 
 
 # ===== НАПОМИНАНИЯ =====
-async def schedule_all_reminders():
-    """Планирование всех напоминаний"""
-    await clear_all_reminders()
+def reminder_job_id(group_id: int, ward_id: int, days_before: int) -> str:
+    return f"reminder:{group_id}:{ward_id}:{days_before}"
 
-    async with db.pool.acquire() as conn:
-        rows = await conn.fetch(
-            "SELECT id, birthday, giver_id FROM bot_bday.users WHERE giver_id IS NOT NULL"
-        )
 
-    now = datetime.now(MSK)
+# Дат в году немного, а localize у pytz дорогой: при записи всех задач
+# группы он занимал большую часть времени
+@lru_cache(maxsize=4096)
+def reminder_run_date(bday: date, days_before: int) -> datetime:
+    """Время напоминания за days_before дней до ДР bday"""
+    remind_date = bday - timedelta(days=days_before)
+    return MSK.localize(datetime.combine(remind_date, time(REMINDER_HOUR, 0)))
 
-    for rec in rows:
-        user_id = rec["id"]
-        bday = rec["birthday"]
-        giver_id = rec["giver_id"]
 
-        if not bday or not giver_id:
-            continue
+def reminder_dates(bday: date, now: datetime) -> list[tuple[int, datetime]]:
+    """Ближайшие напоминания (days_before, время) о ДР bday"""
+    this_year = next_occurrence(bday, now.date())
 
-        try:
-            this_year = date(year=now.year, month=bday.month, day=bday.day)
-        except ValueError:
-            continue
+    # Все напоминания этого года уже прошли — планируем на следующий ДР
+    if reminder_run_date(this_year, min(REMINDER_OFFSETS)) <= now:
+        this_year = next_occurrence(bday, this_year + timedelta(days=1))
+
+    return [
+        (days_before, remind_dt)
+        for days_before in REMINDER_OFFSETS
+        if (remind_dt := reminder_run_date(this_year, days_before)) > now
+    ]
 
-        if this_year < now.date():
-            try:
-                this_year = date(year=now.year + 1, month=bday.month, day=bday.day)
-            except ValueError:
-                continue
-
-        for days_before in REMINDER_OFFSETS:
-            remind_date = this_year - timedelta(days=days_before)
-            remind_dt = datetime.combine(remind_date, time(12, 0))
-            remind_dt = MSK.localize(remind_dt)
-
-            if remind_dt > now:
-                scheduler.add_job(
-                    send_reminder,
-                    DateTrigger(run_date=remind_dt),
-                    args=[giver_id, user_id, days_before],
+
+def reminder_jobs(rows, now: datetime) -> list[tuple[str, float, bytes]]:
+    """
+    Строки таблицы SQLAlchemyJobStore (id, next_run_time, job_state) по строкам
+    reminder_targets — то же, что записал бы scheduler.add_job. Job собирается
+    один раз: состояния задач отличаются только id, аргументами и временем
+    """
+    jobs, template = [], None
+    for rec in rows:
+        if not rec["birthday"] or not rec["giver_id"]:
+            continue
+        for days_before, remind_dt in reminder_dates(rec["birthday"], now):
+            job_id = reminder_job_id(rec["group_id"], rec["id"], days_before)
+            args = (rec["group_id"], rec["giver_id"], rec["id"], days_before)
+            trigger = DateTrigger(run_date=remind_dt)
+            if template is None:
+                template = Job(
+                    scheduler,
+                    id=job_id,
+                    func=send_reminder,
+                    trigger=trigger,
+                    executor="default",
+                    args=args,
+                    kwargs={},
+                    name=send_reminder.__name__,
+                    max_instances=1,
+                    next_run_time=remind_dt,
+                    **JOB_DEFAULTS,
+                ).__getstate__()
+            state = {
+                **template,
+                "id": job_id,
+                "trigger": trigger,
+                "args": args,
+                "next_run_time": remind_dt,
+            }
+            jobs.append(
+                (
+                    job_id,
+                    datetime_to_utc_timestamp(remind_dt),
+                    pickle.dumps(state, reminder_jobstore.pickle_protocol),
                 )
+            )
+    return jobs
 
 
-async def send_reminder(giver_id: int, ward_id: int, days_before: int):
-    """Отправка напоминания"""
-    async with db.pool.acquire() as conn:
-        ward = await conn.fetchrow(
-            "SELECT full_name, birthday, wish FROM bot_bday.users WHERE id = $1", ward_id
-        )
-        giver = await conn.fetchrow(
-            "SELECT telegram_id FROM bot_bday.users WHERE id = $1", giver_id
+async def add_reminder_jobs(rows):
+    """
+    Запись задач по строкам reminder_targets пачками по REMINDER_JOB_BATCH
+    подопечных, одним запросом на пачку. SQLAlchemyJobStore писал бы каждую
+    задачу отдельным INSERT через psycopg2. Сериализация — чистый CPU и идёт
+    в отдельном потоке, не задерживая обработку обновлений
+    """
+    now = datetime.now(MSK)
+    for start in range(0, len(rows), REMINDER_JOB_BATCH):
+        jobs = await asyncio.to_thread(
+            reminder_jobs, rows[start : start + REMINDER_JOB_BATCH], now
         )
+        await repo.add_reminder_jobs(jobs)
+
+    # Задачи записаны мимо планировщика: ведущий пересчитывает время пробуждения
+    if rows and scheduler.state == STATE_RUNNING:
+        scheduler.wakeup()
+
+
+async def unschedule_reminders(wards):
+    """
+    Снятие напоминаний о подопечных (group_id, ward_id). Id задач
+    детерминированы, поэтому снять их может любая реплика, а не только та,
+    что их запланировала
+    """
+    await repo.delete_reminder_jobs(
+        [
+            reminder_job_id(group_id, ward_id, days_before)
+            for group_id, ward_id in wards
+            for days_before in REMINDER_OFFSETS
+        ]
+    )
+
 
-    if not ward or not giver:
+async def reschedule_reminders(*wards: tuple[int, int | None]):
+    """Точечное перепланирование напоминаний о затронутых подопечных (group_id, ward_id)"""
+    if settings.REMINDER_ENGINE != "jobs":
         return
 
-    text = (
+    wards = {ward for ward in wards if ward[1]}
+    if not wards:
+        return
+
+    rows = await repo.reminder_targets(wards)
+    await unschedule_reminders(wards)
+    await add_reminder_jobs(rows)
+
+
+async def schedule_all_reminders(group_id: int | None = None):
+    """Планирование всех напоминаний или напоминаний одной группы"""
+    if settings.REMINDER_ENGINE != "jobs":
+        return
+
+    await clear_all_reminders(group_id)
+
+    rows = await repo.reminder_targets(group_id=group_id)
+    await add_reminder_jobs(rows)
+
+
+async def roll_forward_reminders():
+    """
+    Досоздание пропавших напоминаний. У подопечного с дарителем всегда есть
+    задача на min(REMINDER_OFFSETS): после неё планируется следующий год.
+    Если её нет — задача пропущена дольше REMINDER_MISFIRE_GRACE_TIME или
+    сменились REMINDER_OFFSETS, — напоминания подопечного планируются заново.
+    Задачи с отступами, которых больше нет в настройках, удаляются
+    """
+    if settings.REMINDER_ENGINE != "jobs":
+        return
+
+    stale = await repo.delete_stale_reminder_jobs(REMINDER_OFFSETS)
+    wards = await repo.wards_without_reminder(min(REMINDER_OFFSETS))
+    await reschedule_reminders(*wards)
+    if stale or wards:
+        logging.info(
+            f"Напоминания: удалено устаревших задач {stale}, "
+            f"перепланировано подопечных {len(wards)}"
+        )
+
+
+def outbox_row(
+    group_id: int,
+    giver_id: int,
+    ward_id: int,
+    days_before: int,
+    chat_id: int,
+    ward,
+    birthday: date,
+) -> tuple:
+    """Строка reminder_outbox: напоминание о ДР подопечного в дату birthday"""
+    return (
+        group_id,
+        giver_id,
+        ward_id,
+        days_before,
+        birthday.year,
+        chat_id,
+        reminder_text(ward, days_before),
+        reminder_run_date(birthday, days_before),
+    )
+
+
+def reminder_text(ward, days_before: int) -> str:
+    return (
         f"Напоминание: до дня рождения вашего подопечного {ward['full_name']} осталось {days_before} дн.\n"
-        f"ДР: {format_bday(ward['birthday'])}\nПожелания: {ward['wish']}"
+        f"ДР: {format_bday(ward['birthday'])}\nПожелания: {ward['wish']}\n"
+        f"Группа: {ward['group_title']}"
     )
 
-    try:
-        await bot.send_message(giver["telegram_id"], text)
-    except Exception as e:
-        logging.error(f"Ошибка отправки напоминания: {e}")
 
+async def send_reminder(group_id: int, giver_id: int, ward_id: int, days_before: int):
+    """Отправка напоминания"""
+    # Задачи срабатывают разом в REMINDER_HOUR: без ограничения они ждали бы
+    # соединения пула дольше DB_ACQUIRE_TIMEOUT, и напоминание терялось
+    async with reminder_slots:
+        rows = await repo.reminder_parties(group_id, giver_id, ward_id)
+        users = {row["id"]: row for row in rows}
+        ward = users.get(ward_id)
+        giver = users.get(giver_id)
+
+        # Пару могли изменить на другой реплике, не успев снять задачу
+        if not ward or not giver:
+            return
 
-async def clear_all_reminders():
-    """Очистка всех напоминаний"""
-    for job in scheduler.get_jobs():
-        try:
-            job.remove()
-        except Exception as e:
-            logging.error(f"Ошибка удаления job: {e}")
+        birthday = next_occurrence(ward["birthday"], datetime.now(MSK).date())
+
+        # Доставкой занимается пул воркеров очереди: запись переживает сбои отправки
+        await repo.enqueue_reminders(
+            [
+                outbox_row(
+                    group_id,
+                    giver_id,
+                    ward_id,
+                    days_before,
+                    giver["telegram_id"],
+                    ward,
+                    birthday,
+                )
+            ]
+        )
+
+        # После последнего напоминания планируется следующий год
+        if days_before == min(REMINDER_OFFSETS):
+            await reschedule_reminders((group_id, ward_id))
+
+
+async def clear_all_reminders(group_id: int | None = None):
+    """Очистка всех напоминаний или напоминаний одной группы"""
+    await repo.clear_reminder_jobs(group_id)
+
+
+async def sweep_reminders():
+    """
+    Ежедневная рассылка: подопечные, чей ДР ровно через один из REMINDER_OFFSETS,
+    одной пачкой попадают в очередь напоминаний
+    """
+    today = datetime.now(MSK).date()
+    month_days, offsets = [], []
+    for days_before in REMINDER_OFFSETS:
+        for md in month_days_for(today + timedelta(days=days_before)):
+            month_days.append(md)
+            offsets.append(days_before)
+
+    rows = await repo.sweep_reminders(month_days, offsets)
+
+    added = await repo.enqueue_reminders(
+        [
+            outbox_row(
+                row["group_id"],
+                row["giver_id"],
+                row["ward_id"],
+                row["days_before"],
+                row["giver_telegram_id"],
+                row,
+                today + timedelta(days=row["days_before"]),
+            )
+            for row in rows
+        ]
+    )
+    logging.info(f"Ежедневная рассылка напоминаний: {len(rows)} шт., новых {added}")
+
+
+async def poll_reminder_jobs():
+    """
+    Пустая задача для опроса хранилища: задачи, добавленные другими репликами,
+    планировщик ведущего находит только при пробуждении, а без опроса он
+    спит до ближайшей известной ему задачи — до часа
+    """
+
+
+async def purge_reminder_outbox():
+    """Удаление старых доставленных напоминаний"""
+    purged = await repo.purge_reminders(settings.OUTBOX_RETENTION_DAYS)
+    if purged:
+        logging.info(f"Удалено доставленных напоминаний: {purged}")
+
+
+def setup_sweep_job():
+    # Задача хранится в БД: рассылка, пропущенная из-за простоя, догоняется
+    if not scheduler.get_job(REMINDER_SWEEP_JOB_ID, jobstore=REMINDER_JOBSTORE):
+        scheduler.add_job(
+            sweep_reminders,
+            CronTrigger(hour=REMINDER_HOUR, minute=0, timezone=MSK),
+            id=REMINDER_SWEEP_JOB_ID,
+            jobstore=REMINDER_JOBSTORE,
+        )
+
+
+async def setup_sweep_reminders():
+    """Переход на ежедневную рассылку вместо задач на каждого подопечного"""
+    await clear_all_reminders()
+    await asyncio.to_thread(setup_sweep_job)
+
+
+def remove_sweep_job():
+    with suppress(JobLookupError):
+        scheduler.remove_job(REMINDER_SWEEP_JOB_ID, jobstore=REMINDER_JOBSTORE)
+
+
+async def start_reminders():
+    """Ведущая реплика: восстановление расписания и запуск задач планировщика"""
+    if settings.REMINDER_ENGINE == "sweep":
+        await setup_sweep_reminders()
+        logging.info("Напоминания: ежедневная рассылка")
+    else:
+        await asyncio.to_thread(remove_sweep_job)
+        # Расписание хранится в БД; на пустом хранилище это полный пересчёт
+        await roll_forward_reminders()
+
+    # Напоминания сегодняшнего дня, пропущенные из-за простоя: ключ
+    # идемпотентности не даст отправить уже поставленные повторно
+    if datetime.now(MSK) >= reminder_run_date(datetime.now(MSK).date(), 0):
+        await sweep_reminders()
+
+    scheduler.resume()
+    outbox.start()
+
+
+async def stop_reminders():
+    """
+    Реплика больше не ведущая: задачи не выполняются, но обработчики
+    по-прежнему записывают изменения расписания в общее хранилище
+    """
+    scheduler.pause()
+    await outbox.close()
+
+
+leader = LeaderElection(
+    repo,
+    "scheduler",
+    ttl=settings.LEADER_LEASE_TTL,
+    interval=settings.LEADER_RENEW_INTERVAL,
+    on_elected=start_reminders,
+    on_demoted=stop_reminders,
+)
+registry.gauge(
+    "bot_scheduler_leader",
+    "1, если эта реплика выполняет задачи планировщика",
+    collect=lambda: int(leader.is_leader),
+)
 
 
 # ===== ЗАПУСК БОТА =====
 dp.include_router(router)
+dp.update.outer_middleware(
+    MetricsMiddleware(commands=[c.split()[0] for c in USER_COMMANDS + ADMIN_COMMANDS])
+)
+
+
+def create_webhook_app() -> web.Application:
+    """aiohttp-приложение, принимающее обновления от Telegram"""
+    app = web.Application()
+    SimpleRequestHandler(
+        dispatcher=dp,
+        bot=bot,
+        secret_token=settings.WEBHOOK_SECRET,
+    ).register(app, path=settings.WEBHOOK_PATH)
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+async def run_webhook():
+    """Приём обновлений через вебхук вместо long polling"""
+    if settings.WEBHOOK_URL:
+        await bot.set_webhook(
+            settings.WEBHOOK_URL,
+            secret_token=settings.WEBHOOK_SECRET,
+        )
+
+    runner = web.AppRunner(create_webhook_app())
+    await runner.setup()
+    site = web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT)
+    await site.start()
+    logging.info(
+        f"Webhook слушает {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}"
+        f"{settings.WEBHOOK_PATH}"
+    )
+
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await runner.cleanup()
+
+
+def setup_logging():
+    """
+    Лог бота в event_log.txt. Вызывается только при запуске бота: бенчмарк
+    и нагрузочный тест импортируют модуль и настраивают логирование сами
+    """
+    logging.basicConfig(
+        filename="event_log.txt",
+        level=logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+        encoding="utf-8",
+    )
 
 
 async def main():
     """Главная функция"""
+    if settings.WEBHOOK_MODE and not settings.WEBHOOK_SECRET:
+        # Без секрета подделать обновление может любой, кто знает адрес
+        raise RuntimeError("Для WEBHOOK_MODE нужно задать WEBHOOK_SECRET")
+    if settings.MIGRATE_ON_START:
+        # Реплики, стартующие одновременно, ждут advisory lock раннера
+        await apply_migrations()
     await db.init()
-    scheduler.start()
-    await schedule_all_reminders()
+    metrics_runner = None
+    if settings.METRICS_ENABLED:
+        metrics_runner = await start_metrics_server(
+            settings.METRICS_HOST, settings.METRICS_PORT
+        )
+        logging.info(
+            f"Метрики: http://{settings.METRICS_HOST}:{settings.METRICS_PORT}/metrics"
+        )
+    send_queue.start()
+    # До избрания ведущим задачи не выполняются, но добавляются в хранилище
+    scheduler.start(paused=True)
+    scheduler.add_job(
+        storage.purge_expired,
+        "interval",
+        hours=1,
+        id="fsm_purge",
+        replace_existing=True,
+    )
+    scheduler.add_job(
+        purge_reminder_outbox,
+        "interval",
+        hours=1,
+        id="outbox_purge",
+        replace_existing=True,
+    )
+    if settings.REMINDER_ENGINE == "jobs":
+        scheduler.add_job(
+            poll_reminder_jobs,
+            "interval",
+            seconds=settings.REMINDER_POLL_INTERVAL,
+            id="reminder_poll",
+            replace_existing=True,
+        )
+        scheduler.add_job(
+            roll_forward_reminders,
+            CronTrigger(hour=3, minute=0, timezone=MSK),
+            id="reminder_roll_forward",
+            replace_existing=True,
+        )
+        # Напоминание, задача которого упала до записи в очередь, догоняется
+        # рассылкой: ключ идемпотентности не даст отправить остальные повторно
+        scheduler.add_job(
+            sweep_reminders,
+            CronTrigger(hour=REMINDER_HOUR, minute=30, timezone=MSK),
+            id="reminder_catch_up",
+            replace_existing=True,
+        )
 
-    # Удаляем вебхук перед запуском полинга
-    await bot.delete_webhook(drop_pending_updates=True)
+    if settings.LEADER_ELECTION:
+        leader.start()
+    else:
+        await start_reminders()
 
     try:
-        await dp.start_polling(bot)
+        if settings.WEBHOOK_MODE:
+            await run_webhook()
+        else:
+            # Удаляем вебхук перед запуском полинга
+            await bot.delete_webhook(drop_pending_updates=True)
+            await dp.start_polling(bot)
     finally:
-        await clear_all_reminders()
+        await leader.close()
+        await outbox.close()
+        scheduler.shutdown(wait=False)
+        await send_queue.close()
+        if metrics_runner:
+            await metrics_runner.cleanup()
         await db.close()
         await bot.session.close()
 
 
 if __name__ == "__main__":
+    setup_logging()
     asyncio.run(main())
@@ -0,0 +1,53 @@
+import calendar
+from datetime import date
+
+# Окна не больше года: иначе в выборку попадают все
+FULL_YEAR = 366
+LEAP_DAY = 229
+
+
+def month_day(d: date) -> int:
+    """Месяц и день в формате MMDD, как в колонке birthday_md"""
+    return d.month * 100 + d.day
+
+
+def occurrence(bday: date, year: int) -> date:
+    """День рождения в указанном году; 29 февраля в невисокосный год — 28 февраля"""
+    if bday.month == 2 and bday.day == 29 and not calendar.isleap(year):
+        return date(year, 2, 28)
+    return bday.replace(year=year)
+
+
+def next_occurrence(bday: date, today: date) -> date:
+    """Ближайший день рождения, начиная с today"""
+    this_year = occurrence(bday, today.year)
+    if this_year < today:
+        return occurrence(bday, today.year + 1)
+    return this_year
+
+
+def month_days_for(d: date) -> list[int]:
+    """Значения birthday_md, чей ДР приходится на день d"""
+    days = [month_day(d)]
+    if d.month == 2 and d.day == 28 and not calendar.isleap(d.year):
+        days.append(LEAP_DAY)
+    return days
+
+
+def month_day_ranges(start: date, end: date) -> tuple[int, int, int, int, list[int]]:
+    """
+    Окно дат [start, end] в виде двух диапазонов MMDD (второй — после
+    перехода через конец года) и списка дополнительных значений для 29 февраля
+    """
+    if (end - start).days + 1 >= FULL_YEAR:
+        return 101, 1231, 1, 0, []
+
+    extra = []
+    for year in range(start.year, end.year + 1):
+        feb_28 = date(year, 2, 28)
+        if not calendar.isleap(year) and start <= feb_28 <= end:
+            extra.append(LEAP_DAY)
+
+    if start.year == end.year:
+        return month_day(start), month_day(end), 1, 0, extra
+    return month_day(start), 1231, 101, month_day(end), extra
@@ -1,53 +1,277 @@
+import asyncio
 import logging
+import time
+from contextlib import asynccontextmanager, suppress
+from dataclasses import dataclass
 
 import asyncpg
 
+from src.utils.cache import MISSING, TTLCache
+from src.utils.metrics import registry
 from src.utils.settings import get_settings
 
+QUERY_SECONDS = registry.histogram(
+    "bot_db_query_seconds", "Время выполнения запросов к БД", labels=("query",)
+)
+ACQUIRE_SECONDS = registry.histogram(
+    "bot_db_pool_acquire_seconds", "Ожидание свободного соединения в пуле"
+)
+POOL_RESETS = registry.counter(
+    "bot_db_pool_resets_total", "Пересоздания пула после сбоя проверки"
+)
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+
+    @property
+    def avg_ms(self) -> float:
+        return self.total_ms / self.count if self.count else 0.0
+
 
 class Database:
     def __init__(self):
         self.pool = None
         self.settings = get_settings()
+        # invalidate_admin сбрасывает кэш только своего процесса: на других
+        # репликах снятые права действовали бы до ADMIN_CACHE_TTL
+        self.admin_cache = TTLCache(
+            maxsize=self.settings.ADMIN_CACHE_SIZE,
+            ttl=(
+                self.settings.ADMIN_CACHE_TTL if self.settings.BOT_REPLICAS == 1 else 0
+            ),
+        )
+        self.query_stats: dict[str, QueryStats] = {}
+        self._init_lock = asyncio.Lock()
+        self._health_task: asyncio.Task | None = None
+
+    def pool_options(self) -> dict:
+        """Параметры asyncpg.create_pool из настроек"""
+        return {
+            "min_size": self.settings.DB_POOL_MIN_SIZE,
+            "max_size": self.settings.DB_POOL_MAX_SIZE,
+            "max_inactive_connection_lifetime": self.settings.DB_POOL_MAX_IDLE,
+            "command_timeout": self.settings.DB_COMMAND_TIMEOUT,
+            # Без кэша asyncpg выполняет запросы безымянными подготовленными
+            # выражениями: PgBouncer может отдать следующий запрос другому серверу
+            "statement_cache_size": (
+                0 if self.settings.DB_STATEMENT_CACHE == "off" else 100
+            ),
+        }
 
     async def init(self):
-        """Инициализация пула соединений"""
+        """Инициализация и прогрев пула соединений, запуск проверок здоровья"""
+        async with self._init_lock:
+            if self.pool:
+                return
+            try:
+                self.pool = await asyncpg.create_pool(
+                    dsn=self.settings.ASYNC_PG_DSN, **self.pool_options()
+                )
+                logging.info("DB pool created")
+            except Exception:
+                logging.exception("Ошибка инициализации пула БД")
+                raise
+
+        await self.warmup()
+        if self.settings.DB_HEALTH_CHECK_INTERVAL > 0 and self._health_task is None:
+            self._health_task = asyncio.create_task(
+                self._health_loop(), name="db-health"
+            )
+
+    async def warmup(self):
+        """
+        Одновременный захват min_size соединений с проверочным запросом:
+        первые запросы после старта не ждут подключения
+        """
+        results = await asyncio.gather(
+            *(
+                self.pool.acquire(timeout=self.settings.DB_ACQUIRE_TIMEOUT)
+                for _ in range(self.pool.get_min_size())
+            ),
+            return_exceptions=True,
+        )
+        conns = [conn for conn in results if not isinstance(conn, BaseException)]
         try:
-            dsn = self.settings.ASYNC_PG_DSN
+            await asyncio.gather(*(conn.fetchval("SELECT 1") for conn in conns))
+        finally:
+            for conn in conns:
+                await self.pool.release(conn)
+        logging.info(f"DB pool warmed up: {len(conns)} connections")
+
+    async def check(self) -> bool | None:
+        """
+        Соединение пула живо и ведёт на основной сервер, а не на реплику.
+        None — свободного соединения не дождались: пул занят всплеском нагрузки,
+        и второй пул лишь удвоил бы число соединений. Зависшие на мёртвом
+        сервере запросы освобождают соединения через DB_COMMAND_TIMEOUT,
+        и следующая проверка уже увидит сбой
+        """
+        try:
+            conn = await self.pool.acquire(timeout=self.settings.DB_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            logging.info("Проверка соединения с БД отложена: пул занят")
+            return None
+        except Exception as e:
+            logging.warning(f"Проверка соединения с БД не прошла: {e}")
+            return False
+
+        try:
+            in_recovery = await conn.fetchval(
+                "SELECT pg_is_in_recovery()",
+                timeout=self.settings.DB_ACQUIRE_TIMEOUT,
+            )
+        except Exception as e:
+            logging.warning(f"Проверка соединения с БД не прошла: {e}")
+            return False
+        finally:
+            await self.pool.release(conn)
+
+        if in_recovery:
+            logging.warning("БД в режиме восстановления: пул подключён к реплике")
+        return not in_recovery
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.settings.DB_HEALTH_CHECK_INTERVAL)
+            if not self.pool:
+                with suppress(Exception):
+                    await self.init()
+                continue
+            if await self.check() is False:
+                try:
+                    await self.recreate()
+                except Exception as e:
+                    logging.warning(f"Не удалось пересоздать пул БД: {e}")
+
+    async def recreate(self):
+        """
+        Замена пула новым: после переключения мастера старые соединения ведут
+        на мёртвый или ставший репликой сервер. Старый пул закрывается после
+        выполняющихся запросов, но не дольше DB_COMMAND_TIMEOUT
+        """
+        async with self._init_lock:
+            old = self.pool
             self.pool = await asyncpg.create_pool(
-                dsn=dsn,
-                min_size=1,
-                max_size=10,
+                dsn=self.settings.ASYNC_PG_DSN, **self.pool_options()
             )
-            logging.info("DB pool created")
-        except Exception:
-            logging.exception("Ошибка инициализации пула БД")
-            raise
+        POOL_RESETS.inc()
+        logging.warning("DB pool recreated")
+        await self.warmup()
+
+        if old:
+            try:
+                await asyncio.wait_for(old.close(), self.settings.DB_COMMAND_TIMEOUT)
+            except asyncio.TimeoutError:
+                old.terminate()
 
     async def close(self):
         """Закрытие пула соединений"""
+        if self._health_task:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
         if self.pool:
             await self.pool.close()
             logging.info("DB pool closed")
 
+    @asynccontextmanager
+    async def timed(self, name: str):
+        """Замер времени запроса по имени с логированием медленных"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            stats = self.query_stats.setdefault(name, QueryStats())
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            QUERY_SECONDS.observe(elapsed_ms / 1000, query=name)
+            if elapsed_ms > self.settings.SLOW_QUERY_MS:
+                logging.warning(f"Медленный запрос {name}: {elapsed_ms:.1f} мс")
+
+    @asynccontextmanager
+    async def acquire(self):
+        """Соединение из пула с замером времени ожидания"""
+        if not self.pool:
+            logging.warning("DB pool is None, reinitializing...")
+            await self.init()
+        started = time.perf_counter()
+        async with self.pool.acquire(timeout=self.settings.DB_ACQUIRE_TIMEOUT) as conn:
+            ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+            yield conn
+
+    @asynccontextmanager
+    async def connection(self, conn: asyncpg.Connection | None = None):
+        """Переданное соединение или новое из пула"""
+        if conn is not None:
+            yield conn
+            return
+        async with self.acquire() as conn:
+            yield conn
+
+    def pool_stats(self) -> dict[tuple[str], int]:
+        """Размер пула по состояниям соединений"""
+        if not self.pool:
+            return {}
+        size = self.pool.get_size()
+        idle = self.pool.get_idle_size()
+        return {
+            ("busy",): size - idle,
+            ("idle",): idle,
+            ("max",): self.pool.get_max_size(),
+        }
+
+    # Запросы выполняются по постоянному тексту: встроенный кэш asyncpg
+    # готовит каждый из них один раз на соединение
+    async def fetch(self, name: str, query: str, *args, conn=None) -> list:
+        async with self.connection(conn) as conn, self.timed(name):
+            return await conn.fetch(query, *args)
+
+    async def fetchrow(self, name: str, query: str, *args, conn=None):
+        async with self.connection(conn) as conn, self.timed(name):
+            return await conn.fetchrow(query, *args)
+
+    async def fetchval(self, name: str, query: str, *args, conn=None):
+        async with self.connection(conn) as conn, self.timed(name):
+            return await conn.fetchval(query, *args)
+
+    async def execute(self, name: str, query: str, *args, conn=None) -> str:
+        async with self.connection(conn) as conn, self.timed(name):
+            return await conn.execute(query, *args)
+
     async def is_admin(self, telegram_id: int) -> bool:
         """Проверка, является ли пользователь админом"""
+        cached = self.admin_cache.get(telegram_id)
+        if cached is not MISSING:
+            return cached
+
         try:
-            if not self.pool:
-                logging.warning("DB pool is None, reinitializing...")
-                await self.init()
-                if not self.pool:
-                    logging.error("Failed to reinitialize DB pool")
-                    return False
-
-            async with self.pool.acquire() as conn:
-                row = await conn.fetchrow(
-                    "SELECT is_admin FROM users WHERE telegram_id = $1", telegram_id
-                )
-                return bool(row and (row.get("is_admin") or row["is_admin"]))
+            row = await self.fetchrow(
+                "is_admin",
+                "SELECT is_admin FROM bot_bday.users WHERE telegram_id = $1",
+                telegram_id,
+            )
+            result = bool(row and row["is_admin"])
+            self.admin_cache.set(telegram_id, result)
+            return result
         except Exception as e:
             logging.exception(f"Error in is_admin check: {e}")
             return False
 
+    def invalidate_admin(self, telegram_id: int):
+        """Сброс кэша прав после изменения роли пользователя"""
+        self.admin_cache.pop(telegram_id)
+
 
 db = Database()
+registry.gauge(
+    "bot_db_pool_connections",
+    "Соединения пула asyncpg",
+    labels=("state",),
+    collect=db.pool_stats,
+)
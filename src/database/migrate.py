@@ -1,4 +1,6 @@
+import argparse
 import asyncio
+import hashlib
 import logging
 import os
 
@@ -6,33 +8,125 @@ import asyncpg
 
 from src.utils.settings import get_settings
 
-logging.basicConfig(level=logging.INFO)
+MIGRATIONS_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "migrations",
+)
+# Ключ advisory lock: реплики, стартующие одновременно, ждут одного раннера
+MIGRATIONS_LOCK_KEY = 0x62646179
 
 
-async def apply_migrations():
-    """Applies SQL migrations from the migrations folder."""
+class MigrationError(Exception):
+    pass
+
+
+def read_migrations(migrations_dir: str = MIGRATIONS_DIR) -> list[tuple[str, str, str]]:
+    """Файлы миграций: (имя, sql, sha256)"""
+    if not os.path.exists(migrations_dir):
+        return []
+
+    migrations = []
+    for migration_file in sorted(
+        f for f in os.listdir(migrations_dir) if f.endswith(".sql")
+    ):
+        with open(os.path.join(migrations_dir, migration_file), "r") as f:
+            sql_script = f.read()
+        checksum = hashlib.sha256(sql_script.encode()).hexdigest()
+        migrations.append((migration_file, sql_script, checksum))
+    return migrations
+
+
+async def ensure_migrations_table(conn: asyncpg.Connection):
+    await conn.execute("""
+        CREATE SCHEMA IF NOT EXISTS bot_bday;
+        CREATE TABLE IF NOT EXISTS bot_bday.schema_migrations (
+            filename TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+        """)
+
+
+async def migration_status(
+    conn: asyncpg.Connection, migrations: list[tuple[str, str, str]]
+) -> tuple[list[str], list[str], list[str]]:
+    """
+    Состояние миграций: (применённые, ожидающие, изменённые после применения).
+    Только читает: без таблицы учёта все миграции считаются ожидающими
+    """
+    applied = {}
+    if await conn.fetchval("SELECT to_regclass('bot_bday.schema_migrations')"):
+        applied = {
+            row["filename"]: row["checksum"]
+            for row in await conn.fetch(
+                "SELECT filename, checksum FROM bot_bday.schema_migrations"
+            )
+        }
+
+    done, pending, changed = [], [], []
+    for migration_file, _, checksum in migrations:
+        if migration_file not in applied:
+            pending.append(migration_file)
+        elif applied[migration_file] != checksum:
+            changed.append(migration_file)
+        else:
+            done.append(migration_file)
+    return done, pending, changed
+
+
+async def pending_migrations(
+    conn: asyncpg.Connection, migrations: list[tuple[str, str, str]]
+) -> list[str]:
+    """Ожидающие миграции; изменённая после применения миграция — ошибка"""
+    done, pending, changed = await migration_status(conn, migrations)
+    if changed:
+        raise MigrationError(f"Applied migrations were modified: {', '.join(changed)}")
+
+    logging.info(f"Migrations: {len(done)} applied, {len(pending)} pending.")
+    return pending
+
+
+async def apply_migrations(dry_run: bool = False, migrations_dir: str = MIGRATIONS_DIR):
+    """Applies pending SQL migrations from the migrations folder."""
     settings = get_settings()
     conn = None
     try:
-        conn = await asyncpg.connect(dsn=settings.ASYNC_PG_DSN)
-
+        conn = await asyncpg.connect(dsn=settings.MIGRATIONS_DSN)
 
-        migrations_dir = "migrations"
         if not os.path.exists(migrations_dir):
             logging.info("Migrations directory not found. No migrations to apply.")
             return
 
-        migration_files = sorted(
-            [f for f in os.listdir(migrations_dir) if f.endswith(".sql")]
-        )
+        migrations = read_migrations(migrations_dir)
+        if dry_run:
+            # Отчёт ничего не пишет и не ждёт блокировки идущего деплоя
+            pending = await pending_migrations(conn, migrations)
+            for migration_file in pending:
+                logging.info(f"Pending migration {migration_file}")
+            return
 
-        for migration_file in migration_files:
-            logging.info(f"Applying migration {migration_file}...")
-            with open(os.path.join(migrations_dir, migration_file), "r") as f:
-                sql_script = f.read()
+        await conn.execute("SELECT pg_advisory_lock($1)", MIGRATIONS_LOCK_KEY)
+        try:
+            await ensure_migrations_table(conn)
+            pending = await pending_migrations(conn, migrations)
 
-            await conn.execute(sql_script)
-            logging.info(f"Migration {migration_file} applied successfully.")
+            for migration_file, sql_script, checksum in migrations:
+                if migration_file not in pending:
+                    continue
+                logging.info(f"Applying migration {migration_file}...")
+                async with conn.transaction():
+                    await conn.execute(sql_script)
+                    await conn.execute(
+                        """
+                        INSERT INTO bot_bday.schema_migrations (filename, checksum)
+                        VALUES ($1, $2)
+                        """,
+                        migration_file,
+                        checksum,
+                    )
+                logging.info(f"Migration {migration_file} applied successfully.")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATIONS_LOCK_KEY)
 
     except Exception as e:
         logging.exception(f"Error applying migrations: {e}")
@@ -43,4 +137,14 @@ async def apply_migrations():
 
 
 if __name__ == "__main__":
-    asyncio.run(apply_migrations())
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Apply SQL migrations")
+    parser.add_argument(
+        "--status",
+        "--dry-run",
+        dest="dry_run",
+        action="store_true",
+        help="only report applied and pending migrations",
+    )
+    args = parser.parse_args()
+    asyncio.run(apply_migrations(dry_run=args.dry_run))
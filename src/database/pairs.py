@@ -0,0 +1,185 @@
+from asyncpg import Record
+
+from src.database.db import Database, db
+
+# Класс advisory lock изменений пар; второй ключ — id группы
+PAIRS_LOCK_KEY = 0x70616972
+
+
+class PairService:
+    """
+    Изменение пар в группе. Каждая операция — один запрос с CTE, то есть одна
+    транзакция и один round-trip. Возвращаются затронутые строки
+    bot_bday.group_members после изменения (group_id, user_id, ward_id, giver_id):
+    по ним вызывающий сбрасывает кэш и перепланирует напоминания.
+
+    Изменения одной группы идут по очереди под advisory lock: затронутые строки
+    зависят от текущих связей, и без очереди встречные запросы блокировали бы
+    их в разном порядке. FOR UPDATE после ожидания читает свежие версии строк,
+    а не снимок на начало запроса
+    """
+
+    def __init__(self, database: Database):
+        self.db = database
+
+    async def relink(self, group_id: int, giver_id: int, ward_id: int) -> list[Record]:
+        """
+        Назначение пары giver → ward. Прежний подопечный дарителя остаётся без
+        дарителя, прежний даритель подопечного — без подопечного.
+        Пустой список — кто-то из двоих не состоит в группе
+        """
+        return await self.db.fetch(
+            "pairs_relink",
+            """
+            WITH locked AS (
+                SELECT pg_advisory_xact_lock($4, $1)
+            ), current AS (
+                SELECT user_id, ward_id, giver_id FROM bot_bday.group_members
+                WHERE group_id = $1 AND user_id IN ($2, $3)
+                  AND EXISTS (SELECT FROM locked)
+                FOR UPDATE
+            ), previous AS (
+                SELECT
+                    (SELECT ward_id FROM current WHERE user_id = $2) AS ward_id,
+                    (SELECT giver_id FROM current WHERE user_id = $3) AS giver_id
+                WHERE (SELECT count(*) FROM current) = 2
+            )
+            UPDATE bot_bday.group_members m
+            SET ward_id = CASE
+                    WHEN m.user_id = $2 THEN $3
+                    WHEN m.ward_id = $3 THEN NULL
+                    ELSE m.ward_id END,
+                giver_id = CASE
+                    WHEN m.user_id = $3 THEN $2
+                    WHEN m.giver_id = $2 THEN NULL
+                    ELSE m.giver_id END
+            FROM previous p
+            WHERE m.group_id = $1
+              AND (m.user_id IN ($2, $3, p.ward_id, p.giver_id) OR m.ward_id = $3)
+            RETURNING m.group_id, m.user_id, m.ward_id, m.giver_id
+            """,
+            group_id,
+            giver_id,
+            ward_id,
+            PAIRS_LOCK_KEY,
+        )
+
+    async def unlink(self, group_id: int, user_id1: int, user_id2: int) -> list[Record]:
+        """Разрыв связи между двумя участниками в обе стороны; пустой — связи не было"""
+        return await self.db.fetch(
+            "pairs_unlink",
+            """
+            WITH locked AS (
+                SELECT pg_advisory_xact_lock($4, $1)
+            )
+            UPDATE bot_bday.group_members
+            SET ward_id = CASE
+                    WHEN (user_id, ward_id) IN (($2, $3), ($3, $2)) THEN NULL
+                    ELSE ward_id END,
+                giver_id = CASE
+                    WHEN (user_id, giver_id) IN (($2, $3), ($3, $2)) THEN NULL
+                    ELSE giver_id END
+            WHERE group_id = $1
+              AND user_id IN ($2, $3)
+              AND ((user_id, ward_id) IN (($2, $3), ($3, $2))
+                   OR (user_id, giver_id) IN (($2, $3), ($3, $2)))
+              AND EXISTS (SELECT FROM locked)
+            RETURNING group_id, user_id, ward_id, giver_id
+            """,
+            group_id,
+            user_id1,
+            user_id2,
+            PAIRS_LOCK_KEY,
+        )
+
+    async def reset_user(self, group_id: int, user_id: int) -> list[Record]:
+        """
+        Сброс связей участника и всех ссылок на него в группе.
+        Пустой список — участник не состоит в группе
+        """
+        return await self.db.fetch(
+            "pairs_reset_user",
+            """
+            WITH locked AS (
+                SELECT pg_advisory_xact_lock($3, $1)
+            ), current AS (
+                SELECT user_id, ward_id, giver_id FROM bot_bday.group_members
+                WHERE group_id = $1 AND user_id = $2
+                  AND EXISTS (SELECT FROM locked)
+                FOR UPDATE
+            )
+            UPDATE bot_bday.group_members m
+            SET ward_id = CASE
+                    WHEN m.user_id = $2 OR m.ward_id = $2 THEN NULL
+                    ELSE m.ward_id END,
+                giver_id = CASE
+                    WHEN m.user_id = $2 OR m.giver_id = $2 THEN NULL
+                    ELSE m.giver_id END
+            FROM current c
+            WHERE m.group_id = $1
+              AND (m.user_id IN (c.user_id, c.ward_id, c.giver_id) OR m.ward_id = $2)
+            RETURNING m.group_id, m.user_id, m.ward_id, m.giver_id
+            """,
+            group_id,
+            user_id,
+            PAIRS_LOCK_KEY,
+        )
+
+    async def remove_user(self, telegram_id: int) -> tuple[int, list[Record]] | None:
+        """
+        Удаление пользователя с разрывом ссылок на него во всех группах.
+        Возвращает его id и затронутые строки: его участия (с пустыми связями)
+        и участников, чьи связи указывали на него; None — пользователь не найден
+        """
+        rows = await self.db.fetch(
+            "pairs_remove_user",
+            """
+            WITH target AS (
+                SELECT id FROM bot_bday.users WHERE telegram_id = $1 FOR UPDATE
+            ), locked AS (
+                -- Все группы пользователя, по возрастанию id
+                SELECT pg_advisory_xact_lock($2, g.group_id)
+                FROM (
+                    SELECT m.group_id FROM bot_bday.group_members m
+                    JOIN target t ON t.id = m.user_id
+                    ORDER BY m.group_id
+                ) g
+            ), memberships AS (
+                SELECT m.group_id, m.user_id, m.ward_id, m.giver_id
+                FROM bot_bday.group_members m
+                JOIN target t ON t.id = m.user_id
+                WHERE (SELECT count(*) FROM locked) IS NOT NULL
+                FOR UPDATE OF m
+            ), unlinked AS (
+                UPDATE bot_bday.group_members p
+                SET ward_id = NULLIF(p.ward_id, d.user_id),
+                    giver_id = NULLIF(p.giver_id, d.user_id)
+                FROM memberships d
+                WHERE p.group_id = d.group_id
+                  AND (p.user_id IN (d.ward_id, d.giver_id) OR p.ward_id = d.user_id)
+                RETURNING p.group_id, p.user_id, p.ward_id, p.giver_id
+            ), deleted AS (
+                -- Участия удаляются каскадом в конце запроса
+                DELETE FROM bot_bday.users u
+                USING target t
+                WHERE u.id = t.id
+                RETURNING u.id
+            )
+            SELECT d.id AS deleted_id, a.group_id, a.user_id, a.ward_id, a.giver_id
+            FROM deleted d
+            LEFT JOIN (
+                SELECT group_id, user_id, NULL::int AS ward_id, NULL::int AS giver_id
+                FROM memberships
+                UNION ALL
+                SELECT group_id, user_id, ward_id, giver_id FROM unlinked
+            ) a ON true
+            """,
+            telegram_id,
+            PAIRS_LOCK_KEY,
+        )
+        if not rows:
+            return None
+        return rows[0]["deleted_id"], [row for row in rows if row["user_id"]]
+
+
+pairs = PairService(db)
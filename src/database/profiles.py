@@ -0,0 +1,103 @@
+from typing import Any
+
+from src.database.repository import USER_COLUMNS, Repository, repo
+from src.utils.cache import MISSING, TTLCache
+from src.utils.settings import get_settings
+
+
+class ProfileCache:
+    """
+    Read-through кэш профилей пользователей по id и telegram_id.
+    Профили хранятся по id, telegram_id ведёт на id: инвалидации по id
+    достаточно, чтобы следующее чтение пошло в БД.
+    """
+
+    def __init__(self, repository: Repository, maxsize: int = 10_000, ttl: float = 30):
+        self.repository = repository
+        self._by_id = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._id_by_tg = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def put(self, row) -> dict[str, Any]:
+        """Запись профиля в кэш (write-through после изменения в БД)"""
+        profile = {column: row[column] for column in USER_COLUMNS}
+        self._by_id.set(profile["id"], profile)
+        self._id_by_tg.set(profile["telegram_id"], profile["id"])
+        return profile
+
+    def invalidate(self, *user_ids: int | None, telegram_id: int | None = None):
+        for user_id in user_ids:
+            if user_id:
+                self._by_id.pop(user_id)
+        if telegram_id is not None:
+            self._id_by_tg.pop(telegram_id)
+
+    def clear(self):
+        self._by_id.clear()
+        self._id_by_tg.clear()
+
+    def stats(self) -> dict[str, float]:
+        return self._by_id.stats()
+
+    def _cached_by_tg(self, telegram_id: int) -> dict[str, Any] | object:
+        user_id = self._id_by_tg.get(telegram_id)
+        if user_id is MISSING:
+            return MISSING
+        return self._by_id.get(user_id)
+
+    async def by_telegram_id(self, telegram_id: int) -> dict[str, Any] | None:
+        """Профиль по telegram_id; None — пользователь не зарегистрирован"""
+        cached = self._cached_by_tg(telegram_id)
+        if cached is not MISSING:
+            return cached
+
+        row = await self.repository.get_user_by_telegram_id(telegram_id)
+        return self.put(row) if row else None
+
+    async def by_id(self, user_id: int) -> dict[str, Any] | None:
+        """Профиль по id"""
+        cached = self._by_id.get(user_id)
+        if cached is not MISSING:
+            return cached
+
+        row = await self.repository.get_user(user_id)
+        return self.put(row) if row else None
+
+    async def ward_of(
+        self, telegram_id: int
+    ) -> tuple[dict[str, Any] | None, dict[str, Any] | None]:
+        """Профиль пользователя и его подопечного одним запросом (self-join)"""
+        user = self._cached_by_tg(telegram_id)
+        if user is not MISSING:
+            if not user["ward_id"]:
+                return user, None
+            ward = self._by_id.get(user["ward_id"])
+            if ward is not MISSING:
+                return user, ward
+
+        row = await self.repository.get_user_with_ward(telegram_id)
+
+        if row is None:
+            return None, None
+
+        user = self.put(row)
+        if row["ward_id"] is None:
+            return user, None
+        ward = {column: row[f"ward_{column}"] for column in USER_COLUMNS}
+        return user, self.put(ward) if ward["id"] is not None else None
+
+    async def update(self, telegram_id: int, **fields: Any) -> dict[str, Any] | None:
+        """Изменение полей профиля с записью результата в кэш"""
+        row = await self.repository.update_profile(telegram_id, **fields)
+        if row is None:
+            self.invalidate(telegram_id=telegram_id)
+            return None
+        return self.put(row)
+
+
+settings = get_settings()
+profiles = ProfileCache(
+    repo,
+    maxsize=settings.PROFILE_CACHE_SIZE,
+    # Инвалидация локальна: изменения с других реплик кэш не увидел бы
+    ttl=settings.PROFILE_CACHE_TTL if settings.BOT_REPLICAS == 1 else 0,
+)
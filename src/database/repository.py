@@ -0,0 +1,967 @@
+import math
+from datetime import date
+
+from asyncpg import Record
+
+from src.database.birthdays import month_day_ranges, next_occurrence
+from src.database.db import Database, db
+
+USER_COLUMNS = (
+    "id",
+    "telegram_id",
+    "full_name",
+    "birthday",
+    "wish",
+    "is_admin",
+    "current_group_id",
+    "ward_id",
+    "giver_id",
+)
+# Пары хранятся в участии в группе: профиль показывает текущую группу
+MEMBER_COLUMNS = {"ward_id", "giver_id"}
+EDITABLE_COLUMNS = {"full_name", "birthday", "wish"}
+# Сколько совпадений каждого вида ранжирует поиск по ФИО
+NAME_SEARCH_SCAN = 50
+
+
+def _profile_columns(user: str, member: str, prefix: str = "") -> list[str]:
+    return [
+        f"{member if c in MEMBER_COLUMNS else user}.{c}"
+        + (f" AS {prefix}{c}" if prefix else "")
+        for c in USER_COLUMNS
+    ]
+
+
+def _member_join(user: str, member: str) -> str:
+    """Участие пользователя в его текущей группе"""
+    return (
+        f"LEFT JOIN bot_bday.group_members {member} "
+        f"ON {member}.group_id = {user}.current_group_id AND {member}.user_id = {user}.id"
+    )
+
+
+_USER_SELECT = ", ".join(_profile_columns("u", "m"))
+_USER_FROM = f"bot_bday.users u {_member_join('u', 'm')}"
+_USER_WITH_WARD_SELECT = ", ".join(
+    _profile_columns("u", "m") + _profile_columns("w", "wm", prefix="ward_")
+)
+
+USERS_PAGE_QUERY = """
+    SELECT
+        u.id, u.full_name, u.birthday, u.wish, u.telegram_id, u.is_admin,
+        m.ward_id, m.giver_id
+    FROM bot_bday.group_members m
+    JOIN bot_bday.users u ON u.id = m.user_id
+    WHERE m.group_id = $1
+    ORDER BY m.user_id
+"""
+
+PAIRS_PAGE_QUERY = """
+    SELECT
+        g.id AS giver_id,
+        g.telegram_id AS giver_telegram_id,
+        g.full_name AS giver_name,
+        w.id AS ward_id,
+        w.telegram_id AS ward_telegram_id,
+        w.full_name AS ward_name,
+        w.birthday AS ward_birthday
+    FROM
+        bot_bday.group_members m
+    JOIN
+        bot_bday.users g ON g.id = m.user_id
+    JOIN
+        bot_bday.users w ON w.id = m.ward_id
+    WHERE
+        m.group_id = $1
+    ORDER BY
+        w.birthday, w.id
+"""
+
+GROUPS_PAGE_QUERY = """
+    SELECT
+        g.id,
+        g.title,
+        g.code,
+        (SELECT count(*) FROM bot_bday.group_members m WHERE m.group_id = g.id)
+            AS members
+    FROM bot_bday.groups g
+    ORDER BY g.id
+"""
+
+
+class Repository:
+    """Все запросы бота: у каждого есть имя, по которому он замеряется"""
+
+    def __init__(self, database: Database):
+        self.db = database
+
+    # ----- Пользователи -----
+    async def get_user(self, user_id: int) -> Record | None:
+        return await self.db.fetchrow(
+            "get_user",
+            f"SELECT {_USER_SELECT} FROM {_USER_FROM} WHERE u.id = $1",
+            user_id,
+        )
+
+    async def get_user_by_telegram_id(self, telegram_id: int) -> Record | None:
+        return await self.db.fetchrow(
+            "get_user_by_telegram_id",
+            f"SELECT {_USER_SELECT} FROM {_USER_FROM} WHERE u.telegram_id = $1",
+            telegram_id,
+        )
+
+    async def get_user_with_ward(self, telegram_id: int) -> Record | None:
+        """Пользователь и его подопечный в текущей группе (колонки ward_*)"""
+        return await self.db.fetchrow(
+            "get_user_with_ward",
+            f"""
+            SELECT {_USER_WITH_WARD_SELECT}
+            FROM {_USER_FROM}
+            LEFT JOIN bot_bday.users w ON w.id = m.ward_id
+            {_member_join('w', 'wm')}
+            WHERE u.telegram_id = $1
+            """,
+            telegram_id,
+        )
+
+    async def search_members(
+        self, group_id: int, query: str, limit: int
+    ) -> list[Record]:
+        """
+        Участники группы, в имени которых есть все слова query или их начала.
+        Сначала берутся совпадения целыми словами, затем по началам слов,
+        не больше NAME_SEARCH_SCAN каждых: частое имя не сканирует всю таблицу.
+        exact — имя совпадает с query без учёта регистра и знаков,
+        complete — все слова query совпали целиком
+        """
+        return await self.db.fetch(
+            "search_members",
+            """
+            WITH found AS (
+                (
+                    SELECT u.id
+                    FROM bot_bday.users u
+                    JOIN bot_bday.group_members m
+                        ON m.user_id = u.id AND m.group_id = $1
+                    WHERE u.name_tokens @> bot_bday.name_tokens($2)
+                    LIMIT $4
+                )
+                UNION
+                (
+                    SELECT u.id
+                    FROM bot_bday.users u
+                    JOIN bot_bday.group_members m
+                        ON m.user_id = u.id AND m.group_id = $1
+                    WHERE u.name_prefixes @> bot_bday.name_tokens($2)
+                    LIMIT $4
+                )
+            )
+            SELECT
+                u.id,
+                u.full_name,
+                u.name_tokens = bot_bday.name_tokens($2) AS exact,
+                u.name_tokens @> bot_bday.name_tokens($2) AS complete
+            FROM found
+            JOIN bot_bday.users u USING (id)
+            WHERE cardinality(bot_bday.name_tokens($2)) > 0
+            ORDER BY exact DESC, complete DESC, length(u.full_name), u.id
+            LIMIT $3
+            """,
+            group_id,
+            query,
+            limit,
+            NAME_SEARCH_SCAN,
+        )
+
+    async def existing_ids(self, *user_ids: int) -> set[int]:
+        rows = await self.db.fetch(
+            "existing_ids",
+            "SELECT id FROM bot_bday.users WHERE id = ANY($1::int[])",
+            list(user_ids),
+        )
+        return {row["id"] for row in rows}
+
+    async def member_ids(self, group_id: int, *user_ids: int) -> set[int]:
+        """Те из user_ids, кто состоит в группе"""
+        rows = await self.db.fetch(
+            "member_ids",
+            """
+            SELECT user_id FROM bot_bday.group_members
+            WHERE group_id = $1 AND user_id = ANY($2::int[])
+            """,
+            group_id,
+            list(user_ids),
+        )
+        return {row["user_id"] for row in rows}
+
+    async def user_names(self, user_ids) -> dict[int, str]:
+        rows = await self.db.fetch(
+            "user_names",
+            "SELECT id, full_name FROM bot_bday.users WHERE id = ANY($1::int[])",
+            list(user_ids),
+        )
+        return {row["id"]: row["full_name"] for row in rows}
+
+    async def create_user(
+        self,
+        telegram_id: int,
+        full_name: str,
+        birthday: date,
+        wish: str,
+        group_id: int | None = None,
+    ) -> Record:
+        """Регистрация пользователя и вступление в группу одним запросом"""
+        return await self.db.fetchrow(
+            "create_user",
+            f"""
+            WITH u AS (
+                INSERT INTO bot_bday.users
+                    (telegram_id, full_name, birthday, wish, current_group_id, registered_at)
+                VALUES ($1, $2, $3, $4, $5, NOW())
+                RETURNING *
+            ), m AS (
+                INSERT INTO bot_bday.group_members (group_id, user_id)
+                SELECT current_group_id, id FROM u WHERE current_group_id IS NOT NULL
+                RETURNING *
+            )
+            SELECT {_USER_SELECT} FROM u LEFT JOIN m ON TRUE
+            """,
+            telegram_id,
+            full_name,
+            birthday,
+            wish,
+            group_id,
+        )
+
+    async def update_profile(self, telegram_id: int, **fields) -> Record | None:
+        """Изменение полей профиля, доступных пользователю через /edit"""
+        columns = list(fields)
+        if not columns or not set(columns) <= EDITABLE_COLUMNS:
+            raise ValueError(f"Нельзя изменить поля: {columns}")
+
+        assignments = ", ".join(f"{c} = ${i}" for i, c in enumerate(columns, 2))
+        return await self.db.fetchrow(
+            f"update_{'_'.join(columns)}",
+            f"""
+            WITH u AS (
+                UPDATE bot_bday.users SET {assignments}
+                WHERE telegram_id = $1
+                RETURNING *
+            )
+            SELECT {_USER_SELECT} FROM u {_member_join('u', 'm')}
+            """,
+            telegram_id,
+            *fields.values(),
+        )
+
+    async def set_admin(self, telegram_id: int, is_admin: bool) -> Record | None:
+        return await self.db.fetchrow(
+            "set_admin",
+            """
+            UPDATE bot_bday.users SET is_admin = $2 WHERE telegram_id = $1
+            RETURNING id
+            """,
+            telegram_id,
+            is_admin,
+        )
+
+    # ----- Группы -----
+    async def get_group(self, group_id: int) -> Record | None:
+        return await self.db.fetchrow(
+            "get_group",
+            "SELECT id, title, code FROM bot_bday.groups WHERE id = $1",
+            group_id,
+        )
+
+    async def get_group_by_code(self, code: str) -> Record | None:
+        return await self.db.fetchrow(
+            "get_group_by_code",
+            "SELECT id, title, code FROM bot_bday.groups WHERE code = $1",
+            code,
+        )
+
+    async def create_group(self, title: str, code: str) -> Record:
+        return await self.db.fetchrow(
+            "create_group",
+            """
+            INSERT INTO bot_bday.groups (title, code) VALUES ($1, $2)
+            RETURNING id, title, code
+            """,
+            title,
+            code,
+        )
+
+    async def user_groups(self, user_id: int) -> list[Record]:
+        """Группы, в которых состоит пользователь"""
+        return await self.db.fetch(
+            "user_groups",
+            """
+            SELECT g.id, g.title, g.code
+            FROM bot_bday.group_members m
+            JOIN bot_bday.groups g ON g.id = m.group_id
+            WHERE m.user_id = $1
+            ORDER BY g.id
+            """,
+            user_id,
+        )
+
+    async def memberships(self, user_ids: list[int]) -> list[tuple[int, int]]:
+        """Участия (group_id, user_id) пользователей во всех группах"""
+        rows = await self.db.fetch(
+            "memberships",
+            """
+            SELECT group_id, user_id FROM bot_bday.group_members
+            WHERE user_id = ANY($1::int[])
+            """,
+            user_ids,
+        )
+        return [(row["group_id"], row["user_id"]) for row in rows]
+
+    async def join_group(self, group_id: int, user_id: int) -> bool:
+        """Вступление в группу и переход в неё; False — уже состоял"""
+        joined = await self.db.fetchval(
+            "join_group",
+            """
+            WITH joined AS (
+                INSERT INTO bot_bday.group_members (group_id, user_id)
+                VALUES ($1, $2) ON CONFLICT DO NOTHING
+                RETURNING 1
+            ), moved AS (
+                UPDATE bot_bday.users SET current_group_id = $1 WHERE id = $2
+            )
+            SELECT count(*) FROM joined
+            """,
+            group_id,
+            user_id,
+        )
+        return bool(joined)
+
+    async def set_current_group(self, user_id: int, group_id: int):
+        await self.db.execute(
+            "set_current_group",
+            "UPDATE bot_bday.users SET current_group_id = $2 WHERE id = $1",
+            user_id,
+            group_id,
+        )
+
+    # ----- Пары -----
+    async def list_user_ids(self, group_id: int) -> list[int]:
+        rows = await self.db.fetch(
+            "list_user_ids",
+            """
+            SELECT user_id FROM bot_bday.group_members
+            WHERE group_id = $1 ORDER BY user_id
+            """,
+            group_id,
+        )
+        return [row["user_id"] for row in rows]
+
+    async def write_pairs(
+        self,
+        group_id: int,
+        user_ids: list[int],
+        ward_ids: list[int],
+        giver_ids: list[int],
+    ):
+        """Запись распределения группы одним UPDATE и его сохранение в историю"""
+        async with self.db.acquire() as conn, conn.transaction():
+            await self.db.execute(
+                "write_pairs",
+                """
+                UPDATE bot_bday.group_members m
+                SET ward_id = p.ward_id, giver_id = p.giver_id
+                FROM unnest($2::int[], $3::int[], $4::int[])
+                    AS p(id, ward_id, giver_id)
+                WHERE m.group_id = $1 AND m.user_id = p.id
+                """,
+                group_id,
+                user_ids,
+                ward_ids,
+                giver_ids,
+                conn=conn,
+            )
+            await self.db.execute(
+                "write_pair_history",
+                """
+                INSERT INTO bot_bday.pair_history (group_id, giver_id, ward_id)
+                SELECT $1, * FROM unnest($2::int[], $3::int[])
+                """,
+                group_id,
+                user_ids,
+                ward_ids,
+                conn=conn,
+            )
+
+    async def pairing_candidates(self, group_id: int) -> list[Record]:
+        return await self.db.fetch(
+            "pairing_candidates",
+            """
+            SELECT u.id, u.birthday
+            FROM bot_bday.group_members m
+            JOIN bot_bday.users u ON u.id = m.user_id
+            WHERE m.group_id = $1
+            ORDER BY u.id
+            """,
+            group_id,
+        )
+
+    async def pair_exclusions(self) -> set[tuple[int, int]]:
+        rows = await self.db.fetch(
+            "pair_exclusions", "SELECT giver_id, ward_id FROM bot_bday.pair_exclusions"
+        )
+        return {(row["giver_id"], row["ward_id"]) for row in rows}
+
+    async def pair_history(self, group_id: int, years: int) -> set[tuple[int, int]]:
+        """
+        Пары распределений группы за years предыдущих календарных лет.
+        Распределения текущего года не в счёт: /random можно перезапустить,
+        например после вступления новых участников
+        """
+        rows = await self.db.fetch(
+            "pair_history",
+            """
+            SELECT DISTINCT giver_id, ward_id FROM bot_bday.pair_history
+            WHERE group_id = $1
+              AND assigned_at >= date_trunc('year', NOW()) - make_interval(years => $2)
+              AND assigned_at < date_trunc('year', NOW())
+            """,
+            group_id,
+            years,
+        )
+        return {(row["giver_id"], row["ward_id"]) for row in rows}
+
+    async def add_exclusion(self, giver_id: int, ward_id: int) -> bool:
+        result = await self.db.execute(
+            "add_exclusion",
+            """
+            INSERT INTO bot_bday.pair_exclusions (giver_id, ward_id)
+            VALUES ($1, $2) ON CONFLICT DO NOTHING
+            """,
+            giver_id,
+            ward_id,
+        )
+        return result.endswith(" 1")
+
+    async def remove_exclusion(self, giver_id: int, ward_id: int) -> bool:
+        result = await self.db.execute(
+            "remove_exclusion",
+            "DELETE FROM bot_bday.pair_exclusions WHERE giver_id = $1 AND ward_id = $2",
+            giver_id,
+            ward_id,
+        )
+        return result.endswith(" 1")
+
+    async def reset_all_links(self, group_id: int):
+        await self.db.execute(
+            "reset_all_links",
+            """
+            UPDATE bot_bday.group_members SET ward_id = NULL, giver_id = NULL
+            WHERE group_id = $1
+            """,
+            group_id,
+        )
+
+    # ----- Постраничные списки -----
+    async def page(
+        self, name: str, query: str, page: int, page_size: int, *args
+    ) -> tuple[list[Record], int, int]:
+        """Страница строк через серверный курсор: (строки, страница, всего страниц)"""
+        async with self.db.acquire() as conn, conn.transaction(readonly=True):
+            total = await self.db.fetchval(
+                f"{name}_count",
+                f"SELECT count(*) FROM ({query}) AS q",
+                *args,
+                conn=conn,
+            )
+            if not total:
+                return [], 0, 0
+
+            pages = math.ceil(total / page_size)
+            page = min(page, pages - 1)
+            async with self.db.timed(name):
+                cursor = await conn.cursor(query, *args)
+                if page:
+                    await cursor.forward(page * page_size)
+                rows = await cursor.fetch(page_size)
+        return rows, page, pages
+
+    async def users_page(self, group_id: int, page: int, page_size: int):
+        return await self.page(
+            "users_page", USERS_PAGE_QUERY, page, page_size, group_id
+        )
+
+    async def pairs_page(self, group_id: int, page: int, page_size: int):
+        return await self.page(
+            "pairs_page", PAIRS_PAGE_QUERY, page, page_size, group_id
+        )
+
+    async def groups_page(self, page: int, page_size: int):
+        return await self.page("groups_page", GROUPS_PAGE_QUERY, page, page_size)
+
+    # ----- Напоминания -----
+    async def reminder_targets(
+        self, wards=None, group_id: int | None = None
+    ) -> list[Record]:
+        """
+        Подопечные с дарителем: все, одной группы или указанные
+        ключами (group_id, ward_id)
+        """
+        if wards is not None:
+            group_ids, ward_ids = zip(*wards) if wards else ((), ())
+            return await self.db.fetch(
+                "reminder_targets",
+                """
+                SELECT m.group_id, u.id, u.birthday, m.giver_id
+                FROM unnest($1::int[], $2::int[]) AS k(group_id, user_id)
+                JOIN bot_bday.group_members m USING (group_id, user_id)
+                JOIN bot_bday.users u ON u.id = m.user_id
+                """,
+                list(group_ids),
+                list(ward_ids),
+            )
+        if group_id is not None:
+            return await self.db.fetch(
+                "reminder_targets_group",
+                """
+                SELECT m.group_id, u.id, u.birthday, m.giver_id
+                FROM bot_bday.group_members m
+                JOIN bot_bday.users u ON u.id = m.user_id
+                WHERE m.group_id = $1 AND m.giver_id IS NOT NULL
+                """,
+                group_id,
+            )
+        return await self.db.fetch(
+            "reminder_targets_all",
+            """
+            SELECT m.group_id, u.id, u.birthday, m.giver_id
+            FROM bot_bday.group_members m
+            JOIN bot_bday.users u ON u.id = m.user_id
+            WHERE m.giver_id IS NOT NULL
+            """,
+        )
+
+    async def reminder_parties(
+        self, group_id: int, giver_id: int, ward_id: int
+    ) -> list[Record]:
+        """Даритель и подопечный, если пара giver → ward в группе ещё действует"""
+        return await self.db.fetch(
+            "reminder_parties",
+            """
+            SELECT u.id, u.telegram_id, u.full_name, u.birthday, u.wish,
+                g.title AS group_title
+            FROM bot_bday.group_members m
+            JOIN bot_bday.groups g ON g.id = m.group_id
+            JOIN bot_bday.users u ON u.id IN (m.user_id, m.giver_id)
+            WHERE m.group_id = $1 AND m.user_id = $3 AND m.giver_id = $2
+            """,
+            group_id,
+            giver_id,
+            ward_id,
+        )
+
+    async def sweep_reminders(
+        self, month_days: list[int], offsets: list[int]
+    ) -> list[Record]:
+        """Подопечные с ДР в указанные дни MMDD и telegram_id их дарителей по группам"""
+        return await self.db.fetch(
+            "sweep_reminders",
+            """
+            SELECT
+                d.days_before,
+                m.group_id,
+                m.giver_id,
+                w.id AS ward_id,
+                g.telegram_id AS giver_telegram_id,
+                gr.title AS group_title,
+                w.full_name,
+                w.birthday,
+                w.wish
+            FROM unnest($1::smallint[], $2::int[]) AS d(birthday_md, days_before)
+            JOIN bot_bday.users w ON w.birthday_md = d.birthday_md
+            JOIN bot_bday.group_members m ON m.user_id = w.id
+            JOIN bot_bday.users g ON g.id = m.giver_id
+            JOIN bot_bday.groups gr ON gr.id = m.group_id
+            """,
+            month_days,
+            offsets,
+        )
+
+    async def count_reminder_jobs(self, group_id: int | None = None) -> int:
+        return await self.db.fetchval(
+            "count_reminder_jobs",
+            "SELECT count(*) FROM bot_bday.apscheduler_jobs WHERE id LIKE $1",
+            "reminder:%" if group_id is None else f"reminder:{group_id}:%",
+        )
+
+    async def add_reminder_jobs(self, jobs: list[tuple[str, float, bytes]]) -> int:
+        """
+        Пачка задач напоминаний (id, next_run_time, job_state) одним запросом
+        в таблицу SQLAlchemyJobStore; задачи с теми же id заменяются
+        """
+        if not jobs:
+            return 0
+        result = await self.db.execute(
+            "add_reminder_jobs",
+            """
+            INSERT INTO bot_bday.apscheduler_jobs (id, next_run_time, job_state)
+            SELECT * FROM unnest($1::text[], $2::float8[], $3::bytea[])
+            ON CONFLICT (id) DO UPDATE
+            SET next_run_time = EXCLUDED.next_run_time,
+                job_state = EXCLUDED.job_state
+            """,
+            *(list(column) for column in zip(*jobs)),
+        )
+        return int(result.split()[-1])
+
+    async def delete_reminder_jobs(self, job_ids: list[str]) -> int:
+        """
+        Удаление задач напоминаний по id одним запросом. Таблица общая для
+        реплик, а SQLAlchemyJobStore ничего не кэширует: удаление видно всем
+        """
+        result = await self.db.execute(
+            "delete_reminder_jobs",
+            "DELETE FROM bot_bday.apscheduler_jobs WHERE id = ANY($1::text[])",
+            job_ids,
+        )
+        return int(result.split()[-1])
+
+    async def clear_reminder_jobs(self, group_id: int | None = None) -> int:
+        """Удаление всех задач напоминаний или задач одной группы"""
+        result = await self.db.execute(
+            "clear_reminder_jobs",
+            "DELETE FROM bot_bday.apscheduler_jobs WHERE id LIKE $1",
+            "reminder:%" if group_id is None else f"reminder:{group_id}:%",
+        )
+        return int(result.split()[-1])
+
+    async def delete_stale_reminder_jobs(self, offsets: list[int]) -> int:
+        """Удаление задач напоминаний с отступами не из offsets"""
+        result = await self.db.execute(
+            "delete_stale_reminder_jobs",
+            """
+            DELETE FROM bot_bday.apscheduler_jobs
+            WHERE id LIKE 'reminder:%'
+              AND split_part(id, ':', 4)::int <> ALL($1::int[])
+            """,
+            offsets,
+        )
+        return int(result.split()[-1])
+
+    async def wards_without_reminder(self, days_before: int) -> list[tuple[int, int]]:
+        """Подопечные (group_id, ward_id) с дарителем и ДР без задачи на days_before"""
+        rows = await self.db.fetch(
+            "wards_without_reminder",
+            """
+            SELECT m.group_id, m.user_id
+            FROM bot_bday.group_members m
+            JOIN bot_bday.users u ON u.id = m.user_id
+            WHERE m.giver_id IS NOT NULL AND u.birthday IS NOT NULL
+              AND NOT EXISTS (
+                  SELECT FROM bot_bday.apscheduler_jobs j
+                  WHERE j.id = format(
+                      'reminder:%s:%s:%s', m.group_id, m.user_id, $1::int
+                  )
+              )
+            """,
+            days_before,
+        )
+        return [(row["group_id"], row["user_id"]) for row in rows]
+
+    async def count_scheduler_jobs(self) -> int:
+        return await self.db.fetchval(
+            "count_scheduler_jobs", "SELECT count(*) FROM bot_bday.apscheduler_jobs"
+        )
+
+    async def reminder_jobs_page(
+        self, group_id: int, limit: int, offset: int
+    ) -> list[bytes]:
+        """Сериализованные задачи напоминаний группы в порядке срабатывания"""
+        rows = await self.db.fetch(
+            "reminder_jobs_page",
+            """
+            SELECT job_state FROM bot_bday.apscheduler_jobs
+            WHERE id LIKE $1
+            ORDER BY next_run_time, id
+            LIMIT $2 OFFSET $3
+            """,
+            f"reminder:{group_id}:%",
+            limit,
+            offset,
+        )
+        return [row["job_state"] for row in rows]
+
+    async def upcoming_birthdays(
+        self, group_id: int, start: date, end: date
+    ) -> list[tuple[date, Record]]:
+        """
+        Участники группы с ДР в окне [start, end] по индексу birthday_md,
+        отсортированные по дате ближайшего ДР
+        """
+        if end < start:
+            return []
+
+        rows = await self.db.fetch(
+            "upcoming_birthdays",
+            """
+            SELECT u.id, u.telegram_id, u.full_name, u.birthday, u.wish,
+                m.ward_id, m.giver_id
+            FROM bot_bday.users u
+            JOIN bot_bday.group_members m ON m.user_id = u.id AND m.group_id = $1
+            WHERE u.birthday_md BETWEEN $2 AND $3
+               OR u.birthday_md BETWEEN $4 AND $5
+               OR u.birthday_md = ANY($6::smallint[])
+            """,
+            group_id,
+            *month_day_ranges(start, end),
+        )
+
+        result = []
+        for row in rows:
+            when = next_occurrence(row["birthday"], start)
+            if when <= end:
+                result.append((when, row))
+        result.sort(key=lambda item: (item[0], item[1]["id"]))
+        return result
+
+    # ----- Импорт и экспорт -----
+    async def import_users(
+        self, group_id: int, records
+    ) -> tuple[int, list[int], list[int]]:
+        """
+        Загрузка пользователей через COPY во временную таблицу и один upsert
+        в bot_bday.users со вступлением в группу. records — итератор
+        (line, telegram_id, full_name, birthday, wish), читается потоково;
+        при повторе telegram_id побеждает последняя строка.
+        Возвращает (добавлено, id обновлённых, id тех, у кого сменилась дата рождения)
+        """
+        async with self.db.acquire() as conn, conn.transaction():
+            await self.db.execute(
+                "import_users_staging",
+                """
+                CREATE TEMP TABLE users_import (
+                    line INTEGER,
+                    telegram_id BIGINT,
+                    full_name VARCHAR(255),
+                    birthday DATE,
+                    wish TEXT
+                ) ON COMMIT DROP
+                """,
+                conn=conn,
+            )
+            async with self.db.timed("import_users_copy"):
+                await conn.copy_records_to_table("users_import", records=records)
+            row = await self.db.fetchrow(
+                "import_users_upsert",
+                """
+                WITH staged AS (
+                    SELECT DISTINCT ON (telegram_id)
+                        telegram_id, full_name, birthday, wish
+                    FROM users_import
+                    ORDER BY telegram_id, line DESC
+                ), moved AS (
+                    -- Прежние даты: все части запроса видят один снимок
+                    SELECT u.id
+                    FROM staged s
+                    JOIN bot_bday.users u USING (telegram_id)
+                    WHERE u.birthday IS DISTINCT FROM s.birthday
+                ), upserted AS (
+                    INSERT INTO bot_bday.users (
+                        telegram_id, full_name, birthday, wish,
+                        current_group_id, registered_at
+                    )
+                    SELECT telegram_id, full_name, birthday, wish, $1, NOW()
+                    FROM staged
+                    ON CONFLICT (telegram_id) DO UPDATE
+                    SET full_name = EXCLUDED.full_name,
+                        birthday = EXCLUDED.birthday,
+                        wish = EXCLUDED.wish
+                    RETURNING id, xmax = 0 AS inserted
+                ), joined AS (
+                    INSERT INTO bot_bday.group_members (group_id, user_id)
+                    SELECT $1, id FROM upserted
+                    ON CONFLICT DO NOTHING
+                )
+                SELECT
+                    count(*) FILTER (WHERE inserted) AS inserted,
+                    coalesce(array_agg(id) FILTER (WHERE NOT inserted), '{}')
+                        AS updated,
+                    ARRAY(SELECT id FROM moved) AS moved
+                FROM upserted
+                """,
+                group_id,
+                conn=conn,
+            )
+        return row["inserted"], row["updated"], row["moved"]
+
+    async def export_users(self, group_id: int, output) -> int:
+        """
+        Участники группы с их парами в CSV через COPY: строки пишутся
+        в output (путь или файл), не проходя через память. Возвращает число строк
+        """
+        async with self.db.acquire() as conn, self.db.timed("export_users"):
+            result = await conn.copy_from_query(
+                """
+                SELECT
+                    u.id,
+                    u.telegram_id,
+                    u.full_name,
+                    to_char(u.birthday, 'DD.MM.YYYY') AS birthday,
+                    u.wish,
+                    u.is_admin,
+                    m.giver_id,
+                    g.full_name AS giver_name,
+                    m.ward_id,
+                    w.full_name AS ward_name
+                FROM bot_bday.group_members m
+                JOIN bot_bday.users u ON u.id = m.user_id
+                LEFT JOIN bot_bday.users g ON g.id = m.giver_id
+                LEFT JOIN bot_bday.users w ON w.id = m.ward_id
+                WHERE m.group_id = $1
+                ORDER BY u.id
+                """,
+                group_id,
+                output=output,
+                format="csv",
+                header=True,
+            )
+        return int(result.split()[-1])
+
+    # ----- Очередь напоминаний -----
+    async def enqueue_reminders(self, rows: list[tuple]) -> int:
+        """
+        Пачка строк reminder_outbox: (group_id, giver_id, ward_id, days_before,
+        year, chat_id, text, scheduled_at); повторы по ключу пропускаются
+        """
+        if not rows:
+            return 0
+        result = await self.db.execute(
+            "enqueue_reminders",
+            """
+            INSERT INTO bot_bday.reminder_outbox (
+                group_id, giver_id, ward_id, days_before, year,
+                chat_id, text, scheduled_at
+            )
+            SELECT * FROM unnest(
+                $1::int[], $2::int[], $3::int[], $4::smallint[], $5::smallint[],
+                $6::bigint[], $7::text[], $8::timestamptz[]
+            )
+            ON CONFLICT (giver_id, ward_id, days_before, year) DO NOTHING
+            """,
+            *(list(column) for column in zip(*rows)),
+        )
+        return int(result.split()[-1])
+
+    async def claim_reminders(self, limit: int, claim_timeout: float) -> list[Record]:
+        """
+        Взятие в работу пачки готовых к отправке строк. Строки, занятые другими
+        воркерами, пропускаются; если воркер не отчитается за claim_timeout,
+        строка снова станет доступна
+        """
+        return await self.db.fetch(
+            "claim_reminders",
+            """
+            WITH due AS (
+                SELECT id FROM bot_bday.reminder_outbox
+                WHERE status = 'pending' AND next_attempt_at <= NOW()
+                ORDER BY next_attempt_at
+                LIMIT $1
+                FOR UPDATE SKIP LOCKED
+            )
+            UPDATE bot_bday.reminder_outbox o
+            SET attempts = o.attempts + 1,
+                next_attempt_at = NOW() + make_interval(secs => $2)
+            FROM due
+            WHERE o.id = due.id
+            RETURNING o.id, o.chat_id, o.text, o.scheduled_at, o.attempts
+            """,
+            limit,
+            claim_timeout,
+        )
+
+    async def complete_reminders(
+        self,
+        ids: list[int],
+        delays: list[float | None],
+        errors: list[str | None],
+    ):
+        """
+        Итог отправки пачки: без ошибки — sent, с задержкой — повтор через
+        delay секунд, без задержки — failed
+        """
+        await self.db.execute(
+            "complete_reminders",
+            """
+            UPDATE bot_bday.reminder_outbox o
+            SET status = CASE
+                    WHEN r.error IS NULL THEN 'sent'
+                    WHEN r.delay IS NULL THEN 'failed'
+                    ELSE 'pending' END,
+                sent_at = CASE WHEN r.error IS NULL THEN NOW() END,
+                next_attempt_at = CASE
+                    WHEN r.delay IS NULL THEN o.next_attempt_at
+                    ELSE NOW() + make_interval(secs => r.delay) END,
+                last_error = r.error
+            FROM unnest($1::bigint[], $2::float8[], $3::text[]) AS r(id, delay, error)
+            WHERE o.id = r.id
+            """,
+            ids,
+            delays,
+            errors,
+        )
+
+    async def reminder_outbox_counts(self) -> dict[tuple[str], int]:
+        rows = await self.db.fetch(
+            "reminder_outbox_counts",
+            "SELECT status, count(*) FROM bot_bday.reminder_outbox GROUP BY status",
+        )
+        return {(row["status"],): row["count"] for row in rows}
+
+    async def purge_reminders(self, days: int) -> int:
+        """Удаление доставленных напоминаний старше days дней"""
+        result = await self.db.execute(
+            "purge_reminders",
+            """
+            DELETE FROM bot_bday.reminder_outbox
+            WHERE status = 'sent' AND sent_at < NOW() - make_interval(days => $1)
+            """,
+            days,
+        )
+        return int(result.split()[-1])
+
+    # ----- Аренда ролей -----
+    async def acquire_lease(self, name: str, holder: str, ttl: float) -> bool:
+        """
+        Захват или продление аренды: удаётся владельцу или после истечения.
+        Срок считается по часам БД, поэтому расхождение часов реплик не влияет
+        """
+        row = await self.db.fetchrow(
+            "acquire_lease",
+            """
+            INSERT INTO bot_bday.leases (name, holder, expires_at)
+            VALUES ($1, $2, NOW() + make_interval(secs => $3))
+            ON CONFLICT (name) DO UPDATE
+            SET holder = EXCLUDED.holder,
+                expires_at = EXCLUDED.expires_at,
+                acquired_at = CASE
+                    WHEN bot_bday.leases.holder = EXCLUDED.holder
+                    THEN bot_bday.leases.acquired_at ELSE NOW() END
+            WHERE bot_bday.leases.holder = EXCLUDED.holder
+               OR bot_bday.leases.expires_at < NOW()
+            RETURNING holder
+            """,
+            name,
+            holder,
+            ttl,
+        )
+        return row is not None
+
+    async def release_lease(self, name: str, holder: str):
+        await self.db.execute(
+            "release_lease",
+            "DELETE FROM bot_bday.leases WHERE name = $1 AND holder = $2",
+            name,
+            holder,
+        )
+
+
+repo = Repository(db)
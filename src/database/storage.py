@@ -0,0 +1,163 @@
+import json
+import logging
+from datetime import date, datetime
+from typing import Any, Dict, Mapping, Optional
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    BaseStorage,
+    DefaultKeyBuilder,
+    KeyBuilder,
+    StateType,
+    StorageKey,
+)
+
+from src.database.db import Database
+from src.utils.cache import MISSING, TTLCache
+
+
+def _encode(value: Any) -> Any:
+    # Даты из регистрации (RegStates.birthday) переживают JSON-сериализацию
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, date):
+        return {"__date__": value.isoformat()}
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _decode(obj: dict) -> Any:
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    if "__date__" in obj:
+        return date.fromisoformat(obj["__date__"])
+    return obj
+
+
+def dumps(data: Mapping[str, Any]) -> str:
+    return json.dumps(data, default=_encode, ensure_ascii=False)
+
+
+def loads(raw: str | None) -> Dict[str, Any]:
+    if not raw:
+        return {}
+    return json.loads(raw, object_hook=_decode)
+
+
+class PostgresStorage(BaseStorage):
+    """
+    FSM-хранилище в Postgres (bot_bday.fsm_storage) с кэшем в памяти процесса.
+    Несколько экземпляров бота видят общее состояние диалогов;
+    записи старше state_ttl считаются истёкшими.
+
+    Кэш не знает о записях других процессов, поэтому при нескольких репликах
+    его нужно отключать (cache_ttl=0). Промахи не кэшируются: состояние,
+    которое только что появилось, не должно теряться
+    """
+
+    def __init__(
+        self,
+        database: Database,
+        state_ttl: int = 7 * 24 * 60 * 60,
+        cache_ttl: float = 5,
+        cache_size: int = 10_000,
+        key_builder: KeyBuilder | None = None,
+    ):
+        self.database = database
+        self.state_ttl = state_ttl
+        self.cache = TTLCache(maxsize=cache_size, ttl=cache_ttl)
+        self.key_builder = key_builder or DefaultKeyBuilder(with_bot_id=True)
+
+    async def _load(self, key: str) -> tuple[Optional[str], Dict[str, Any]]:
+        """Чтение записи через кэш"""
+        record = self.cache.get(key)
+        if record is not MISSING:
+            return record
+
+        row = await self.database.fetchrow(
+            "fsm_load",
+            """
+            SELECT state, data FROM bot_bday.fsm_storage
+            WHERE key = $1 AND updated_at > NOW() - make_interval(secs => $2)
+            """,
+            key,
+            self.state_ttl,
+        )
+
+        if row is None:
+            return None, {}
+        record = (row["state"], loads(row["data"]))
+        self.cache.set(key, record)
+        return record
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state = state.state if isinstance(state, State) else state
+        storage_key = self.key_builder.build(key)
+        # Данные истёкшей записи _load не видит: в новый диалог они не переходят
+        row = await self.database.fetchrow(
+            "fsm_set_state",
+            """
+            INSERT INTO bot_bday.fsm_storage (key, state) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE
+            SET state = EXCLUDED.state,
+                data = CASE
+                    WHEN bot_bday.fsm_storage.updated_at
+                        > NOW() - make_interval(secs => $3)
+                    THEN bot_bday.fsm_storage.data ELSE '{}'::jsonb END,
+                updated_at = NOW()
+            RETURNING state, data
+            """,
+            storage_key,
+            state,
+            self.state_ttl,
+        )
+        self.cache.set(storage_key, (row["state"], loads(row["data"])))
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(self.key_builder.build(key))
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(
+                f"Data must be a dict or dict-like object, got {type(data).__name__}"
+            )
+        storage_key = self.key_builder.build(key)
+        row = await self.database.fetchrow(
+            "fsm_set_data",
+            """
+            INSERT INTO bot_bday.fsm_storage (key, data) VALUES ($1, $2::jsonb)
+            ON CONFLICT (key) DO UPDATE
+            SET data = EXCLUDED.data,
+                state = CASE
+                    WHEN bot_bday.fsm_storage.updated_at
+                        > NOW() - make_interval(secs => $3)
+                    THEN bot_bday.fsm_storage.state END,
+                updated_at = NOW()
+            RETURNING state, data
+            """,
+            storage_key,
+            dumps(data),
+            self.state_ttl,
+        )
+        self.cache.set(storage_key, (row["state"], loads(row["data"])))
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(self.key_builder.build(key))
+        return data.copy()
+
+    async def purge_expired(self):
+        """Удаление истёкших и пустых записей"""
+        result = await self.database.execute(
+            "fsm_purge_expired",
+            """
+            DELETE FROM bot_bday.fsm_storage
+            WHERE updated_at < NOW() - make_interval(secs => $1)
+               OR (state IS NULL AND data = '{}'::jsonb)
+            """,
+            self.state_ttl,
+        )
+        logging.info(f"FSM storage purge: {result}")
+
+    async def close(self) -> None:
+        self.cache.clear()
@@ -0,0 +1,263 @@
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import random
+import statistics
+import time
+from collections import defaultdict
+
+from src.bench.fake_telegram import FakeTelegramServer
+from src.bench.fixtures import (
+    ADMIN_TELEGRAM_ID,
+    BENCH_GROUP_ID,
+    SEED_TELEGRAM_BASE,
+    SIGNUP_TELEGRAM_BASE,
+    DisposableDatabase,
+    seed_users,
+)
+from src.bench.updates import message_update, registration_flow
+from src.utils.send_queue import TokenBucket
+from src.utils.settings import get_settings
+
+LOADGEN_TOKEN = "123456:loadgen"
+ADMIN_COMMANDS = ["/users", "/pairs", "/upcoming", "/reminders", "/users 5"]
+DEFAULT_MIX = "register=1,me=4,ward=4,admin=1"
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """Доли сессий: register=1,me=4,..."""
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ("register", "me", "ward", "admin"):
+            raise argparse.ArgumentTypeError(f"Неизвестная сессия: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(q * len(values)), len(values) - 1)]
+
+
+class LoadGenerator:
+    """
+    Замкнутый цикл из concurrency виртуальных пользователей: каждый выбирает
+    сессию по долям mix и отправляет её обновления в dp.feed_update,
+    общий темп ограничен rate обновлений в секунду
+    """
+
+    def __init__(
+        self,
+        app,
+        acquire_metric,
+        users: int,
+        mix: dict[str, float],
+        rate: float = 0,
+        concurrency: int = 50,
+        seed: int = 0,
+    ):
+        self.app = app
+        self.acquire_metric = acquire_metric
+        self.users = users
+        self.mix = mix
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self.concurrency = concurrency
+        self.rng = random.Random(seed)
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.errors = 0
+        self.pool_busy: list[int] = []
+        self._signup_ids = itertools.count(SIGNUP_TELEGRAM_BASE)
+
+    def random_user(self) -> int:
+        i = self.rng.randrange(1, self.users) if self.users > 1 else 0
+        return SEED_TELEGRAM_BASE + i if i else ADMIN_TELEGRAM_ID
+
+    def session(self) -> tuple[str, list]:
+        kind = self.rng.choices(list(self.mix), weights=list(self.mix.values()))[0]
+        if kind == "register":
+            return kind, registration_flow(next(self._signup_ids))
+        if kind == "admin":
+            command = self.rng.choice(ADMIN_COMMANDS)
+            return kind, [message_update(ADMIN_TELEGRAM_ID, command)]
+        return kind, [message_update(self.random_user(), f"/{kind}")]
+
+    async def feed(self, kind: str, update):
+        if self.bucket:
+            await self.bucket.acquire()
+        started = time.perf_counter()
+        try:
+            await self.app.dp.feed_update(self.app.bot, update)
+        except Exception as e:
+            self.errors += 1
+            logging.warning(f"Ошибка обработки {kind}: {e}")
+        self.latencies[kind].append(time.perf_counter() - started)
+
+    async def worker(self, deadline: float):
+        while time.monotonic() < deadline:
+            kind, updates = self.session()
+            for update in updates:
+                await self.feed(kind, update)
+
+    async def sample_pool(self, deadline: float, interval: float = 0.05):
+        while time.monotonic() < deadline:
+            stats = self.app.db.pool_stats()
+            self.pool_busy.append(stats.get(("busy",), 0))
+            await asyncio.sleep(interval)
+
+    async def run(self, duration: float) -> dict:
+        acquire = self.acquire_metric
+        acquired_before, waited_before = acquire.count(), acquire.total()
+
+        deadline = time.monotonic() + duration
+        started = time.perf_counter()
+        sampler = asyncio.create_task(self.sample_pool(deadline))
+        await asyncio.gather(*(self.worker(deadline) for _ in range(self.concurrency)))
+        elapsed = time.perf_counter() - started
+        await sampler
+
+        acquired = acquire.count() - acquired_before
+        pool_max = self.app.db.pool_stats().get(("max",), 0)
+        all_latencies = [v for values in self.latencies.values() for v in values]
+        return {
+            "duration": round(elapsed, 3),
+            "updates": len(all_latencies),
+            "errors": self.errors,
+            "throughput": round(len(all_latencies) / elapsed, 2),
+            "latency": {
+                kind: {
+                    "count": len(values),
+                    "p50": round(percentile(values, 0.5), 6),
+                    "p99": round(percentile(values, 0.99), 6),
+                }
+                for kind, values in {"all": all_latencies, **self.latencies}.items()
+            },
+            "pool": {
+                "max_size": pool_max,
+                "busy_avg": round(statistics.fmean(self.pool_busy or [0]), 2),
+                "busy_max": max(self.pool_busy or [0]),
+                # Доля замеров, когда свободных соединений не было
+                "saturated": round(
+                    sum(busy >= pool_max for busy in self.pool_busy)
+                    / max(len(self.pool_busy), 1),
+                    3,
+                ),
+                "acquires": acquired,
+                "acquire_wait_avg": round(
+                    (acquire.total() - waited_before) / acquired if acquired else 0, 6
+                ),
+                "acquire_wait_p99": round(acquire.quantile(0.99), 6),
+            },
+        }
+
+
+async def prepare(app, users: int):
+    """Синтетические пользователи одной группы, разбитые на пары по кругу"""
+    async with app.db.acquire() as conn:
+        await seed_users(conn, users)
+    user_ids = await app.repo.list_user_ids(BENCH_GROUP_ID)
+    random.Random(0).shuffle(user_ids)
+    await app.repo.write_pairs(
+        BENCH_GROUP_ID,
+        user_ids,
+        user_ids[1:] + user_ids[:1],
+        user_ids[-1:] + user_ids[:-1],
+    )
+
+
+async def run(args: argparse.Namespace) -> dict:
+    os.environ["API_TOKEN"] = LOADGEN_TOKEN
+    database = DisposableDatabase(
+        args.database_url or get_settings().ASYNC_PG_DSN, prefix="bday_loadgen"
+    )
+    telegram = FakeTelegramServer(latency=args.api_latency)
+
+    await database.create()
+    await telegram.start()
+    os.environ.update(
+        DATABASE_URL=database.dsn,
+        TELEGRAM_API_URL=telegram.url,
+        METRICS_ENABLED="false",
+    )
+    try:
+        # Модули бота читают настройки при импорте: только после подмены окружения
+        from src import bot as app
+        from src.database.db import ACQUIRE_SECONDS
+        from src.database.migrate import apply_migrations
+
+        await apply_migrations()
+        await app.db.init()
+        try:
+            await prepare(app, args.users)
+            generator = LoadGenerator(
+                app,
+                ACQUIRE_SECONDS,
+                users=args.users,
+                mix=args.mix,
+                rate=args.rate,
+                concurrency=args.concurrency,
+                seed=args.seed,
+            )
+            report = await generator.run(args.duration)
+        finally:
+            await app.db.close()
+            await app.bot.session.close()
+    finally:
+        await telegram.close()
+        await database.drop()
+
+    report["config"] = {
+        "users": args.users,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        "mix": args.mix,
+        "api_latency": args.api_latency,
+    }
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    parser = argparse.ArgumentParser(
+        description="Replay synthetic updates through the Dispatcher"
+    )
+    parser.add_argument("--users", type=int, default=1000, help="seeded users")
+    parser.add_argument(
+        "--duration", type=float, default=30, help="test length, seconds"
+    )
+    parser.add_argument(
+        "--rate", type=float, default=0, help="updates per second, 0 — unlimited"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=50, help="simultaneous virtual users"
+    )
+    parser.add_argument(
+        "--mix",
+        type=parse_mix,
+        default=parse_mix(DEFAULT_MIX),
+        help=f"session weights (default: {DEFAULT_MIX})",
+    )
+    parser.add_argument(
+        "--api-latency",
+        type=float,
+        default=0,
+        help="fake Bot API response delay, seconds",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--database-url",
+        help="server for the disposable database (default: DATABASE_URL)",
+    )
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
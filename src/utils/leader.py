@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+import secrets
+import socket
+import time
+from typing import Awaitable, Callable
+
+from src.database.repository import Repository
+
+
+def default_holder() -> str:
+    """Имя реплики: хост, pid и случайный суффикс на случай одинаковых pid"""
+    return f"{socket.gethostname()}:{os.getpid()}:{secrets.token_hex(3)}"
+
+
+class LeaderElection:
+    """
+    Выбор ведущей реплики через аренду в bot_bday.leases.
+    Ведущий продлевает аренду каждые interval секунд; если продлить не удаётся,
+    он слагает полномочия раньше, чем аренда истечёт в БД, поэтому двух ведущих
+    не бывает. Остальные реплики перехватывают роль не позже чем через
+    ttl + interval после падения ведущего.
+
+    on_elected и on_demoted выполняются в отдельной задаче по очереди:
+    долгий запуск ведущего не задерживает продление аренды
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        name: str,
+        holder: str | None = None,
+        ttl: float = 30,
+        interval: float = 10,
+        on_elected: Callable[[], Awaitable] | None = None,
+        on_demoted: Callable[[], Awaitable] | None = None,
+    ):
+        if ttl < 2 * interval:
+            raise ValueError(
+                "Срок аренды должен быть не меньше двух интервалов продления"
+            )
+        self.repository = repository
+        self.name = name
+        self.holder = holder or default_holder()
+        self.ttl = ttl
+        self.interval = interval
+        self._on_elected = on_elected
+        self._on_demoted = on_demoted
+        self._task: asyncio.Task | None = None
+        self._role_task: asyncio.Task | None = None
+        self._valid_until = 0.0
+        self.is_leader = False
+        self.elections = 0
+
+    def start(self):
+        """Запуск цикла захвата и продления аренды"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name=f"leader-{self.name}")
+
+    async def close(self):
+        """Остановка цикла; ведущий освобождает аренду для быстрого перехвата"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+        if self.is_leader:
+            self._set_leader(False)
+            try:
+                await self.repository.release_lease(self.name, self.holder)
+            except Exception as e:
+                logging.warning(f"Не удалось освободить аренду {self.name}: {e}")
+
+        if self._role_task is not None:
+            await asyncio.gather(self._role_task, return_exceptions=True)
+            self._role_task = None
+
+    def _set_leader(self, is_leader: bool):
+        self.is_leader = is_leader
+        if is_leader:
+            self.elections += 1
+            logging.info(f"Реплика {self.holder} стала ведущей ({self.name})")
+        else:
+            logging.warning(f"Реплика {self.holder} больше не ведущая ({self.name})")
+
+        callback = self._on_elected if is_leader else self._on_demoted
+        if callback:
+            self._role_task = asyncio.create_task(
+                self._switch_role(callback, self._role_task, cancel=not is_leader),
+                name=f"leader-{self.name}-role",
+            )
+
+    async def _switch_role(
+        self,
+        callback: Callable[[], Awaitable],
+        previous: asyncio.Task | None,
+        cancel: bool,
+    ):
+        """Смена роли после предыдущей; при снятии незавершённый запуск прерывается"""
+        if previous is not None:
+            if cancel:
+                previous.cancel()
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await callback()
+        except Exception as e:
+            logging.exception(f"Ошибка смены роли {self.name}: {e}")
+
+    async def _renew(self) -> bool | None:
+        """True — аренда наша, False — занята другой репликой, None — БД недоступна"""
+        try:
+            return await asyncio.wait_for(
+                self.repository.acquire_lease(self.name, self.holder, self.ttl),
+                self.interval,
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.warning(f"Не удалось продлить аренду {self.name}: {e}")
+            return None
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            acquired = await self._renew()
+
+            if acquired:
+                # Срок в БД отсчитывается не раньше отправки запроса
+                self._valid_until = started + self.ttl
+                if not self.is_leader:
+                    self._set_leader(True)
+            elif self.is_leader and (
+                acquired is False
+                # Следующая попытка может не успеть до истечения аренды
+                or time.monotonic() >= self._valid_until - self.interval
+            ):
+                self._set_leader(False)
+
+            await asyncio.sleep(max(self.interval - (time.monotonic() - started), 0))
@@ -0,0 +1,56 @@
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+
+from src.utils.metrics import registry
+
+UPDATES = registry.counter(
+    "bot_updates_total", "Обработанные обновления Telegram", labels=("type",)
+)
+HANDLER_SECONDS = registry.histogram(
+    "bot_handler_seconds", "Время обработки обновления", labels=("command",)
+)
+HANDLER_ERRORS = registry.counter(
+    "bot_handler_errors_total", "Обновления, завершившиеся ошибкой", labels=("command",)
+)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Внешний middleware обновлений: пропускная способность и время обработки.
+    Неизвестные команды сводятся к одной метке, чтобы не раздувать число серий.
+    """
+
+    def __init__(self, commands: Iterable[str] = ()):
+        self.commands = set(commands)
+
+    def command_of(self, update: Update) -> str:
+        if update.message and update.message.text:
+            text = update.message.text
+            if not text.startswith("/"):
+                return "message"
+            command = text.split(maxsplit=1)[0].split("@", 1)[0].lower()
+            return command if command in self.commands else "/other"
+        if update.callback_query:
+            prefix = (update.callback_query.data or "").split(":", 1)[0]
+            return f"callback:{prefix}" if prefix.isidentifier() else "callback"
+        return update.event_type
+
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, dict[str, Any]], Awaitable[Any]],
+        event: Update,
+        data: dict[str, Any],
+    ) -> Any:
+        command = self.command_of(event)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            HANDLER_ERRORS.inc(command=command)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, command=command)
+            UPDATES.inc(type=event.event_type)
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+from contextlib import suppress
+
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from src.database.repository import Repository
+from src.utils.send_queue import SendQueue
+
+# Ошибки, после которых повторять отправку бесполезно
+PERMANENT_ERRORS = (TelegramForbiddenError, TelegramBadRequest)
+
+
+class ReminderOutbox:
+    """
+    Пул воркеров, доставляющих bot_bday.reminder_outbox через очередь отправки.
+    Каждый воркер забирает пачку строк (FOR UPDATE SKIP LOCKED), ждёт результата
+    отправки и отмечает строки доставленными или откладывает повтор с
+    экспоненциальной задержкой. Строка, взятая упавшим процессом, снова
+    становится доступной через claim_timeout: доставка «хотя бы один раз»
+    """
+
+    def __init__(
+        self,
+        repository: Repository,
+        send_queue: SendQueue,
+        workers: int = 4,
+        batch_size: int = 100,
+        max_attempts: int = 8,
+        claim_timeout: float = 600,
+        poll_interval: float = 5,
+        backoff_base: float = 30,
+        backoff_max: float = 6 * 60 * 60,
+    ):
+        self.repository = repository
+        self.send_queue = send_queue
+        self._workers_count = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.claim_timeout = claim_timeout
+        self.poll_interval = poll_interval
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._workers: list[asyncio.Task] = []
+        self._stopping = asyncio.Event()
+
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+
+    def backoff(self, attempts: int) -> float:
+        """Задержка перед следующей попыткой после attempts неудачных"""
+        return min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+
+    def start(self):
+        """Запуск воркеров"""
+        if self._workers:
+            return
+        self._stopping.clear()
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"reminder-outbox-{i}")
+            for i in range(self._workers_count)
+        ]
+
+    async def close(self):
+        """
+        Остановка воркеров: новые пачки не берутся, взятые дожидаются отправки
+        и отметки в БД. Отменять их нельзя: тексты уже стоят в очереди отправки
+        и уйдут, а неотмеченные строки через claim_timeout отправят повторно
+        """
+        self._stopping.set()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def drain(self):
+        """Доставка всего, что уже готово к отправке (для бенчмарков и тестов)"""
+        while any(
+            await asyncio.gather(
+                *(self.process_batch() for _ in range(self._workers_count))
+            )
+        ):
+            pass
+
+    async def process_batch(self) -> int:
+        """Одна пачка: возвращает число взятых строк"""
+        rows = await self.repository.claim_reminders(
+            self.batch_size, self.claim_timeout
+        )
+        if not rows:
+            return 0
+
+        futures = [
+            self.send_queue.submit(
+                row["chat_id"], row["text"], row["scheduled_at"].timestamp()
+            )
+            for row in rows
+        ]
+        # Не дольше срока захвата: иначе строку уже мог забрать другой воркер
+        done, pending = await asyncio.wait(futures, timeout=self.claim_timeout)
+        for future in pending:
+            future.cancel()
+
+        ids, delays, errors = [], [], []
+        for row, future in zip(rows, futures):
+            error = (
+                future.exception()
+                if future in done
+                else asyncio.TimeoutError("Очередь отправки не ответила")
+            )
+            ids.append(row["id"])
+            if error is None:
+                self.sent += 1
+                delays.append(None)
+                errors.append(None)
+                continue
+
+            if (
+                isinstance(error, PERMANENT_ERRORS)
+                or row["attempts"] >= self.max_attempts
+            ):
+                self.failed += 1
+                delays.append(None)
+                logging.error(
+                    f"Напоминание #{row['id']} не доставлено "
+                    f"(попыток: {row['attempts']}): {error}"
+                )
+            else:
+                self.retried += 1
+                delays.append(self.backoff(row["attempts"]))
+            errors.append(str(error) or type(error).__name__)
+
+        await self.repository.complete_reminders(ids, delays, errors)
+        return len(rows)
+
+    async def _worker(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.process_batch()
+            except Exception as e:
+                logging.exception(f"Ошибка обработки очереди напоминаний: {e}")
+                claimed = 0
+            # Неполная пачка — готовых строк больше нет, ждём следующих
+            if claimed < self.batch_size:
+                with suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._stopping.wait(), self.poll_interval)
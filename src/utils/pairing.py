@@ -0,0 +1,191 @@
+import random
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Callable
+
+from src.database.birthdays import occurrence
+
+YEAR_DAYS = 365
+# Невисокосный год: 29 февраля считается 28-м
+_REFERENCE_YEAR = 2001
+# Обменов на одно нарушение и проходов починки: при разреженных ограничениях
+# хватает нескольких попыток, поэтому время почти линейно по числу участников
+SWAP_ATTEMPTS = 64
+REPAIR_PASSES = 8
+
+REASONS = {
+    "self": "дарит сам себе",
+    "excluded": "пара запрещена",
+    "repeat": "пара уже была",
+    "birthday": "дни рождения слишком близко",
+}
+
+
+def day_of_year(bday: date) -> int:
+    return occurrence(bday, _REFERENCE_YEAR).timetuple().tm_yday
+
+
+@dataclass
+class Constraints:
+    """Ограничения на пару даритель → подопечный"""
+
+    exclusions: set[tuple[int, int]] = field(default_factory=set)
+    history: set[tuple[int, int]] = field(default_factory=set)
+    birthdays: dict[int, date | None] = field(default_factory=dict)
+    # Минимум дней между ДР дарителя и подопечного (по кругу года)
+    min_birthday_distance: int = 0
+
+    def __post_init__(self):
+        self._days = {
+            user_id: day_of_year(bday)
+            for user_id, bday in self.birthdays.items()
+            if bday
+        }
+
+    def violation(self, giver_id: int, ward_id: int) -> str | None:
+        """Причина, по которой пара недопустима, или None"""
+        if giver_id == ward_id:
+            return "self"
+        if (giver_id, ward_id) in self.exclusions:
+            return "excluded"
+        if (giver_id, ward_id) in self.history:
+            return "repeat"
+        if self.min_birthday_distance:
+            giver_day = self._days.get(giver_id)
+            ward_day = self._days.get(ward_id)
+            if giver_day is not None and ward_day is not None:
+                distance = abs(giver_day - ward_day)
+                if min(distance, YEAR_DAYS - distance) < self.min_birthday_distance:
+                    return "birthday"
+        return None
+
+    def allowed(self, giver_id: int, ward_id: int) -> bool:
+        return self.violation(giver_id, ward_id) is None
+
+
+@dataclass
+class Violation:
+    giver_id: int
+    ward_id: int
+    reason: str
+
+    def __str__(self) -> str:
+        return f"#{self.giver_id} → #{self.ward_id}: {REASONS[self.reason]}"
+
+
+@dataclass
+class Pairing:
+    engine: str
+    seed: int
+    pairs: list[tuple[int, int]]
+    violations: list[Violation]
+
+    def columns(self) -> tuple[list[int], list[int], list[int]]:
+        """Колонки для записи: (id, ward_id, giver_id) каждого участника"""
+        ward_of = dict(self.pairs)
+        giver_of = {ward_id: giver_id for giver_id, ward_id in self.pairs}
+        user_ids = list(ward_of)
+        return (
+            user_ids,
+            [ward_of[user_id] for user_id in user_ids],
+            [giver_of[user_id] for user_id in user_ids],
+        )
+
+
+def _repair(
+    size: int,
+    bad: Callable[[int], bool],
+    affected: Callable[[int, int], set[int]],
+    swap: Callable[[int, int], None],
+    rng: random.Random,
+):
+    """
+    Локальная починка случайного решения: элемент на нарушающей позиции
+    меняется местами со случайным, если нарушений вокруг обоих становится меньше
+    """
+    for _ in range(REPAIR_PASSES):
+        positions = [i for i in range(size) if bad(i)]
+        if not positions:
+            return
+        for i in positions:
+            if not bad(i):
+                continue
+            for _ in range(SWAP_ATTEMPTS):
+                j = rng.randrange(size)
+                if j == i:
+                    continue
+                edges = affected(i, j)
+                before = sum(bad(k) for k in edges)
+                swap(i, j)
+                if sum(bad(k) for k in edges) < before:
+                    break
+                swap(i, j)
+
+
+def build_cycle(
+    user_ids: list[int], constraints: Constraints, rng: random.Random
+) -> list[tuple[int, int]]:
+    """Один круг через всех участников: каждый дарит следующему"""
+    order = list(user_ids)
+    rng.shuffle(order)
+    size = len(order)
+
+    # Позиция i — ребро order[i] → order[i + 1]; чинится сменой подопечного
+    def bad(i: int) -> bool:
+        return not constraints.allowed(order[i], order[(i + 1) % size])
+
+    def swap(i: int, j: int):
+        a, b = (i + 1) % size, (j + 1) % size
+        order[a], order[b] = order[b], order[a]
+
+    def affected(i: int, j: int) -> set[int]:
+        return {i, (i + 1) % size, j, (j + 1) % size}
+
+    _repair(size, bad, affected, swap, rng)
+    return [(order[i], order[(i + 1) % size]) for i in range(size)]
+
+
+def build_derangement(
+    user_ids: list[int], constraints: Constraints, rng: random.Random
+) -> list[tuple[int, int]]:
+    """Перестановка без неподвижных точек: допускает несколько кругов"""
+    givers = list(user_ids)
+    wards = list(user_ids)
+    rng.shuffle(wards)
+
+    def bad(i: int) -> bool:
+        return not constraints.allowed(givers[i], wards[i])
+
+    def swap(i: int, j: int):
+        wards[i], wards[j] = wards[j], wards[i]
+
+    _repair(len(givers), bad, lambda i, j: {i, j}, swap, rng)
+    return list(zip(givers, wards))
+
+
+# Движки распределения: новый движок — функция с той же сигнатурой
+ENGINES: dict[str, Callable[..., list[tuple[int, int]]]] = {
+    "cycle": build_cycle,
+    "derangement": build_derangement,
+}
+
+
+def plan_pairs(
+    user_ids: list[int],
+    constraints: Constraints,
+    engine: str = "cycle",
+    seed: int | None = None,
+) -> Pairing:
+    """Распределение пар с проверкой оставшихся нарушений; в БД ничего не пишет"""
+    if seed is None:
+        seed = random.randrange(2**32)
+    pairs = []
+    if len(user_ids) >= 2:
+        pairs = ENGINES[engine](user_ids, constraints, random.Random(seed))
+
+    violations = []
+    for giver_id, ward_id in pairs:
+        reason = constraints.violation(giver_id, ward_id)
+        if reason:
+            violations.append(Violation(giver_id, ward_id, reason))
+    return Pairing(engine=engine, seed=seed, pairs=pairs, violations=violations)
@@ -0,0 +1,284 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from src.utils.metrics import Histogram
+
+# Лимит длины сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+
+class TokenBucket:
+    """Глобальный ограничитель скорости отправки"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(
+                    self.capacity, self._tokens + (now - self._updated) * self.rate
+                )
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+@dataclass
+class _Pending:
+    texts: list[str] = field(default_factory=list)
+    # Ожидающие результата отправки каждого текста (см. submit)
+    waiters: list[list[asyncio.Future]] = field(default_factory=list)
+    enqueued_at: float = field(default_factory=time.monotonic)
+    # Время по расписанию (unix time), от которого считается задержка отправки
+    scheduled_at: float | None = None
+
+
+class SendQueue:
+    """Очередь исходящих сообщений с ограничением скорости и склейкой по чату"""
+
+    def __init__(
+        self,
+        send: Callable[..., Awaitable],
+        rate: float = 25,
+        chat_interval: float = 1.0,
+        workers: int = 4,
+        max_retries: int = 5,
+        lag_metric: Histogram | None = None,
+    ):
+        self._send = send
+        self._bucket = TokenBucket(rate)
+        self._chat_interval = chat_interval
+        self._workers_count = workers
+        self._max_retries = max_retries
+        self._lag_metric = lag_metric
+        self._queue: asyncio.Queue[int] = asyncio.Queue()
+        self._pending: dict[int, _Pending] = {}
+        self._last_sent: dict[int, float] = {}
+        self._workers: list[asyncio.Task] = []
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.lag_last = 0.0
+        self.lag_max = 0.0
+        self._lag_total = 0.0
+
+    def start(self):
+        """Запуск воркеров отправки"""
+        if self._workers:
+            return
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"send-queue-{i}")
+            for i in range(self._workers_count)
+        ]
+
+    async def close(self, timeout: float = 10):
+        """Дожидается отправки очереди и останавливает воркеров"""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(
+                f"Очередь отправки не опустела за {timeout}с: {self.depth} чатов"
+            )
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    def enqueue(self, chat_id: int, text: str, scheduled_at: float | None = None):
+        """Постановка сообщения в очередь; сообщения одному чату склеиваются"""
+        self._add(chat_id, text, scheduled_at, None)
+
+    def submit(
+        self, chat_id: int, text: str, scheduled_at: float | None = None
+    ) -> asyncio.Future:
+        """
+        Как enqueue, но с результатом: future завершается None после доставки
+        или исключением Telegram, если сообщение так и не ушло
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._add(chat_id, text, scheduled_at, future)
+        return future
+
+    def _add(
+        self,
+        chat_id: int,
+        text: str,
+        scheduled_at: float | None,
+        waiter: asyncio.Future | None,
+    ):
+        self.enqueued += 1
+        waiters = [waiter] if waiter else []
+        pending = self._pending.get(chat_id)
+        if pending is None:
+            # Пока запись есть, чатом занят один воркер: тексты, пришедшие
+            # во время отправки, он заберёт сам, соблюдая интервал чата
+            pending = self._pending[chat_id] = _Pending()
+            self._queue.put_nowait(chat_id)
+        elif pending.texts:
+            self.coalesced += 1
+
+        if not pending.texts:
+            pending.enqueued_at = time.monotonic()
+            pending.scheduled_at = None
+        if text in pending.texts:
+            pending.waiters[pending.texts.index(text)].extend(waiters)
+        else:
+            pending.texts.append(text)
+            pending.waiters.append(waiters)
+        if scheduled_at is not None:
+            pending.scheduled_at = min(
+                pending.scheduled_at or scheduled_at, scheduled_at
+            )
+
+    async def drain(self):
+        """Ожидание отправки всего, что уже стоит в очереди"""
+        await self._queue.join()
+
+    @property
+    def depth(self) -> int:
+        """Количество чатов, ожидающих отправки"""
+        return self._queue.qsize()
+
+    def stats(self) -> dict[str, float]:
+        """Счётчики очереди"""
+        return {
+            "depth": self.depth,
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retried": self.retried,
+            "lag_last": self.lag_last,
+            "lag_max": self.lag_max,
+            "lag_avg": self._lag_total / self.sent if self.sent else 0.0,
+        }
+
+    async def _worker(self):
+        while True:
+            chat_id = await self._queue.get()
+            try:
+                await self._deliver(chat_id)
+            except Exception as e:
+                logging.exception(f"Ошибка очереди отправки для чата {chat_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _wait_chat(self, chat_id: int):
+        last = self._last_sent.get(chat_id)
+        if last is not None:
+            delay = last + self._chat_interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+    def _take_chunk(
+        self, chat_id: int
+    ) -> tuple[str, list[asyncio.Future], float, float | None] | None:
+        """
+        Забирает из ожидающих столько текстов, сколько влезет в сообщение.
+        Когда текстов не осталось, чат освобождается
+        """
+        pending = self._pending.get(chat_id)
+        if pending is None or not pending.texts:
+            self._pending.pop(chat_id, None)
+            return None
+
+        chunk = pending.texts.pop(0)
+        waiters = pending.waiters.pop(0)
+        while pending.texts and len(chunk) + 2 + len(pending.texts[0]) <= MESSAGE_LIMIT:
+            chunk += "\n\n" + pending.texts.pop(0)
+            waiters += pending.waiters.pop(0)
+
+        return chunk, waiters, pending.enqueued_at, pending.scheduled_at
+
+    async def _deliver(self, chat_id: int):
+        while (taken := self._take_chunk(chat_id)) is not None:
+            text, waiters, enqueued_at, scheduled_at = taken
+            try:
+                error = await self._send_with_retry(chat_id, text)
+            except Exception as e:
+                logging.exception(f"Ошибка отправки в чат {chat_id}: {e}")
+                self.failed += 1
+                error = e
+            for waiter in waiters:
+                if waiter.done():
+                    continue
+                if error is None:
+                    waiter.set_result(None)
+                else:
+                    waiter.set_exception(error)
+            if error is not None:
+                continue
+
+            if scheduled_at is not None and self._lag_metric is not None:
+                self._lag_metric.observe(max(time.time() - scheduled_at, 0))
+
+            lag = time.monotonic() - enqueued_at
+            self.lag_last = lag
+            self.lag_max = max(self.lag_max, lag)
+            self._lag_total += lag
+
+    async def _send_with_retry(self, chat_id: int, text: str) -> Exception | None:
+        """Отправка с повторами; None — доставлено, иначе последняя ошибка"""
+        for attempt in range(self._max_retries + 1):
+            await self._wait_chat(chat_id)
+            await self._bucket.acquire()
+            try:
+                await self._send(chat_id, text)
+                self._last_sent[chat_id] = time.monotonic()
+                self.sent += 1
+                self._prune_last_sent()
+                return None
+            except TelegramRetryAfter as e:
+                delay = e.retry_after
+                error = e
+            except (TelegramForbiddenError, TelegramBadRequest) as e:
+                # Пользователь заблокировал бота или чат недоступен — повтор бесполезен
+                logging.error(f"Сообщение в чат {chat_id} не доставлено: {e}")
+                self.failed += 1
+                return e
+            except (TelegramNetworkError, TelegramServerError) as e:
+                delay = min(2**attempt, 60)
+                error = e
+                logging.warning(f"Ошибка отправки в чат {chat_id}: {e}")
+
+            if attempt < self._max_retries:
+                self.retried += 1
+                await asyncio.sleep(delay)
+
+        self.failed += 1
+        logging.error(f"Сообщение в чат {chat_id} не доставлено после повторов")
+        return error
+
+    def _prune_last_sent(self):
+        if len(self._last_sent) < 10_000:
+            return
+        border = time.monotonic() - self._chat_interval
+        self._last_sent = {
+            chat_id: sent_at
+            for chat_id, sent_at in self._last_sent.items()
+            if sent_at > border
+        }
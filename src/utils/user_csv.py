@@ -0,0 +1,79 @@
+import csv
+import itertools
+from datetime import date, datetime
+from typing import Iterator
+
+# Колонки импорта; файл экспорта содержит их же и потому загружается обратно
+IMPORT_COLUMNS = ("telegram_id", "full_name", "birthday", "wish")
+DATE_FORMATS = ("%d.%m.%Y", "%Y-%m-%d")
+DELIMITERS = ",;\t"
+FULL_NAME_LIMIT = 255
+
+
+def parse_birthday(value: str) -> date:
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).date()
+        except ValueError:
+            pass
+    raise ValueError(f"неверная дата «{value}»")
+
+
+def parse_row(row: dict[str, str]) -> tuple[int, str, date, str]:
+    if not row["telegram_id"].isdigit() or int(row["telegram_id"]) <= 0:
+        raise ValueError(f"неверный telegram_id «{row['telegram_id']}»")
+    telegram_id = int(row["telegram_id"])
+    full_name = row["full_name"].strip()
+    if not full_name or len(full_name) > FULL_NAME_LIMIT:
+        raise ValueError("пустое или слишком длинное ФИО")
+    return telegram_id, full_name, parse_birthday(row["birthday"]), row["wish"] or ""
+
+
+def read_users_csv(path: str, errors: list[str]) -> Iterator[tuple]:
+    """
+    Построчное чтение CSV с пользователями: (line, telegram_id, full_name,
+    birthday, wish). Колонки ищутся по заголовку, без заголовка — по порядку
+    IMPORT_COLUMNS. Разделитель — запятая, точка с запятой или табуляция.
+    Ошибочные строки пропускаются и описываются в errors
+    """
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=DELIMITERS)
+            delimiter = dialect.delimiter
+        except csv.Error:
+            # Sniffer ждёт одинакового числа колонок, а wish бывает опущен:
+            # тогда разделитель — самый частый символ первой строки
+            dialect = csv.excel
+            first_line = sample.partition("\n")[0]
+            delimiter = max(DELIMITERS, key=first_line.count)
+
+        reader = csv.reader(f, dialect, delimiter=delimiter)
+        first = next(reader, None)
+        if first is None:
+            return
+        header = [column.strip().lower() for column in first]
+        if "telegram_id" in header:
+            missing = [c for c in IMPORT_COLUMNS[:3] if c not in header]
+            if missing:
+                errors.append(f"В заголовке нет колонок: {', '.join(missing)}")
+                return
+            positions = {c: header.index(c) for c in IMPORT_COLUMNS if c in header}
+            rows, start = reader, 2
+        else:
+            positions = {c: i for i, c in enumerate(IMPORT_COLUMNS)}
+            rows, start = itertools.chain([first], reader), 1
+
+        for line, values in enumerate(rows, start):
+            if not any(v.strip() for v in values):
+                continue
+            try:
+                row = {
+                    c: values[i].strip() if i < len(values) else ""
+                    for c, i in positions.items()
+                }
+                row.setdefault("wish", "")
+                yield (line, *parse_row(row))
+            except (KeyError, ValueError) as e:
+                errors.append(f"Строка {line}: {e}")
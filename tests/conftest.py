@@ -0,0 +1,64 @@
+import asyncio
+import os
+
+import pytest
+
+# Настройки читаются при импорте модулей бота; тестам хватает заглушек
+os.environ.setdefault("API_TOKEN", "123456:TEST")
+os.environ.setdefault("DATABASE_URL", "postgresql://postgres@localhost:5432/postgres")
+os.environ.setdefault("METRICS_ENABLED", "false")
+
+from src.bench.fixtures import DisposableDatabase, reset  # noqa: E402
+from src.database.db import Database  # noqa: E402
+from src.database.migrate import apply_migrations  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database_url():
+    """
+    Временная база с применёнными миграциями на сервере из DATABASE_URL.
+    Без доступного Postgres тесты с БД пропускаются
+    """
+    database = DisposableDatabase(os.environ["DATABASE_URL"], prefix="bday_test")
+    try:
+        asyncio.run(database.create())
+    except OSError as e:
+        pytest.skip(f"Postgres недоступен: {e}")
+
+    previous = os.environ["DATABASE_URL"]
+    os.environ["DATABASE_URL"] = database.dsn
+    try:
+        asyncio.run(apply_migrations())
+        yield database.dsn
+    finally:
+        os.environ["DATABASE_URL"] = previous
+        asyncio.run(database.drop())
+
+
+@pytest.fixture
+def with_db(database_url, monkeypatch):
+    """
+    Запуск теста test(database) на очищенной временной базе. Тесты без
+    pytest-asyncio: каждый идёт в своём цикле событий со своим пулом
+    """
+    monkeypatch.setenv("DATABASE_URL", database_url)
+    monkeypatch.setenv("DB_HEALTH_CHECK_INTERVAL", "0")
+
+    def run(test):
+        async def main():
+            database = Database()
+            await database.init()
+            try:
+                async with database.acquire() as conn:
+                    await reset(conn)
+                    await conn.execute("""
+                        TRUNCATE bot_bday.leases;
+                        DELETE FROM bot_bday.groups WHERE id <> 1;
+                        """)
+                return await test(database)
+            finally:
+                await database.close()
+
+        return asyncio.run(main())
+
+    return run
@@ -0,0 +1,39 @@
+from src.bench.fixtures import ADMIN_TELEGRAM_ID, seed_users
+
+
+async def revoke_elsewhere(database):
+    """Права снимает другая реплика: кэш этого процесса об этом не знает"""
+    await database.execute(
+        "test_revoke_admin",
+        "UPDATE bot_bday.users SET is_admin = false WHERE telegram_id = $1",
+        ADMIN_TELEGRAM_ID,
+    )
+
+
+def test_single_replica_caches_admin_rights(with_db):
+    async def test(database):
+        async with database.acquire() as conn:
+            await seed_users(conn, 2)
+
+        assert await database.is_admin(ADMIN_TELEGRAM_ID)
+        await revoke_elsewhere(database)
+        assert await database.is_admin(ADMIN_TELEGRAM_ID)
+
+        database.invalidate_admin(ADMIN_TELEGRAM_ID)
+        assert not await database.is_admin(ADMIN_TELEGRAM_ID)
+
+    with_db(test)
+
+
+def test_several_replicas_do_not_cache_admin_rights(with_db, monkeypatch):
+    monkeypatch.setenv("BOT_REPLICAS", "2")
+
+    async def test(database):
+        async with database.acquire() as conn:
+            await seed_users(conn, 2)
+
+        assert await database.is_admin(ADMIN_TELEGRAM_ID)
+        await revoke_elsewhere(database)
+        assert not await database.is_admin(ADMIN_TELEGRAM_ID)
+
+    with_db(test)
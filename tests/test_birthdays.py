@@ -0,0 +1,99 @@
+from datetime import date
+
+import pytest
+
+from src.database.birthdays import (
+    LEAP_DAY,
+    month_day_ranges,
+    month_days_for,
+    next_occurrence,
+    occurrence,
+)
+
+LEAP_BDAY = date(2000, 2, 29)
+
+
+def test_leap_day_occurrence():
+    assert occurrence(LEAP_BDAY, 2024) == date(2024, 2, 29)
+    assert occurrence(LEAP_BDAY, 2023) == date(2023, 2, 28)
+
+
+@pytest.mark.parametrize(
+    "today, expected",
+    [
+        (date(2023, 1, 1), date(2023, 2, 28)),
+        (date(2023, 2, 28), date(2023, 2, 28)),
+        (date(2023, 3, 1), date(2024, 2, 29)),
+        (date(2024, 2, 29), date(2024, 2, 29)),
+        (date(2024, 3, 1), date(2025, 2, 28)),
+    ],
+)
+def test_leap_day_next_occurrence(today, expected):
+    assert next_occurrence(LEAP_BDAY, today) == expected
+
+
+def test_next_occurrence_wraps_year():
+    assert next_occurrence(date(1990, 1, 5), date(2025, 12, 20)) == date(2026, 1, 5)
+    assert next_occurrence(date(1990, 12, 31), date(2025, 12, 31)) == date(2025, 12, 31)
+
+
+def test_month_days_for_leap_day():
+    # В невисокосный год 29 февраля отмечается 28-го
+    assert month_days_for(date(2023, 2, 28)) == [228, LEAP_DAY]
+    assert month_days_for(date(2024, 2, 28)) == [228]
+    assert month_days_for(date(2024, 2, 29)) == [LEAP_DAY]
+    assert month_days_for(date(2023, 3, 1)) == [301]
+
+
+def test_ranges_within_year():
+    assert month_day_ranges(date(2024, 5, 1), date(2024, 5, 31)) == (
+        501,
+        531,
+        1,
+        0,
+        [],
+    )
+
+
+def test_ranges_december_to_january():
+    assert month_day_ranges(date(2025, 12, 20), date(2026, 1, 10)) == (
+        1220,
+        1231,
+        101,
+        110,
+        [],
+    )
+
+
+@pytest.mark.parametrize(
+    "start, end, extra",
+    [
+        # Невисокосный год: 28 февраля в окне — ищем и 29-е
+        (date(2023, 2, 20), date(2023, 3, 5), [LEAP_DAY]),
+        # Високосный: 29 февраля уже внутри диапазона
+        (date(2024, 2, 20), date(2024, 3, 5), []),
+        (date(2023, 3, 1), date(2023, 3, 5), []),
+    ],
+)
+def test_ranges_leap_day(start, end, extra):
+    assert month_day_ranges(start, end)[4] == extra
+
+
+def test_ranges_wrap_into_non_leap_february():
+    assert month_day_ranges(date(2025, 12, 1), date(2026, 3, 1)) == (
+        1201,
+        1231,
+        101,
+        301,
+        [LEAP_DAY],
+    )
+
+
+def test_ranges_full_year():
+    assert month_day_ranges(date(2025, 1, 1), date(2026, 1, 1)) == (
+        101,
+        1231,
+        1,
+        0,
+        [],
+    )
@@ -0,0 +1,66 @@
+import pytest
+
+from src.utils import cache
+from src.utils.cache import MISSING, TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_get_and_expire(clock):
+    c = TTLCache(maxsize=10, ttl=5)
+    c.set("a", 1)
+    assert c.get("a") == 1
+
+    clock.now += 5.1
+    assert c.get("a") is MISSING
+    assert len(c) == 0
+
+
+def test_none_is_cached(clock):
+    c = TTLCache(ttl=5)
+    c.set("a", None)
+    assert c.get("a") is None
+    assert c.get("b") is MISSING
+
+
+def test_lru_eviction(clock):
+    c = TTLCache(maxsize=2, ttl=60)
+    c.set("a", 1)
+    c.set("b", 2)
+    # Чтение делает запись свежей: вытесняется b
+    c.get("a")
+    c.set("c", 3)
+    assert c.get("a") == 1
+    assert c.get("b") is MISSING
+    assert c.get("c") == 3
+
+
+def test_disabled_cache(clock):
+    for c in (TTLCache(maxsize=0, ttl=60), TTLCache(maxsize=10, ttl=0)):
+        c.set("a", 1)
+        assert c.get("a") is MISSING
+
+
+def test_pop_and_stats(clock):
+    c = TTLCache(ttl=60)
+    c.set("a", 1)
+    c.pop("a")
+    c.pop("missing")
+    assert c.get("a") is MISSING
+
+    c.set("b", 2)
+    c.get("b")
+    assert c.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_ratio": 0.5}
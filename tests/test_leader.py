@@ -0,0 +1,120 @@
+import asyncio
+
+import pytest
+
+from src.database.repository import Repository
+from src.utils.leader import LeaderElection
+
+LEASE = "test"
+
+
+async def expire(database):
+    await database.execute(
+        "test_lease_expire",
+        "UPDATE bot_bday.leases SET expires_at = NOW() - interval '1 second'",
+    )
+
+
+async def wait_until(predicate, timeout: float = 3):
+    async with asyncio.timeout(timeout):
+        while not predicate():
+            await asyncio.sleep(0.01)
+
+
+def election(repo: Repository, holder: str, **kwargs) -> LeaderElection:
+    return LeaderElection(repo, LEASE, holder=holder, ttl=0.4, interval=0.1, **kwargs)
+
+
+def test_lease_is_renewed_by_holder_and_taken_after_expiry(with_db):
+    async def test(database):
+        repo = Repository(database)
+
+        assert await repo.acquire_lease(LEASE, "a", 60)
+        assert await repo.acquire_lease(LEASE, "a", 60)
+        assert not await repo.acquire_lease(LEASE, "b", 60)
+
+        await expire(database)
+        assert await repo.acquire_lease(LEASE, "b", 60)
+        assert not await repo.acquire_lease(LEASE, "a", 60)
+
+        # Освободить аренду может только её владелец
+        await repo.release_lease(LEASE, "a")
+        assert not await repo.acquire_lease(LEASE, "a", 60)
+        await repo.release_lease(LEASE, "b")
+        assert await repo.acquire_lease(LEASE, "a", 60)
+
+    with_db(test)
+
+
+def test_ttl_must_cover_two_renewals(with_db):
+    async def test(database):
+        with pytest.raises(ValueError):
+            LeaderElection(Repository(database), LEASE, ttl=10, interval=6)
+
+    with_db(test)
+
+
+def test_single_leader_and_takeover_after_crash(with_db):
+    async def test(database):
+        repo = Repository(database)
+        first, second = election(repo, "a"), election(repo, "b")
+        first.start()
+        await wait_until(lambda: first.is_leader)
+        second.start()
+        try:
+            await asyncio.sleep(0.3)
+            assert not second.is_leader
+
+            # Ведущий упал, не освободив аренду: её перехватят после истечения
+            first._task.cancel()
+            await asyncio.gather(first._task, return_exceptions=True)
+            first._task = None
+            await wait_until(lambda: second.is_leader)
+            assert second.elections == 1
+        finally:
+            await first.close()
+            await second.close()
+
+    with_db(test)
+
+
+def test_close_releases_lease(with_db):
+    async def test(database):
+        repo = Repository(database)
+        first = election(repo, "a")
+        first.start()
+        await wait_until(lambda: first.is_leader)
+        await first.close()
+
+        assert not first.is_leader
+        assert await repo.acquire_lease(LEASE, "b", 60)
+
+    with_db(test)
+
+
+def test_leader_steps_down_when_lease_is_taken(with_db):
+    async def test(database):
+        repo = Repository(database)
+        roles = []
+
+        async def on_elected():
+            roles.append("elected")
+
+        async def on_demoted():
+            roles.append("demoted")
+
+        leader = election(repo, "a", on_elected=on_elected, on_demoted=on_demoted)
+        leader.start()
+        try:
+            await wait_until(lambda: roles == ["elected"])
+            await database.execute(
+                "test_lease_steal",
+                "UPDATE bot_bday.leases SET holder = 'b', "
+                "expires_at = NOW() + interval '1 minute'",
+            )
+            await wait_until(lambda: roles == ["elected", "demoted"])
+            assert not leader.is_leader
+        finally:
+            await leader.close()
+
+    with_db(test)
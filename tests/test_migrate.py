@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import os
+
+import asyncpg
+import pytest
+
+from src.bench.fixtures import DisposableDatabase
+from src.database.migrate import MigrationError, apply_migrations
+
+FIRST = "CREATE TABLE bot_bday.first (id INT PRIMARY KEY);"
+SECOND = "CREATE TABLE bot_bday.second (id INT PRIMARY KEY);"
+
+
+@pytest.fixture
+def empty_database(monkeypatch):
+    """Пустая база без схемы: миграции начинают с нуля"""
+    database = DisposableDatabase(os.environ["DATABASE_URL"], prefix="bday_migrate")
+    try:
+        asyncio.run(database.create())
+    except OSError as e:
+        pytest.skip(f"Postgres недоступен: {e}")
+    monkeypatch.setenv("DATABASE_URL", database.dsn)
+    monkeypatch.delenv("DATABASE_DIRECT_URL", raising=False)
+    try:
+        yield database.dsn
+    finally:
+        asyncio.run(database.drop())
+
+
+@pytest.fixture
+def migrations_dir(tmp_path):
+    (tmp_path / "001_first.sql").write_text(FIRST)
+    return tmp_path
+
+
+async def tables(dsn: str) -> dict[str, str | None]:
+    conn = await asyncpg.connect(dsn)
+    try:
+        names = ("schema_migrations", "first", "second")
+        return {
+            name: await conn.fetchval(
+                "SELECT to_regclass($1)::text", f"bot_bday.{name}"
+            )
+            for name in names
+        }
+    finally:
+        await conn.close()
+
+
+def test_applies_pending_migrations_once(empty_database, migrations_dir):
+    asyncio.run(apply_migrations(migrations_dir=str(migrations_dir)))
+    (migrations_dir / "002_second.sql").write_text(SECOND)
+    asyncio.run(apply_migrations(migrations_dir=str(migrations_dir)))
+    # Повторный запуск ничего не применяет: CREATE TABLE упал бы
+    asyncio.run(apply_migrations(migrations_dir=str(migrations_dir)))
+
+    assert all(asyncio.run(tables(empty_database)).values())
+
+
+def test_changed_migration_is_an_error(empty_database, migrations_dir):
+    asyncio.run(apply_migrations(migrations_dir=str(migrations_dir)))
+    (migrations_dir / "001_first.sql").write_text(FIRST + "\n-- правка")
+    (migrations_dir / "002_second.sql").write_text(SECOND)
+
+    with pytest.raises(MigrationError, match="001_first.sql"):
+        asyncio.run(apply_migrations(migrations_dir=str(migrations_dir)))
+    with pytest.raises(MigrationError):
+        asyncio.run(apply_migrations(dry_run=True, migrations_dir=str(migrations_dir)))
+    # Ожидающая миграция не применяется, пока изменённая не исправлена
+    assert asyncio.run(tables(empty_database))["second"] is None
+
+
+def test_status_only_reads(empty_database, migrations_dir, caplog):
+    with caplog.at_level(logging.INFO):
+        asyncio.run(apply_migrations(dry_run=True, migrations_dir=str(migrations_dir)))
+
+    assert "Pending migration 001_first.sql" in caplog.text
+    assert asyncio.run(tables(empty_database)) == {
+        "schema_migrations": None,
+        "first": None,
+        "second": None,
+    }
@@ -0,0 +1,199 @@
+import asyncio
+from datetime import datetime, timezone
+
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from aiogram.methods import SendMessage
+
+from src.bench.fixtures import seed_users
+from src.database.repository import Repository
+from src.utils.outbox import ReminderOutbox
+from src.utils.send_queue import SendQueue
+
+SCHEDULED_AT = datetime(2026, 3, 1, 9, tzinfo=timezone.utc)
+
+
+def outbox_row(giver_id: int, ward_id: int, chat_id: int, days_before: int = 7):
+    return (
+        1,
+        giver_id,
+        ward_id,
+        days_before,
+        2026,
+        chat_id,
+        f"Напоминание {giver_id} → {ward_id}",
+        SCHEDULED_AT,
+    )
+
+
+async def prepare(database, users: int = 4) -> Repository:
+    async with database.acquire() as conn:
+        await seed_users(conn, users)
+    return Repository(database)
+
+
+async def statuses(database) -> dict[int, tuple[str, int]]:
+    rows = await database.fetch(
+        "test_outbox_statuses",
+        "SELECT chat_id, status, attempts FROM bot_bday.reminder_outbox",
+    )
+    return {row["chat_id"]: (row["status"], row["attempts"]) for row in rows}
+
+
+class FakeQueue:
+    """Очередь отправки, сразу завершающая future заданной ошибкой"""
+
+    def __init__(self, errors: dict[int, Exception] | None = None):
+        self.errors = errors or {}
+        self.sent: list[int] = []
+
+    def submit(self, chat_id: int, text: str, scheduled_at: float | None = None):
+        future = asyncio.get_running_loop().create_future()
+        if chat_id in self.errors:
+            future.set_exception(self.errors[chat_id])
+        else:
+            self.sent.append(chat_id)
+            future.set_result(None)
+        return future
+
+
+def test_enqueue_is_idempotent(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        rows = [outbox_row(1, 2, 101), outbox_row(2, 3, 102)]
+
+        assert await repo.enqueue_reminders(rows) == 2
+        # Тот же ключ (даритель, подопечный, отступ, год) второй раз не пишется
+        assert await repo.enqueue_reminders(rows) == 0
+        assert await repo.enqueue_reminders([outbox_row(1, 2, 101, 3)]) == 1
+
+    with_db(test)
+
+
+def test_claimed_rows_are_skipped_until_timeout(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        await repo.enqueue_reminders([outbox_row(1, 2, 101), outbox_row(2, 3, 102)])
+
+        claimed = await repo.claim_reminders(10, claim_timeout=600)
+        assert sorted(row["chat_id"] for row in claimed) == [101, 102]
+        assert {row["attempts"] for row in claimed} == {1}
+        assert await repo.claim_reminders(10, claim_timeout=600) == []
+
+        # Воркер не отчитался за срок захвата — строки забирает другой
+        await database.execute(
+            "test_outbox_expire",
+            "UPDATE bot_bday.reminder_outbox SET next_attempt_at = NOW()",
+        )
+        reclaimed = await repo.claim_reminders(10, claim_timeout=600)
+        assert {row["attempts"] for row in reclaimed} == {2}
+
+    with_db(test)
+
+
+def test_batch_marks_sent_retried_and_failed(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        await repo.enqueue_reminders(
+            [outbox_row(1, 2, 101), outbox_row(2, 3, 102), outbox_row(3, 4, 103)]
+        )
+        method = SendMessage(chat_id=0, text="")
+        queue = FakeQueue(
+            {
+                102: TelegramNetworkError(method=method, message="timeout"),
+                103: TelegramForbiddenError(method=method, message="blocked"),
+            }
+        )
+        outbox = ReminderOutbox(repo, queue, backoff_base=60)
+
+        assert await outbox.process_batch() == 3
+        assert await statuses(database) == {
+            101: ("sent", 1),
+            102: ("pending", 1),
+            103: ("failed", 1),
+        }
+        assert (outbox.sent, outbox.retried, outbox.failed) == (1, 1, 1)
+
+        # Повтор отложен на backoff: сразу строку не взять
+        assert await outbox.process_batch() == 0
+        await database.execute(
+            "test_outbox_due",
+            "UPDATE bot_bday.reminder_outbox SET next_attempt_at = NOW()",
+        )
+        queue.errors.clear()
+        assert await outbox.process_batch() == 1
+        assert (await statuses(database))[102] == ("sent", 2)
+
+    with_db(test)
+
+
+def test_retries_stop_after_max_attempts(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        await repo.enqueue_reminders([outbox_row(1, 2, 101)])
+        queue = FakeQueue({101: RuntimeError("send failed")})
+        outbox = ReminderOutbox(repo, queue, max_attempts=2, backoff_base=0)
+
+        assert await outbox.process_batch() == 1
+        assert (await statuses(database))[101] == ("pending", 1)
+        assert await outbox.process_batch() == 1
+        assert (await statuses(database))[101] == ("failed", 2)
+        assert await outbox.process_batch() == 0
+
+    with_db(test)
+
+
+def test_close_completes_in_flight_batch(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        await repo.enqueue_reminders(
+            [outbox_row(1, 2, 101), outbox_row(2, 3, 102), outbox_row(3, 4, 103)]
+        )
+        sent = []
+        started = asyncio.Event()
+
+        async def send(chat_id: int, text: str):
+            started.set()
+            await asyncio.sleep(0.05)
+            sent.append(chat_id)
+
+        queue = SendQueue(send, rate=1000, workers=1)
+        queue.start()
+        outbox = ReminderOutbox(repo, queue, workers=2, poll_interval=60)
+        outbox.start()
+        try:
+            await asyncio.wait_for(started.wait(), 5)
+            # Пачка взята, тексты в очереди отправки: close дожидается их
+            await outbox.close()
+            assert await statuses(database) == {
+                101: ("sent", 1),
+                102: ("sent", 1),
+                103: ("sent", 1),
+            }
+        finally:
+            await queue.close()
+        assert sorted(sent) == [101, 102, 103]
+
+    with_db(test)
+
+
+def test_close_stops_idle_workers_promptly(with_db):
+    async def test(database):
+        repo = await prepare(database)
+        outbox = ReminderOutbox(repo, FakeQueue(), poll_interval=60)
+        outbox.start()
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(outbox.close(), 1)
+
+        # После остановки воркеры запускаются снова
+        await repo.enqueue_reminders([outbox_row(1, 2, 101)])
+        outbox.start()
+        try:
+            for _ in range(100):
+                if (await statuses(database))[101][0] == "sent":
+                    break
+                await asyncio.sleep(0.02)
+            assert (await statuses(database))[101] == ("sent", 1)
+        finally:
+            await outbox.close()
+
+    with_db(test)
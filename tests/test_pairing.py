@@ -0,0 +1,78 @@
+from datetime import date
+
+import pytest
+
+from src.utils.pairing import Constraints, plan_pairs
+
+USERS = list(range(1, 51))
+
+
+def is_single_cycle(pairs: list[tuple[int, int]]) -> bool:
+    ward_of = dict(pairs)
+    start = pairs[0][0]
+    current, visited = ward_of[start], 1
+    while current != start:
+        current, visited = ward_of[current], visited + 1
+    return visited == len(pairs)
+
+
+def test_cycle_is_single_circle():
+    pairing = plan_pairs(USERS, Constraints(), seed=1)
+
+    assert len(pairing.pairs) == len(USERS)
+    assert sorted(giver for giver, _ in pairing.pairs) == USERS
+    assert sorted(ward for _, ward in pairing.pairs) == USERS
+    assert is_single_cycle(pairing.pairs)
+    assert pairing.violations == []
+
+
+@pytest.mark.parametrize("engine", ["cycle", "derangement"])
+def test_no_self_pairs(engine):
+    for seed in range(20):
+        pairing = plan_pairs(USERS, Constraints(), engine=engine, seed=seed)
+        assert all(giver != ward for giver, ward in pairing.pairs)
+        assert sorted(ward for _, ward in pairing.pairs) == USERS
+
+
+def test_constraints_are_respected():
+    constraints = Constraints(
+        exclusions={(1, 2), (2, 3)},
+        history={(3, 4), (4, 5)},
+    )
+    pairing = plan_pairs(USERS, constraints, seed=7)
+
+    assert pairing.violations == []
+    assert not {(1, 2), (2, 3), (3, 4), (4, 5)} & set(pairing.pairs)
+
+
+def test_violations_reported():
+    # Двое участников: единственный круг 1 → 2 → 1 нарушает оба ограничения
+    constraints = Constraints(exclusions={(1, 2)}, history={(2, 1)})
+    pairing = plan_pairs([1, 2], constraints, seed=0)
+
+    reasons = {(v.giver_id, v.ward_id): v.reason for v in pairing.violations}
+    assert reasons == {(1, 2): "excluded", (2, 1): "repeat"}
+
+
+def test_birthday_distance_violation():
+    constraints = Constraints(
+        birthdays={1: date(2000, 3, 1), 2: date(1990, 3, 5)},
+        min_birthday_distance=10,
+    )
+    pairing = plan_pairs([1, 2], constraints, seed=0)
+
+    assert {v.reason for v in pairing.violations} == {"birthday"}
+
+
+@pytest.mark.parametrize("engine", ["cycle", "derangement"])
+def test_same_seed_same_result(engine):
+    constraints = Constraints(exclusions={(1, 2)})
+    first = plan_pairs(USERS, constraints, engine=engine, seed=42)
+    second = plan_pairs(USERS, constraints, engine=engine, seed=42)
+
+    assert first.pairs == second.pairs
+    assert first.seed == second.seed == 42
+
+
+def test_too_few_users():
+    assert plan_pairs([1], Constraints(), seed=0).pairs == []
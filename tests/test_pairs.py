@@ -0,0 +1,150 @@
+from src.bench.fixtures import SEED_TELEGRAM_BASE, seed_users
+from src.database.pairs import PairService
+from src.database.repository import Repository
+
+USERS = 6
+
+
+async def circle(database) -> tuple[Repository, PairService, list[int]]:
+    """Группа 1 из USERS участников, замкнутых в круг ids[i] → ids[i + 1]"""
+    async with database.acquire() as conn:
+        await seed_users(conn, USERS)
+    repo = Repository(database)
+    ids = sorted(await repo.list_user_ids(1))
+    await repo.write_pairs(1, ids, ids[1:] + ids[:1], ids[-1:] + ids[:-1])
+    return repo, PairService(database), ids
+
+
+async def links(database, group_id: int = 1) -> dict[int, tuple[int, int]]:
+    rows = await database.fetch(
+        "test_pair_links",
+        "SELECT user_id, ward_id, giver_id FROM bot_bday.group_members "
+        "WHERE group_id = $1",
+        group_id,
+    )
+    return {row["user_id"]: (row["ward_id"], row["giver_id"]) for row in rows}
+
+
+async def assert_consistent(database, group_id: int = 1):
+    """Связи взаимны: у подопечного даритель — тот, кто на него указывает"""
+    current = await links(database, group_id)
+    for user_id, (ward_id, giver_id) in current.items():
+        if ward_id is not None:
+            assert ward_id in current, f"{user_id} → {ward_id}: не участник"
+            assert current[ward_id][1] == user_id
+        if giver_id is not None:
+            assert giver_id in current, f"{giver_id} → {user_id}: не участник"
+            assert current[giver_id][0] == user_id
+
+
+def test_relink_inside_circle(with_db):
+    async def test(database):
+        _, pairs, ids = await circle(database)
+        a, b, c, d = ids[:4]
+
+        rows = await pairs.relink(1, a, c)
+        assert {row["user_id"] for row in rows} == {a, b, c}
+        await assert_consistent(database)
+
+        current = await links(database)
+        assert current[a] == (c, ids[-1])
+        assert current[c] == (d, a)
+        # Прежний подопечный a и прежний даритель c — это b: он без обоих
+        assert current[b] == (None, None)
+
+    with_db(test)
+
+
+def test_relink_to_non_member_changes_nothing(with_db):
+    async def test(database):
+        _, pairs, ids = await circle(database)
+        outsider = await database.fetchval(
+            "test_outsider",
+            "INSERT INTO bot_bday.users (telegram_id, full_name) "
+            "VALUES ($1, 'Вне группы') RETURNING id",
+            SEED_TELEGRAM_BASE + 1000,
+        )
+        before = await links(database)
+
+        assert await pairs.relink(1, ids[0], outsider) == []
+        assert await pairs.relink(1, outsider, ids[0]) == []
+        assert await links(database) == before
+
+    with_db(test)
+
+
+def test_unlink_both_directions(with_db):
+    async def test(database):
+        _, pairs, ids = await circle(database)
+        a, b, c = ids[:3]
+
+        # Порядок аргументов не важен: связь a → b снимается и с конца b
+        rows = await pairs.unlink(1, b, a)
+        assert {row["user_id"] for row in rows} == {a, b}
+        await assert_consistent(database)
+        current = await links(database)
+        assert current[a][0] is None and current[b][1] is None
+
+        assert await pairs.unlink(1, a, c) == []
+
+    with_db(test)
+
+
+def test_reset_user_clears_every_reference(with_db):
+    async def test(database):
+        _, pairs, ids = await circle(database)
+        a, b = ids[:2]
+
+        rows = await pairs.reset_user(1, b)
+        assert {row["user_id"] for row in rows} == {a, b, ids[2]}
+        await assert_consistent(database)
+        current = await links(database)
+        assert current[b] == (None, None)
+        assert b not in {ward for ward, _ in current.values()}
+        assert b not in {giver for _, giver in current.values()}
+
+        assert await pairs.reset_user(1, 10**6) == []
+
+    with_db(test)
+
+
+def test_remove_user_from_every_group(with_db):
+    async def test(database):
+        repo, pairs, ids = await circle(database)
+        a, b, c = ids[:3]
+        group = await repo.create_group("Вторая", "second")
+        for user_id in (a, b, c):
+            await repo.join_group(group["id"], user_id)
+        await repo.write_pairs(group["id"], [a, b, c], [b, c, a], [c, a, b])
+
+        telegram_id = await database.fetchval(
+            "test_telegram_id",
+            "SELECT telegram_id FROM bot_bday.users WHERE id = $1",
+            b,
+        )
+        deleted_id, rows = await pairs.remove_user(telegram_id)
+        assert deleted_id == b
+        assert {(row["group_id"], row["user_id"]) for row in rows} == {
+            (1, a),
+            (1, b),
+            (1, c),
+            (group["id"], a),
+            (group["id"], b),
+            (group["id"], c),
+        }
+        for group_id in (1, group["id"]):
+            await assert_consistent(database, group_id)
+            assert b not in await links(database, group_id)
+
+    with_db(test)
+
+
+def test_remove_missing_user(with_db):
+    async def test(database):
+        _, pairs, _ = await circle(database)
+        before = await links(database)
+
+        assert await pairs.remove_user(SEED_TELEGRAM_BASE + 10**6) is None
+        assert await links(database) == before
+
+    with_db(test)
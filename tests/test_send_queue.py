@@ -0,0 +1,154 @@
+import asyncio
+import time
+
+import pytest
+from aiogram.exceptions import (
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+)
+from aiogram.methods import SendMessage
+
+from src.utils.send_queue import MESSAGE_LIMIT, SendQueue
+
+METHOD = SendMessage(chat_id=0, text="")
+
+
+class FakeSender:
+    """Отправка в Telegram: записывает сообщения, по очереди выдаёт ошибки"""
+
+    def __init__(self, errors: list[Exception] | None = None):
+        self.errors = errors or []
+        self.messages: list[tuple[int, str, float]] = []
+        self.calls = 0
+
+    async def __call__(self, chat_id: int, text: str):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        self.messages.append((chat_id, text, time.monotonic()))
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Задержки повторов записываются, а не выжидаются"""
+    delays = []
+    sleep = asyncio.sleep
+
+    async def fake_sleep(delay, *args, **kwargs):
+        if delay >= 1:
+            delays.append(delay)
+            delay = 0
+        return await sleep(delay, *args, **kwargs)
+
+    monkeypatch.setattr(asyncio, "sleep", fake_sleep)
+    return delays
+
+
+async def deliver(queue: SendQueue, *texts: tuple[int, str]) -> list[asyncio.Future]:
+    futures = [queue.submit(chat_id, text) for chat_id, text in texts]
+    queue.start()
+    try:
+        await asyncio.wait_for(queue.drain(), 5)
+    finally:
+        await queue.close()
+    return futures
+
+
+def test_texts_to_one_chat_are_coalesced():
+    async def test():
+        sender = FakeSender()
+        queue = SendQueue(sender, rate=1000, chat_interval=0)
+        futures = await deliver(
+            queue, (1, "первое"), (2, "другой чат"), (1, "второе"), (1, "первое")
+        )
+
+        assert sorted((chat_id, text) for chat_id, text, _ in sender.messages) == [
+            (1, "первое\n\nвторое"),
+            (2, "другой чат"),
+        ]
+        assert all(future.result() is None for future in futures)
+        assert queue.stats()["coalesced"] == 2
+        assert queue.stats()["sent"] == 2
+
+    asyncio.run(test())
+
+
+def test_long_texts_are_split_by_message_limit():
+    async def test():
+        sender = FakeSender()
+        queue = SendQueue(sender, rate=1000, chat_interval=0)
+        half = "а" * (MESSAGE_LIMIT // 2)
+        await deliver(queue, (1, half), (1, half + "б"), (1, "хвост"))
+
+        assert [text for _, text, _ in sender.messages] == [
+            half,
+            half + "б\n\nхвост",
+        ]
+        assert all(len(text) <= MESSAGE_LIMIT for _, text, _ in sender.messages)
+
+    asyncio.run(test())
+
+
+def test_retry_after_waits_and_resends(sleeps):
+    async def test():
+        sender = FakeSender(
+            [TelegramRetryAfter(method=METHOD, message="flood", retry_after=7)]
+        )
+        queue = SendQueue(sender, rate=1000, chat_interval=0)
+        (future,) = await deliver(queue, (1, "текст"))
+
+        assert future.result() is None
+        assert sleeps == [7]
+        assert sender.calls == 2
+        assert (queue.stats()["retried"], queue.stats()["sent"]) == (1, 1)
+
+    asyncio.run(test())
+
+
+def test_network_errors_back_off_until_retries_run_out(sleeps):
+    async def test():
+        error = TelegramNetworkError(method=METHOD, message="timeout")
+        sender = FakeSender([error] * 4)
+        queue = SendQueue(sender, rate=1000, chat_interval=0, max_retries=3)
+        (future,) = await deliver(queue, (1, "текст"))
+
+        assert future.exception() is error
+        assert sleeps == [1, 2, 4]
+        assert sender.messages == []
+        assert queue.stats()["failed"] == 1
+
+    asyncio.run(test())
+
+
+def test_permanent_error_is_not_retried():
+    async def test():
+        error = TelegramForbiddenError(method=METHOD, message="blocked")
+        sender = FakeSender([error])
+        queue = SendQueue(sender, rate=1000, chat_interval=0)
+        first, second = await deliver(queue, (1, "первое"), (2, "второе"))
+
+        assert first.exception() is error
+        assert second.result() is None
+        assert sender.calls == 2
+        assert (queue.stats()["failed"], queue.stats()["retried"]) == (1, 0)
+
+    asyncio.run(test())
+
+
+def test_chat_interval_spaces_messages_to_one_chat():
+    async def test():
+        sender = FakeSender()
+        queue = SendQueue(sender, rate=1000, chat_interval=0.1)
+        queue.start()
+        try:
+            await queue.submit(1, "первое")
+            # Текст пришёл после отправки: следующее сообщение ждёт интервал
+            await queue.submit(1, "второе")
+        finally:
+            await queue.close()
+
+        (_, _, first), (_, _, second) = sender.messages
+        assert second - first >= 0.09
+
+    asyncio.run(test())
@@ -0,0 +1,100 @@
+from datetime import date
+
+from aiogram.fsm.storage.base import StorageKey
+
+from src.database.storage import PostgresStorage
+
+KEY = StorageKey(bot_id=1, chat_id=42, user_id=42)
+
+
+async def expire(database):
+    await database.execute(
+        "test_fsm_expire",
+        "UPDATE bot_bday.fsm_storage SET updated_at = NOW() - interval '2 hours'",
+    )
+
+
+def storage(database, cache_ttl: float = 0) -> PostgresStorage:
+    return PostgresStorage(database, state_ttl=3600, cache_ttl=cache_ttl)
+
+
+def test_state_and_data_round_trip(with_db):
+    async def test(database):
+        fsm = storage(database)
+        await fsm.set_state(KEY, "RegStates:wish")
+        await fsm.set_data(KEY, {"full_name": "Иванов", "birthday": date(2000, 2, 29)})
+
+        # Новый экземпляр читает из БД, а не из кэша
+        fresh = storage(database)
+        assert await fresh.get_state(KEY) == "RegStates:wish"
+        assert await fresh.get_data(KEY) == {
+            "full_name": "Иванов",
+            "birthday": date(2000, 2, 29),
+        }
+
+    with_db(test)
+
+
+def test_expired_record_is_absent(with_db):
+    async def test(database):
+        fsm = storage(database)
+        await fsm.set_state(KEY, "RegStates:wish")
+        await fsm.set_data(KEY, {"full_name": "Иванов"})
+        await expire(database)
+
+        assert await fsm.get_state(KEY) is None
+        assert await fsm.get_data(KEY) == {}
+
+    with_db(test)
+
+
+def test_set_state_drops_expired_data(with_db):
+    async def test(database):
+        fsm = storage(database, cache_ttl=60)
+        await fsm.set_data(KEY, {"full_name": "Иванов"})
+        await expire(database)
+
+        await fsm.set_state(KEY, "RegStates:full_name")
+        assert await fsm.get_data(KEY) == {}
+        assert await storage(database).get_data(KEY) == {}
+
+    with_db(test)
+
+
+def test_set_data_drops_expired_state(with_db):
+    async def test(database):
+        fsm = storage(database, cache_ttl=60)
+        await fsm.set_state(KEY, "RegStates:wish")
+        await expire(database)
+
+        await fsm.set_data(KEY, {"full_name": "Петров"})
+        assert await fsm.get_state(KEY) is None
+        assert await storage(database).get_state(KEY) is None
+
+    with_db(test)
+
+
+def test_fresh_record_keeps_other_column(with_db):
+    async def test(database):
+        fsm = storage(database)
+        await fsm.set_data(KEY, {"full_name": "Иванов"})
+        await fsm.set_state(KEY, "RegStates:birthday")
+
+        assert await fsm.get_data(KEY) == {"full_name": "Иванов"}
+        assert await fsm.get_state(KEY) == "RegStates:birthday"
+
+    with_db(test)
+
+
+def test_queries_are_timed(with_db):
+    async def test(database):
+        fsm = storage(database)
+        await fsm.set_state(KEY, "RegStates:wish")
+        await fsm.get_state(KEY)
+        await fsm.purge_expired()
+
+        assert {"fsm_set_state", "fsm_load", "fsm_purge_expired"} <= set(
+            database.query_stats
+        )
+
+    with_db(test)
@@ -0,0 +1,71 @@
+from datetime import date
+
+from src.utils.user_csv import read_users_csv
+
+
+def read(tmp_path, content: str, encoding: str = "utf-8"):
+    path = tmp_path / "users.csv"
+    path.write_text(content, encoding=encoding)
+    errors: list[str] = []
+    return list(read_users_csv(str(path), errors)), errors
+
+
+def test_header_in_any_order(tmp_path):
+    rows, errors = read(
+        tmp_path,
+        "full_name,birthday,telegram_id,wish\n"
+        "Иванов Иван,01.02.1990,100,книга\n"
+        "Петров Пётр,1991-03-04,200,\n",
+    )
+    assert errors == []
+    assert rows == [
+        (2, 100, "Иванов Иван", date(1990, 2, 1), "книга"),
+        (3, 200, "Петров Пётр", date(1991, 3, 4), ""),
+    ]
+
+
+def test_semicolon_without_header(tmp_path):
+    rows, errors = read(
+        tmp_path, "100;Иванов Иван;29.02.2000\n\n200;Петров;01.01.1990;x\n"
+    )
+    assert errors == []
+    assert rows == [
+        (1, 100, "Иванов Иван", date(2000, 2, 29), ""),
+        (3, 200, "Петров", date(1990, 1, 1), "x"),
+    ]
+
+
+def test_bom_and_extra_columns(tmp_path):
+    rows, errors = read(
+        tmp_path,
+        "id,telegram_id,full_name,birthday,wish,giver_id\n"
+        "1,100,Иванов,01.02.1990,,5\n",
+        encoding="utf-8-sig",
+    )
+    assert errors == []
+    assert rows == [(2, 100, "Иванов", date(1990, 2, 1), "")]
+
+
+def test_bad_rows_are_reported(tmp_path):
+    rows, errors = read(
+        tmp_path,
+        "telegram_id,full_name,birthday\n"
+        "abc,Иванов,01.02.1990\n"
+        "100,,01.02.1990\n"
+        "200,Петров,31.02.1990\n"
+        "300,Сидоров,01.02.1990\n",
+    )
+    assert [row[1] for row in rows] == [300]
+    assert len(errors) == 3
+    assert errors[0].startswith("Строка 2:")
+    assert errors[2].startswith("Строка 4:")
+
+
+def test_missing_header_columns(tmp_path):
+    rows, errors = read(tmp_path, "telegram_id,wish\n100,x\n")
+    assert rows == []
+    assert errors == ["В заголовке нет колонок: full_name, birthday"]
+
+
+def test_empty_file(tmp_path):
+    assert read(tmp_path, "") == ([], [])
@@ -0,0 +1,53 @@
+import asyncio
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from src import bot as app
+
+SECRET = "test-secret"
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 1,
+        "date": 1700000000,
+        "chat": {"id": 42, "type": "private"},
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "text": "/help",
+    },
+}
+
+
+def post_update(monkeypatch, secret: str) -> tuple[int, list[dict]]:
+    """POST обновления в приложение вебхука; возвращает статус и принятые обновления"""
+    fed = []
+
+    async def feed_raw_update(bot, update, **kwargs):
+        fed.append(update)
+
+    monkeypatch.setattr(app.settings, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(app.dp, "feed_raw_update", feed_raw_update)
+
+    async def run():
+        async with TestClient(TestServer(app.create_webhook_app())) as client:
+            response = await client.post(
+                app.settings.WEBHOOK_PATH,
+                json=UPDATE,
+                headers={"X-Telegram-Bot-Api-Secret-Token": secret},
+            )
+            # Обновление обрабатывается в фоне после ответа
+            await asyncio.sleep(0)
+            return response.status
+
+    return asyncio.run(run()), fed
+
+
+def test_webhook_accepts_update(monkeypatch):
+    status, fed = post_update(monkeypatch, SECRET)
+    assert status == 200
+    assert fed == [UPDATE]
+
+
+def test_webhook_rejects_wrong_secret(monkeypatch):
+    status, fed = post_update(monkeypatch, "wrong")
+    assert status == 401
+    assert fed == []